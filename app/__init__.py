@@ -6,7 +6,6 @@ from flask import Flask
 from flask_login import LoginManager
 import os
 import sqlite3
-import bcrypt
 
 def create_app(config_name='default'):
     """Create and configure the Flask application"""
@@ -25,6 +24,30 @@ def create_app(config_name='default'):
     from .core.models import db
     db.init_app(app)
     
+    # Offload bcrypt work to the bounded hashing pool
+    from .core.hashing import password_hasher
+    password_hasher.init_app(app)
+    
+    # Token-bucket throttling of login attempts
+    from .core.throttle import login_throttle
+    login_throttle.init_app(app)
+    
+    # Oncocentre identifiers handed out from per-worker leased blocks
+    from .core.sequence import id_allocator
+    id_allocator.init_app(app)
+    
+    # Template bytecode cache and the {% cache %} fragment tag
+    from .core.templating import configure_templates
+    configure_templates(app)
+    
+    # Fingerprinted, precompressed static files and the asset_url() helper
+    from .core.assets import asset_pipeline
+    asset_pipeline.init_app(app)
+    
+    # Compress large HTML/JSON responses (registered first so it runs last)
+    from .core.compression import response_compressor
+    response_compressor.init_app(app)
+    
     # Initialize Flask-Login
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -61,7 +84,7 @@ def create_app(config_name='default'):
                             self.is_admin = bool(is_admin)
                         
                         def check_password(self, password):
-                            return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+                            return password_hasher.verify_password(password, self.password_hash)
                         
                         def is_authenticated(self):
                             return True
@@ -81,12 +104,16 @@ def create_app(config_name='default'):
     from .auth import auth_bp
     from .main import main_bp
     from .admin import admin_bp
+    from .api import api_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create missing tables on startup only where configured (development,
+    # tests); deployments run scripts/init_db.py instead
+    if app.config.get('AUTO_CREATE_SCHEMA', False):
+        with app.app_context():
+            db.create_all()
     
     return app
\ No newline at end of file
@@ -2,10 +2,14 @@
 Administrative routes for user management
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, abort
+import os
+from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app
 from flask_login import login_required, current_user
 from functools import wraps
-from ..core.models import User, Patient, WhitelistEntry, db
+from ..core.models import User, Patient, WhitelistEntry, ResourceVersion, db
+from ..core.http_cache import conditional_page, cached_page
+from ..core.directory import ldap_auth
+from ..core.hashing import PasswordHashingBusy
 from .forms import CreateUserForm, EditUserForm
 
 admin_bp = Blueprint('admin', __name__)
@@ -40,15 +44,26 @@ def dashboard():
         'recent_users': recent_users
     }
     
-    return render_template('admin/dashboard.html', stats=stats)
+    # Directory health (circuit breaker, domain controllers)
+    ldap_status = None
+    if current_app.config.get('ALLOW_LDAP_AUTH', True) and ldap_auth.is_enabled():
+        ldap_status = ldap_auth.status()
+    
+    return render_template('admin/dashboard.html', stats=stats, ldap_status=ldap_status)
 
 @admin_bp.route('/users')
 @login_required
 @admin_required
 def list_users():
     """List all users"""
+    # Rows show patient counts, so patient changes count too
+    row_versions = ResourceVersion.current('users', 'patients')
+    etag, not_modified = conditional_page('users', row_versions, current_user.id)
+    if not_modified:
+        return not_modified
+    
     users = User.query.order_by(User.created_at.desc()).all()
-    return render_template('admin/users.html', users=users)
+    return cached_page(render_template('admin/users.html', users=users, row_versions=row_versions), etag)
 
 @admin_bp.route('/users/create', methods=['GET', 'POST'])
 @login_required
@@ -63,7 +78,11 @@ def create_user():
             is_admin=form.is_admin.data,
             is_principal_investigator=form.is_principal_investigator.data
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except PasswordHashingBusy:
+            flash('The server is busy. Please try again in a few seconds.', 'warning')
+            return render_template('admin/create_user.html', form=form), 503
         
         try:
             db.session.add(user)
@@ -90,11 +109,19 @@ def edit_user(user_id):
         user.is_principal_investigator = form.is_principal_investigator.data
         
         if form.reset_password.data:
-            user.set_password(form.reset_password.data)
+            try:
+                user.set_password(form.reset_password.data)
+            except PasswordHashingBusy:
+                # Apply none of the submitted changes
+                db.session.rollback()
+                flash('The server is busy. Please try again in a few seconds.', 'warning')
+                return render_template('admin/edit_user.html', form=form, user=user), 503
         
         try:
             db.session.commit()
             flash(f'User "{user.username}" updated successfully!', 'success')
+            if user.is_ldap_user and ldap_auth.mapped_roles():
+                flash('Admin/PI flags of LDAP users follow directory groups and are reset at their next login.', 'info')
             return redirect(url_for('admin.list_users'))
         except Exception as e:
             db.session.rollback()
@@ -142,16 +169,22 @@ def delete_user(user_id):
 @admin_required
 def manage_whitelist():
     """Manage user whitelist"""
-    # Get all whitelist entries
-    whitelist_entries = WhitelistEntry.query.order_by(WhitelistEntry.created_at.desc()).all()
+    # Entries show their creator's username, so user changes count too
+    etag, not_modified = conditional_page('whitelist', ResourceVersion.current('whitelist', 'users'),
+                                          os.environ.get('AUTHORIZED_USERS'), current_user.id)
+    if not_modified:
+        return not_modified
 
     # Get current environment whitelist for comparison
     from ..auth.views import get_authorized_users
     env_whitelist = get_authorized_users()
 
-    return render_template('admin/whitelist.html',
-                         whitelist_entries=whitelist_entries,
-                         env_whitelist=env_whitelist)
+    # Get all whitelist entries
+    whitelist_entries = WhitelistEntry.query.order_by(WhitelistEntry.created_at.desc()).all()
+
+    return cached_page(render_template('admin/whitelist.html',
+                                       whitelist_entries=whitelist_entries,
+                                       env_whitelist=env_whitelist), etag)
 
 @admin_bp.route('/whitelist/add', methods=['POST'])
 @login_required
@@ -169,6 +202,9 @@ def add_to_whitelist():
     entry = WhitelistEntry.add_username(username, current_user.id, description)
 
     if entry:
+        # The account may have just been created in the directory
+        if current_app.config.get('ALLOW_LDAP_AUTH', True):
+            ldap_auth.forget_unknown_user(username)
         flash(f'Username "{username}" added to whitelist successfully!', 'success')
     else:
         flash(f'Username "{username}" is already in the whitelist', 'warning')
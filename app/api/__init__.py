@@ -0,0 +1,8 @@
+"""
+JSON API module for CARPEM Oncocentre
+Versioned machine-readable access to patients under /api/v1
+"""
+
+from .views import api_bp
+
+__all__ = ['api_bp']
@@ -0,0 +1,255 @@
+"""
+JSON API routes (version 1)
+
+Clients authenticate with the normal session cookie (POST /auth/login) and
+get the same patient visibility as the HTML pages. Errors are returned as
+{"error": "..."} with the matching HTTP status.
+"""
+
+import base64
+import binascii
+from datetime import date
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, url_for, current_app
+from flask_login import current_user
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+
+from ..core.models import Patient, db
+from ..core.sequence import SequenceExhausted
+from ..core.patient import (PATIENT_FIELDS, PatientAccessDenied, IdempotencyKeyReused, BulkValidationError,
+                            visible_patients, create_patient, create_patients, validate_patients,
+                            serialize_patient)
+
+api_bp = Blueprint('api', __name__)
+
+# Columns to load for each requested field
+FIELD_COLUMNS = {
+    'oncocentre_id': Patient.oncocentre_id,
+    'sex': Patient.sex,
+    'created_at': Patient.created_at,
+    'ipp': Patient.ipp_encrypted,
+    'first_name': Patient.first_name_encrypted,
+    'last_name': Patient.last_name_encrypted,
+    'birth_date': Patient.birth_date_encrypted
+}
+
+
+class APIError(Exception):
+    """Error answered as JSON with the given status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_bp.errorhandler(APIError)
+def handle_api_error(e):
+    return jsonify({'error': e.message}), e.status
+
+
+@api_bp.errorhandler(PatientAccessDenied)
+def handle_access_denied(e):
+    return jsonify({'error': str(e)}), 403
+
+
+@api_bp.errorhandler(SequenceExhausted)
+def handle_sequence_exhausted(e):
+    db.session.rollback()
+    return jsonify({'error': str(e)}), 503
+
+
+@api_bp.errorhandler(IdempotencyKeyReused)
+def handle_idempotency_key_reused(e):
+    return jsonify({'error': str(e)}), 422
+
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            raise APIError('Authentication required', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def parse_fields():
+    """Requested fields from ?fields=a,b (default: all), in canonical order"""
+    value = request.args.get('fields')
+    if not value:
+        return PATIENT_FIELDS
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(PATIENT_FIELDS)
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in PATIENT_FIELDS if field in requested)
+
+
+def encode_cursor(patient_id):
+    return base64.urlsafe_b64encode(str(patient_id).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise APIError('Invalid cursor')
+
+
+def json_body():
+    """The parsed JSON request body"""
+    # Requiring JSON also keeps cross-site HTML forms out (CORS preflight)
+    if not request.is_json:
+        raise APIError('Content-Type must be application/json', 415)
+    return request.get_json(silent=True)
+
+
+def idempotency_key_header():
+    """The Idempotency-Key request header, or None"""
+    idempotency_key = request.headers.get('Idempotency-Key') or None
+    if idempotency_key and len(idempotency_key) > 200:
+        raise APIError('Idempotency-Key must be at most 200 characters')
+    return idempotency_key
+
+
+def parse_patient(body):
+    """Keyword arguments for create_patient() from a JSON object"""
+    if not isinstance(body, dict):
+        raise APIError('Patient must be a JSON object')
+
+    try:
+        birth_date = date.fromisoformat(body.get('birth_date') or '')
+    except (TypeError, ValueError):
+        raise APIError('birth_date must be a date in YYYY-MM-DD format')
+
+    values = {field: body.get(field) for field in ('ipp', 'first_name', 'last_name', 'sex')}
+    if any(value is not None and not isinstance(value, str) for value in values.values()):
+        raise APIError('ipp, first_name, last_name and sex must be strings')
+    values['birth_date'] = birth_date
+    return values
+
+
+@api_bp.route('/patients', methods=['GET'])
+@api_login_required
+def list_patients():
+    """Patients visible to the caller, newest first
+
+    Query parameters:
+        limit: page size (default API_PAGE_SIZE, at most API_MAX_PAGE_SIZE)
+        cursor: next_cursor from the previous page
+        fields: comma-separated subset of the patient fields
+    """
+    fields = parse_fields()
+    try:
+        limit = int(request.args.get('limit', current_app.config.get('API_PAGE_SIZE', 100)))
+    except ValueError:
+        raise APIError('limit must be an integer')
+    limit = max(1, min(limit, current_app.config.get('API_MAX_PAGE_SIZE', 1000)))
+
+    # Keyset pagination on the primary key: stable under inserts, no OFFSET scans
+    query = visible_patients(current_user)
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(Patient.id < decode_cursor(cursor))
+    # Only the requested columns are loaded; plain fields skip decryption
+    query = query.options(load_only(Patient.id, *(FIELD_COLUMNS[field] for field in fields)))
+    patients = query.order_by(Patient.id.desc()).limit(limit + 1).all()
+
+    has_more = len(patients) > limit
+    patients = patients[:limit]
+    return jsonify({
+        'data': [serialize_patient(patient, fields) for patient in patients],
+        'next_cursor': encode_cursor(patients[-1].id) if has_more else None
+    })
+
+
+@api_bp.route('/patients/<oncocentre_id>', methods=['GET'])
+@api_login_required
+def get_patient(oncocentre_id):
+    """One patient by oncocentre identifier (404 if not visible to the caller)"""
+    fields = parse_fields()
+    patient = visible_patients(current_user).filter_by(oncocentre_id=oncocentre_id).first()
+    if patient is None:
+        raise APIError('Patient not found', 404)
+    return jsonify(serialize_patient(patient, fields))
+
+
+@api_bp.route('/patients', methods=['POST'])
+@api_login_required
+def create_patient_view():
+    """Create a patient from a JSON body
+
+    Body: {"ipp", "first_name", "last_name", "birth_date": "YYYY-MM-DD", "sex": "M"|"F"}
+    Returns 201 with the new patient, or 200 with the existing patient if
+    the caller already registered this IPP.
+
+    An Idempotency-Key header makes retries safe: repeating the request
+    with the same key returns the first response instead of creating
+    another patient (422 if the body differs).
+    """
+    values = parse_patient(json_body())
+    idempotency_key = idempotency_key_header()
+
+    try:
+        patient, created = create_patient(current_user, idempotency_key=idempotency_key, **values)
+    except ValueError as e:
+        raise APIError(str(e))
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    response = jsonify(serialize_patient(patient))
+    response.status_code = 201 if created else 200
+    response.headers['Location'] = url_for('api.get_patient', oncocentre_id=patient.oncocentre_id)
+    return response
+
+
+@api_bp.route('/patients/bulk', methods=['POST'])
+@api_login_required
+def create_patients_view():
+    """Create several patients at once, all or nothing
+
+    Body: {"patients": [{...same fields as POST /patients...}, ...]}
+    Returns 201 with {"oncocentre_ids": [...]} in the order of the input, or
+    400 with {"error", "errors": [{"index", "error"}]} listing every invalid
+    item, including IPPs the caller already registered (nothing is created
+    then).
+
+    An Idempotency-Key header works as for POST /patients: a retry returns
+    the identifiers of the first response (422 if the body differs).
+    """
+    idempotency_key = idempotency_key_header()
+    body = json_body()
+    items = body.get('patients') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise APIError('Request body must be {"patients": [...]} with at least one patient')
+    max_items = current_app.config.get('API_BULK_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        raise APIError(f'At most {max_items} patients per request', 413)
+
+    # Report every invalid item, not just the first one
+    parsed, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            parsed.append(parse_patient(item))
+        except APIError as e:
+            parsed.append(None)
+            errors.append((index, e.message))
+
+    try:
+        if errors:
+            raise BulkValidationError(sorted(errors + validate_patients(parsed, current_user)))
+        oncocentre_ids = create_patients(current_user, parsed, idempotency_key=idempotency_key)
+    except BulkValidationError as e:
+        return jsonify({
+            'error': str(e),
+            'errors': [{'index': index, 'error': message} for index, message in e.errors]
+        }), 400
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    return jsonify({'oncocentre_ids': oncocentre_ids}), 201
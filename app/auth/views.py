@@ -6,10 +6,13 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_user, logout_user, login_required, current_user
 from ..core.models import User, db
 from .forms import LoginForm
-from ..core.ldap_auth import ldap_auth
+from ..core.directory import ldap_auth
+from ..core.hashing import password_hasher, PasswordHashingBusy
+from ..core.throttle import login_throttle
+from datetime import timedelta
 import os
+import math
 import sqlite3
-import bcrypt
 import logging
 
 logger = logging.getLogger(__name__)
@@ -59,7 +62,7 @@ def get_user_direct(username):
                 def check_password(self, password):
                     if self.auth_source == 'ldap' or not self.password_hash:
                         return False
-                    return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+                    return password_hasher.verify_password(password, self.password_hash)
                 
                 def is_authenticated(self):
                     return True
@@ -114,23 +117,35 @@ def authenticate_ldap_user(username, password):
     ldap_info = ldap_auth.authenticate(username, password)
     if not ldap_info:
         logger.warning(f"LDAP authentication failed for user: {username}")
+        if not ldap_auth.is_available():
+            return None, "Directory service temporarily unavailable, please try again later"
         return None, "LDAP authentication failed"
     
     logger.info(f"LDAP authentication successful for user: {username}")
     
-    # Check if user exists in local database
-    user = User.query.filter_by(username=username).first()
+    # Role flags mapped from directory groups (LDAP_ADMIN_GROUPS, LDAP_PI_GROUPS);
+    # left untouched when the groups could not be read (None)
+    groups = ldap_info.get('groups')
+    roles = ldap_auth.resolve_roles(groups) if groups is not None else {}
+    
+    # Check if user exists in local database (directory names ignore case)
+    user = User.find_by_username(username)
     
     if user:
         # Update existing user with LDAP info
+        changed = False
         if user.auth_source != 'ldap':
             # Convert local user to LDAP user
             user.auth_source = 'ldap'
             user.password_hash = None  # Clear local password
+            changed = True
         
-        user.update_from_ldap(ldap_info)
-        db.session.commit()
-        logger.info(f"Updated existing user {username} with LDAP info")
+        sync_interval = timedelta(seconds=current_app.config.get('LDAP_SYNC_INTERVAL', 3600))
+        if user.apply_ldap_roles(roles):
+            changed = True
+        if user.update_from_ldap(ldap_info, sync_interval) or changed:
+            db.session.commit()
+            logger.info(f"Updated existing user {username} with LDAP info")
     else:
         # Create new user from LDAP info
         if not current_app.config.get('AUTO_CREATE_LDAP_USERS', True):
@@ -138,12 +153,21 @@ def authenticate_ldap_user(username, password):
             return None, "User not found in local database"
         
         user = User.create_from_ldap(ldap_info)
+        user.apply_ldap_roles(roles)
         db.session.add(user)
         db.session.commit()
         logger.info(f"Created new user {username} from LDAP")
     
     return user, "LDAP authentication successful"
 
+def get_auth_source(username):
+    """Return the auth source that last authenticated username, or None if unknown"""
+    try:
+        user = User.find_by_username(username)
+    except Exception:
+        user = get_user_direct(username)
+    return user.auth_source if user else None
+
 def authenticate_user(username, password, auth_method='auto'):
     """
     Authenticate user with specified method or auto-detect
@@ -162,6 +186,10 @@ def authenticate_user(username, password, auth_method='auto'):
     elif auth_method == 'ldap':
         return authenticate_ldap_user(username, password)
     elif auth_method == 'auto':
+        # Users who last logged in through LDAP go straight to the directory
+        if current_app.config.get('ALLOW_LDAP_AUTH', True) and get_auth_source(username) == 'ldap':
+            return authenticate_ldap_user(username, password)
+        
         # Try local first, then LDAP
         if current_app.config.get('ALLOW_LOCAL_AUTH', True):
             user, message = authenticate_local_user(username, password)
@@ -190,14 +218,28 @@ def login():
         
         logger.info(f"Login attempt for user {username} with method {auth_method}")
         
-        # Check if user is in whitelist
-        current_authorized_users = get_authorized_users()
-        if username not in current_authorized_users:
+        # Throttle before any whitelist, hashing or directory work
+        retry_after = login_throttle.hit(username, login_throttle.client_ip(request))
+        if retry_after:
+            logger.warning(f"Login for {username} throttled, retry in {retry_after:.0f}s")
+            flash('Too many login attempts. Please wait a moment before trying again.', 'warning')
+            response = current_app.make_response((render_template('auth/login.html', form=form), 429))
+            response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+            return response
+        
+        # Check if user is in whitelist (directory names ignore case)
+        current_authorized_users = {name.lower() for name in get_authorized_users()}
+        if username.lower() not in current_authorized_users:
             flash('Access denied. Please contact an administrator if you believe you should have access.', 'error')
             return render_template('auth/login.html', form=form)
         
         # Authenticate user
-        user, message = authenticate_user(username, password, auth_method)
+        try:
+            user, message = authenticate_user(username, password, auth_method)
+        except PasswordHashingBusy:
+            logger.warning(f"Login for {username} rejected: password hashing pool busy")
+            flash('The server is busy. Please try again in a few seconds.', 'warning')
+            return render_template('auth/login.html', form=form), 503
         
         if not user:
             flash(f'Authentication failed: {message}', 'error')
@@ -10,10 +10,12 @@ class Config:
     SQLALCHEMY_DATABASE_URI = 'sqlite:///oncocentre.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     WTF_CSRF_ENABLED = True
+    # Run db.create_all() in create_app (otherwise use scripts/init_db.py)
+    AUTO_CREATE_SCHEMA = os.environ.get('AUTO_CREATE_SCHEMA', 'false').lower() == 'true'
     
     # LDAP Configuration
     LDAP_ENABLED = os.environ.get('LDAP_ENABLED', 'false').lower() == 'true'
-    LDAP_SERVER = os.environ.get('LDAP_SERVER', 'ldap://your-domain-controller.example.com')
+    LDAP_SERVER = os.environ.get('LDAP_SERVER', 'ldap://your-domain-controller.example.com')  # Comma-separated for several DCs
     LDAP_PORT = int(os.environ.get('LDAP_PORT', '389'))
     LDAP_USE_SSL = os.environ.get('LDAP_USE_SSL', 'false').lower() == 'true'
     LDAP_DOMAIN = os.environ.get('LDAP_DOMAIN', 'YOURDOMAIN')
@@ -23,16 +25,88 @@ class Config:
     LDAP_BIND_USER = os.environ.get('LDAP_BIND_USER', None)
     LDAP_BIND_PASSWORD = os.environ.get('LDAP_BIND_PASSWORD', None)
     LDAP_TIMEOUT = int(os.environ.get('LDAP_TIMEOUT', '10'))
+    LDAP_POOL_SIZE = int(os.environ.get('LDAP_POOL_SIZE', '4'))
+    LDAP_POOL_MAX_IDLE = int(os.environ.get('LDAP_POOL_MAX_IDLE', '300'))
+    LDAP_POOL_MAX_LIFETIME = int(os.environ.get('LDAP_POOL_MAX_LIFETIME', '3600'))
+    LDAP_POOL_CHECK_INTERVAL = int(os.environ.get('LDAP_POOL_CHECK_INTERVAL', '60'))
+    LDAP_SERVER_FAILURE_THRESHOLD = int(os.environ.get('LDAP_SERVER_FAILURE_THRESHOLD', '2'))
+    LDAP_SERVER_QUARANTINE = int(os.environ.get('LDAP_SERVER_QUARANTINE', '60'))
+    LDAP_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('LDAP_BREAKER_FAILURE_THRESHOLD', '5'))
+    LDAP_BREAKER_RECOVERY_TIMEOUT = int(os.environ.get('LDAP_BREAKER_RECOVERY_TIMEOUT', '30'))
+    LDAP_LOGIN_DEADLINE = float(os.environ.get('LDAP_LOGIN_DEADLINE', '15'))
+    LDAP_METHOD_HINT_SIZE = int(os.environ.get('LDAP_METHOD_HINT_SIZE', '1000'))
+    LDAP_NEGATIVE_CACHE_TTL = int(os.environ.get('LDAP_NEGATIVE_CACHE_TTL', '60'))
+    LDAP_NEGATIVE_CACHE_SIZE = int(os.environ.get('LDAP_NEGATIVE_CACHE_SIZE', '10000'))
+    LDAP_SYNC_INTERVAL = int(os.environ.get('LDAP_SYNC_INTERVAL', '3600'))
+    LDAP_ADMIN_GROUPS = os.environ.get('LDAP_ADMIN_GROUPS', '')  # group DNs or CNs separated by ';'
+    LDAP_PI_GROUPS = os.environ.get('LDAP_PI_GROUPS', '')
+    LDAP_GROUP_CACHE_TTL = int(os.environ.get('LDAP_GROUP_CACHE_TTL', '300'))
+    LDAP_GROUP_CACHE_SIZE = int(os.environ.get('LDAP_GROUP_CACHE_SIZE', '10000'))
+    LDAP_GET_INFO = os.environ.get('LDAP_GET_INFO', 'NONE').upper()  # NONE, DSA, SCHEMA or ALL
+    LDAP_SERVER_INFO_CACHE = os.environ.get('LDAP_SERVER_INFO_CACHE', '')
+    LDAP_STRATEGY = os.environ.get('LDAP_STRATEGY', 'sync').lower()  # 'sync' or 'async'
+    LDAP_SYNC_GROUPS = os.environ.get('LDAP_SYNC_GROUPS', '')  # group DNs separated by ';'
+    LDAP_SYNC_NESTED_GROUPS = os.environ.get('LDAP_SYNC_NESTED_GROUPS', 'false').lower() == 'true'
+    LDAP_SYNC_PAGE_SIZE = int(os.environ.get('LDAP_SYNC_PAGE_SIZE', '500'))
+    LDAP_SYNC_BATCH_SIZE = int(os.environ.get('LDAP_SYNC_BATCH_SIZE', '500'))
     
     # Authentication settings
     ALLOW_LOCAL_AUTH = os.environ.get('ALLOW_LOCAL_AUTH', 'true').lower() == 'true'
     ALLOW_LDAP_AUTH = os.environ.get('ALLOW_LDAP_AUTH', 'true').lower() == 'true'
     AUTO_CREATE_LDAP_USERS = os.environ.get('AUTO_CREATE_LDAP_USERS', 'true').lower() == 'true'
 
+    # Password hashing pool (0 workers = hash on the request thread)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '8'))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', '5'))
+
+    # Login throttling: token buckets per username and per client IP
+    LOGIN_THROTTLE_ENABLED = os.environ.get('LOGIN_THROTTLE_ENABLED', 'true').lower() == 'true'
+    LOGIN_THROTTLE_BACKEND = os.environ.get('LOGIN_THROTTLE_BACKEND', 'memory')  # 'memory' or 'database'
+    LOGIN_THROTTLE_USER_RATE = float(os.environ.get('LOGIN_THROTTLE_USER_RATE', '5'))  # attempts per minute
+    LOGIN_THROTTLE_USER_BURST = int(os.environ.get('LOGIN_THROTTLE_USER_BURST', '5'))
+    LOGIN_THROTTLE_IP_RATE = float(os.environ.get('LOGIN_THROTTLE_IP_RATE', '30'))
+    LOGIN_THROTTLE_IP_BURST = int(os.environ.get('LOGIN_THROTTLE_IP_BURST', '30'))
+    LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get('LOGIN_THROTTLE_MAX_KEYS', '10000'))
+    LOGIN_THROTTLE_PROXY_COUNT = int(os.environ.get('LOGIN_THROTTLE_PROXY_COUNT', '0'))  # trusted reverse proxies
+
+    # Compression of dynamic text responses (HTML, JSON)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))  # bytes
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+    COMPRESS_BR_LEVEL = int(os.environ.get('COMPRESS_BR_LEVEL', '4'))  # 0-11; high levels cost too much per request
+
+    # Templates: compiled bytecode shared by workers, {% cache %} fragments per worker
+    TEMPLATE_BYTECODE_CACHE = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'true').lower() == 'true'
+    TEMPLATE_BYTECODE_CACHE_DIR = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR', '')  # default: system temp dir
+    TEMPLATE_FRAGMENT_CACHE_TTL = int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_TTL', '600'))  # 0 disables
+    TEMPLATE_FRAGMENT_CACHE_SIZE = int(os.environ.get('TEMPLATE_FRAGMENT_CACHE_SIZE', '5000'))
+
+    # Patients fetched per database round trip while streaming /patients
+    PATIENT_LIST_CHUNK_SIZE = int(os.environ.get('PATIENT_LIST_CHUNK_SIZE', '500'))
+
+    # Sequence numbers each worker leases at a time for new oncocentre IDs
+    # (unused ones at shutdown become gaps unless no other worker leased since)
+    ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', '20'))
+
+    # Digits of the NNNNN part of ONCOCENTRE_YYYY_NNNNN, and what happens
+    # past 10**width - 1 inclusions in a year: 'widen' (more digits) or 'error'
+    ONCOCENTRE_ID_WIDTH = int(os.environ.get('ONCOCENTRE_ID_WIDTH', '5'))
+    ONCOCENTRE_ID_OVERFLOW = os.environ.get('ONCOCENTRE_ID_OVERFLOW', 'widen')
+
+    # How long a client may retry a patient creation with the same Idempotency-Key
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))  # seconds
+
+    # JSON API page sizes (GET /api/v1/patients?limit=)
+    API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '100'))
+    API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '1000'))
+    API_BULK_MAX_ITEMS = int(os.environ.get('API_BULK_MAX_ITEMS', '500'))  # POST /api/v1/patients/bulk
+
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///oncocentre.db'
+    AUTO_CREATE_SCHEMA = True
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -43,6 +117,8 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_WORKERS = 0
+    AUTO_CREATE_SCHEMA = True
 
 # Configuration mapping
 config = {
@@ -2,13 +2,20 @@
 Utility functions for the CARPEM Oncocentre application
 """
 
-from .crypto import encrypt_data, decrypt_data, cipher_suite
-from .utils import generate_oncocentre_id, validate_patient_data
+from .crypto import encrypt_data, decrypt_data, get_cipher_suite
+from .utils import generate_oncocentre_id, preview_oncocentre_id, validate_patient_data
+
+def __getattr__(name):
+    # The cipher is created lazily (see crypto.get_cipher_suite)
+    if name == 'cipher_suite':
+        return get_cipher_suite()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'encrypt_data',
     'decrypt_data', 
     'cipher_suite',
     'generate_oncocentre_id',
+    'preview_oncocentre_id',
     'validate_patient_data'
 ]
\ No newline at end of file
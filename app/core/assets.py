@@ -0,0 +1,162 @@
+"""
+Fingerprinted, precompressed static assets
+
+scripts/build_assets.py copies every file under static/ to static/dist/
+with a content hash in its name, writes gzip (and brotli, when installed)
+variants of compressible files and records the mapping in
+static/dist/manifest.json.
+
+Templates call asset_url('css/style.css'): with a manifest it returns the
+fingerprinted URL, otherwise (development) the plain static URL. Fingerprinted
+files never change, so they are served with a one-year immutable cache
+lifetime, and the precompressed variant matching Accept-Encoding is sent
+without compressing anything per request.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+
+from flask import request, url_for, send_from_directory
+
+from .encoding import (ENCODING_SUFFIXES, supported_encodings, is_compressible, guess_mimetype,
+                       compress, negotiate_encoding)
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class AssetPipeline:
+    """Manifest lookup for templates and the static file view"""
+
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.assets = {}
+        self.fingerprinted = {}
+        self._exists = {}
+        self._send_static_file = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Load the manifest and take over the static endpoint"""
+        self.static_folder = app.static_folder
+        self._exists = {}
+        self.load_manifest(app.config.get('ASSETS_MANIFEST') or
+                           os.path.join(self.static_folder, DIST_DIR, MANIFEST_NAME))
+        self._send_static_file = app.send_static_file
+        if 'static' in app.view_functions:
+            app.view_functions['static'] = self.send_static_file
+        app.add_template_global(self.asset_url, 'asset_url')
+        app.extensions['assets'] = self
+
+    def load_manifest(self, path):
+        """Read a manifest written by build_manifest(); a missing file disables fingerprinting"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.assets = json.load(f)['assets']
+        except FileNotFoundError:
+            self.assets = {}
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Ignoring unreadable asset manifest {path}: {e}")
+            self.assets = {}
+        # Fingerprinted path -> encodings available for it
+        self.fingerprinted = {entry['path']: tuple(entry.get('encodings', ())) for entry in self.assets.values()}
+
+    def _static_file_exists(self, filename):
+        if filename not in self._exists:
+            self._exists[filename] = os.path.isfile(os.path.join(self.static_folder, filename))
+        return self._exists[filename]
+
+    def asset_url(self, filename, fallback=None):
+        """URL of a static asset, fingerprinted when built
+
+        Args:
+            filename (str): path relative to static/
+            fallback (str): URL used when the file is absent (e.g. a CDN copy
+                of a vendored library that has not been downloaded)
+        """
+        entry = self.assets.get(filename)
+        if entry is not None:
+            return url_for('static', filename=entry['path'])
+        if fallback and not self._static_file_exists(filename):
+            return fallback
+        return url_for('static', filename=filename)
+
+    def send_static_file(self, filename):
+        """Static view: immutable, precompressed responses for fingerprinted files"""
+        encodings = self.fingerprinted.get(filename)
+        if encodings is None:
+            return self._send_static_file(filename)
+
+        encoding = negotiate_encoding(request, encodings)
+        path = filename + ENCODING_SUFFIXES[encoding] if encoding else filename
+        response = send_from_directory(self.static_folder, path, mimetype=guess_mimetype(filename),
+                                       max_age=IMMUTABLE_MAX_AGE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+
+def build_manifest(static_folder, clean=False):
+    """Fingerprint and precompress every file under static_folder
+
+    Args:
+        static_folder (str): the application's static directory
+        clean (bool): remove previously built files first; by default they
+            are kept so that pages cached by browsers keep working
+
+    Returns:
+        dict: the manifest's assets (logical path -> entry)
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    if clean and os.path.isdir(dist):
+        shutil.rmtree(dist)
+
+    assets = {}
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder) and DIST_DIR in dirs:
+            dirs.remove(DIST_DIR)
+        dirs.sort()
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            stem, ext = os.path.splitext(logical)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            fingerprinted = f'{DIST_DIR}/{stem}.{digest}{ext}'
+            target = os.path.join(static_folder, *fingerprinted.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(source, target)
+
+            encodings = []
+            if is_compressible(guess_mimetype(name)):
+                for encoding in supported_encodings():
+                    compressed = compress(data, encoding)
+                    # Only keep variants that actually save bytes
+                    if len(compressed) < len(data):
+                        with open(target + ENCODING_SUFFIXES[encoding], 'wb') as f:
+                            f.write(compressed)
+                        encodings.append(encoding)
+
+            assets[logical] = {'path': fingerprinted, 'size': len(data), 'encodings': encodings}
+
+    os.makedirs(dist, exist_ok=True)
+    with open(os.path.join(dist, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'assets': assets}, f, indent=2, sort_keys=True)
+    return assets
+
+
+# Global instance, configured by create_app()
+asset_pipeline = AssetPipeline()
@@ -0,0 +1,110 @@
+"""
+Circuit breaker for calls to external services (LDAP directory)
+
+After failure_threshold consecutive infrastructure failures the breaker opens
+and callers fail fast instead of waiting out connect timeouts. Once
+recovery_timeout seconds have passed, a single probe call is let through
+(half-open): its success closes the breaker, its failure re-opens it.
+"""
+
+import threading
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open circuit breaker"""
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_failure = None
+        self._last_state_change = datetime.utcnow()
+        self._rejected = 0
+
+    def _set_state(self, state):
+        if state != self._state:
+            logger.warning(f"Circuit breaker '{self.name}' {self._state} -> {state}")
+            self._state = state
+            self._last_state_change = datetime.utcnow()
+
+    @property
+    def state(self):
+        """Current state, accounting for an elapsed recovery timeout"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """Return True if a call may proceed now"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self._rejected += 1
+                    return False
+                self._set_state(HALF_OPEN)
+            # Half-open: let exactly one probe through
+            if self._probe_in_flight:
+                self._rejected += 1
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """The service answered; close the breaker"""
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        """The service was unreachable or too slow"""
+        with self._lock:
+            self._consecutive_failures += 1
+            self._last_failure = f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} UTC: {error}" if error else None
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+            self._probe_in_flight = False
+
+    def record_ignored(self):
+        """The call failed for a reason unrelated to the service (e.g. a bug)
+
+        Neither closes nor opens the breaker, but lets the next probe through.
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self):
+        """Return the breaker state for display"""
+        state = self.state
+        with self._lock:
+            retry_in = 0
+            if state == OPEN:
+                retry_in = max(0, round(self.recovery_timeout - (time.monotonic() - self._opened_at)))
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'retry_in': retry_in,
+                'rejected': self._rejected,
+                'last_failure': self._last_failure,
+                'last_state_change': self._last_state_change
+            }
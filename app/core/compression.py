@@ -0,0 +1,91 @@
+"""
+Compression of dynamic responses
+
+Text responses (HTML, JSON, CSV...) of at least COMPRESS_MIN_SIZE bytes are
+compressed with the best encoding the client accepts. Streamed responses
+are compressed chunk by chunk. Responses that already carry a
+Content-Encoding (precompressed static assets), file responses and
+non-text types are left alone.
+"""
+
+import logging
+
+from flask import request
+
+from .encoding import supported_encodings, is_compressible, compress, compress_stream, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCompressor:
+    """after_request hook compressing eligible responses"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.min_size = 1024
+        self.levels = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure from application settings and register the hook"""
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.levels = {
+            'gzip': app.config.get('COMPRESS_GZIP_LEVEL', 6),
+            'br': app.config.get('COMPRESS_BR_LEVEL', 4)
+        }
+        app.after_request(self.compress_response)
+        app.extensions['compressor'] = self
+
+    def _eligible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        if response.cache_control.no_transform:
+            return False
+        return is_compressible(response.mimetype)
+
+    def compress_response(self, response):
+        """Compress response in place when the client accepts it"""
+        if not self.enabled or not self._eligible(response):
+            return response
+
+        if not response.is_streamed and len(response.get_data()) < self.min_size:
+            return response
+
+        # Whatever is decided, caches must key on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request, supported_encodings())
+        if encoding is None:
+            return response
+
+        level = self.levels.get(encoding)
+        if response.is_streamed:
+            response.response = _close_after(compress_stream(response.response, encoding, level),
+                                             response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data(), encoding, level))
+        response.headers['Content-Encoding'] = encoding
+
+        # The compressed bytes differ from the identity representation
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _close_after(chunks, original):
+    """Yield chunks, then close the original response iterable"""
+    try:
+        yield from chunks
+    finally:
+        close = getattr(original, 'close', None)
+        if close is not None:
+            close()
+
+
+# Global instance, configured by create_app()
+response_compressor = ResponseCompressor()
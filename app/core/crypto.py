@@ -2,8 +2,8 @@
 Encryption utilities for sensitive patient data
 """
 
-from cryptography.fernet import Fernet
 import os
+import threading
 
 def get_encryption_key():
     """Get or create encryption key for database fields"""
@@ -14,21 +14,40 @@ def get_encryption_key():
         with open(key_path, 'rb') as key_file:
             return key_file.read()
     else:
+        from cryptography.fernet import Fernet
         key = Fernet.generate_key()
         with open(key_path, 'wb') as key_file:
             key_file.write(key)
         return key
 
-# Initialize encryption
-ENCRYPTION_KEY = get_encryption_key()
-cipher_suite = Fernet(ENCRYPTION_KEY)
+# Encryption is initialised on first use, not at import
+_cipher_suite = None
+_cipher_lock = threading.Lock()
+
+def get_cipher_suite():
+    """Return the Fernet cipher, loading the key on first call"""
+    global _cipher_suite
+    if _cipher_suite is None:
+        with _cipher_lock:
+            if _cipher_suite is None:
+                from cryptography.fernet import Fernet
+                _cipher_suite = Fernet(get_encryption_key())
+    return _cipher_suite
+
+def __getattr__(name):
+    # cipher_suite and ENCRYPTION_KEY used to be module globals
+    if name == 'cipher_suite':
+        return get_cipher_suite()
+    if name == 'ENCRYPTION_KEY':
+        return get_encryption_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def encrypt_data(data):
     """Encrypt sensitive data"""
     if isinstance(data, str):
-        return cipher_suite.encrypt(data.encode()).decode()
-    return cipher_suite.encrypt(str(data).encode()).decode()
+        return get_cipher_suite().encrypt(data.encode()).decode()
+    return get_cipher_suite().encrypt(str(data).encode()).decode()
 
 def decrypt_data(encrypted_data):
     """Decrypt sensitive data"""
-    return cipher_suite.decrypt(encrypted_data.encode()).decode()
\ No newline at end of file
+    return get_cipher_suite().decrypt(encrypted_data.encode()).decode()
\ No newline at end of file
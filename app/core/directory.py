@@ -0,0 +1,46 @@
+"""
+Lazy access to the shared LDAP authenticator
+
+Views import ldap_auth from here rather than from ldap_auth.py so that
+ldap3 is only imported, and the authenticator only built, on the first
+directory call. Deployments that never use LDAP never load it.
+"""
+
+import os
+import threading
+
+from werkzeug.local import LocalProxy
+
+_authenticator = None
+_authenticator_lock = threading.Lock()
+
+
+def get_ldap_authenticator():
+    """Return the shared LDAP authenticator, creating it on first use"""
+    global _authenticator
+    if _authenticator is None:
+        with _authenticator_lock:
+            if _authenticator is None:
+                if os.environ.get('LDAP_STRATEGY', 'sync').lower() == 'async':
+                    from .ldap_async import AsyncLDAPAuthenticator
+                    _authenticator = AsyncLDAPAuthenticator()
+                else:
+                    from .ldap_auth import LDAPAuthenticator
+                    _authenticator = LDAPAuthenticator()
+    return _authenticator
+
+
+# Global LDAP authenticator instance (created lazily)
+ldap_auth = LocalProxy(get_ldap_authenticator)
+
+
+def reset_ldap_authenticator():
+    """Forget the shared authenticator without closing its connections
+
+    Called in a freshly forked worker: sockets inherited from the parent
+    must not be used or unbound by the child, which builds its own
+    authenticator on first use.
+    """
+    global _authenticator
+    with _authenticator_lock:
+        _authenticator = None
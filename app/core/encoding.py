@@ -0,0 +1,96 @@
+"""
+Content-Encoding helpers shared by static assets and dynamic responses
+
+Brotli is optional: without the brotli package only gzip is produced and
+negotiated.
+"""
+
+import gzip
+import zlib
+import mimetypes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Suffix of the precompressed file for each encoding, in order of preference
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'application/vnd.ms-fontobject', 'font/ttf', 'font/otf'
+)
+
+
+def supported_encodings():
+    """Encodings this installation can produce, best first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def is_compressible(mimetype):
+    """True for text-like content that benefits from compression"""
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def compress(data, encoding, level=None):
+    """Compress bytes with the given encoding ('br' or 'gzip')"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    raise ValueError(f"Unsupported encoding {encoding!r}")
+
+
+def compress_stream(chunks, encoding, level=None):
+    """Compress an iterable of byte chunks incrementally
+
+    Each chunk is flushed as soon as it is compressed so that a streamed
+    page still reaches the browser progressively.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=11 if level is None else level)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    elif encoding == 'gzip':
+        # wbits=31: zlib stream with a gzip header and trailer
+        compressor = zlib.compressobj(9 if level is None else level, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    else:
+        raise ValueError(f"Unsupported encoding {encoding!r}")
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            data = process(chunk) + flush()
+            if data:
+                yield data
+    yield finish()
+
+
+def negotiate_encoding(request, available):
+    """Pick the best encoding from available for the request's Accept-Encoding
+
+    Args:
+        request: Flask/Werkzeug request
+        available (iterable): encodings the response can be sent in
+
+    Returns:
+        str or None: chosen encoding, None for the uncompressed representation
+    """
+    accept = request.accept_encodings
+    best, best_quality = None, 0
+    # ENCODING_SUFFIXES order breaks ties in favour of brotli
+    for encoding in ENCODING_SUFFIXES:
+        if encoding not in available:
+            continue
+        quality = accept[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
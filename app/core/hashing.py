@@ -0,0 +1,138 @@
+"""
+Password hashing offloaded to a bounded process pool
+
+bcrypt is deliberately CPU-expensive. Running it on the request thread lets a
+burst of logins starve every other request served by the same worker, so
+hashing and verification are submitted to a small process pool instead. The
+number of in-flight operations is capped; when the cap is reached, or a queued
+operation waits longer than the configured timeout, PasswordHashingBusy is
+raised so the caller can answer "try again" immediately.
+"""
+
+import threading
+import logging
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool is saturated or the wait timed out"""
+
+
+def _hashpw(password):
+    """Hash a password (runs in a pool worker process)"""
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def _checkpw(password, password_hash):
+    """Verify a password against a bcrypt hash (runs in a pool worker process)"""
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Bounded executor for bcrypt hashing and verification"""
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.queue_limit = 0
+        self.timeout = 5.0
+        self._slots = None
+        self._executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the pool from application settings"""
+        self.shutdown()
+        self.workers = int(app.config.get('PASSWORD_HASH_WORKERS', 0))
+        self.queue_limit = int(app.config.get('PASSWORD_HASH_QUEUE_LIMIT', 0))
+        self.timeout = float(app.config.get('PASSWORD_HASH_TIMEOUT', 5.0))
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit) if self.workers > 0 else None
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        """Create the process pool on first use (never in a preforking master)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        """Drop a broken pool so the next call starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func, *args):
+        """Run func in the pool, enforcing the queue limit and wait timeout"""
+        if self._slots is None:
+            # Pool disabled (tests, scripts): hash inline
+            return func(*args)
+
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Password hashing pool saturated, rejecting request")
+            raise PasswordHashingBusy("Too many concurrent password checks")
+
+        # Until submit() succeeds no done-callback will release the slot
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(func, *args)
+        except (BrokenProcessPool, RuntimeError, OSError) as e:
+            self._slots.release()
+            logger.error(f"Password hashing pool unavailable: {e}")
+            if executor is not None:
+                self._reset_executor(executor)
+            raise PasswordHashingBusy("Password hashing pool unavailable")
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # The slot is held until the work really finishes, even if we stop
+        # waiting for it, so timed-out jobs still count against the limit
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.warning(f"Password hashing did not complete within {self.timeout}s")
+            raise PasswordHashingBusy("Password check timed out")
+        except BrokenProcessPool as e:
+            logger.error(f"Password hashing pool broke: {e}")
+            self._reset_executor(executor)
+            raise PasswordHashingBusy("Password hashing pool unavailable")
+
+    def hash_password(self, password):
+        """Return a bcrypt hash for password"""
+        return self._run(_hashpw, password)
+
+    def verify_password(self, password, password_hash):
+        """Check password against a bcrypt hash"""
+        if not password_hash:
+            return False
+        return self._run(_checkpw, password, password_hash)
+
+    def shutdown(self):
+        """Stop the worker processes, if any were started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def reset_after_fork(self):
+        """Forget a pool and locks inherited from the parent process"""
+        self._executor = None
+        self._lock = threading.Lock()
+        if self._slots is not None:
+            self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+
+
+# Global hasher instance, configured by create_app()
+password_hasher = PasswordHasher()
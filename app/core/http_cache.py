@@ -0,0 +1,60 @@
+"""
+Conditional GET for HTML pages
+
+A view computes cheap validators (counters, ids, the viewer's roles) and
+calls conditional_page() before running its real queries. When the
+browser's If-None-Match still matches, a 304 is returned without loading
+or decrypting anything; otherwise the rendered page is sent with the ETag
+and Cache-Control: private, no-cache so the browser revalidates every time.
+"""
+
+import os
+import hashlib
+from functools import lru_cache
+
+from flask import request, session, current_app, make_response
+
+
+@lru_cache(maxsize=8)
+def _template_stamp(template_folder):
+    """Latest template modification time: a deployment changes every ETag"""
+    latest = 0
+    for root, _, files in os.walk(template_folder):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+
+def page_etag(*parts):
+    """ETag for a page whose content is determined by parts"""
+    stamp = _template_stamp(current_app.template_folder) if current_app.template_folder else 0
+    return hashlib.sha1(repr((stamp,) + parts).encode('utf-8')).hexdigest()[:20]
+
+
+def conditional_page(*parts):
+    """Compute the page ETag and check it against If-None-Match
+
+    Returns:
+        tuple: (etag, response) where response is a 304 to return as is,
+            or None if the page must be rendered
+    """
+    etag = page_etag(*parts)
+    # Pending flash messages are part of the page and consumed by rendering it
+    if session.get('_flashes') or not request.if_none_match.contains_weak(etag):
+        return etag, None
+    response = make_response('', 304)
+    _set_validators(response, etag)
+    return etag, response
+
+
+def cached_page(body, etag):
+    """Response for a freshly rendered page carrying its ETag"""
+    response = make_response(body)
+    _set_validators(response, etag)
+    return response
+
+
+def _set_validators(response, etag):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
@@ -0,0 +1,233 @@
+"""
+Asynchronous LDAP authentication using ldap3's ASYNC strategy
+
+With the synchronous authenticator a login holds its worker thread for the
+whole directory exchange. Here every directory request is sent without
+waiting and its response is polled from an asyncio event loop running in a
+background thread, so that one loop keeps many logins in flight at once:
+
+- user searches are multiplexed over a single service-account connection;
+- each user bind is sent on its own connection and its response awaited
+  without blocking; only the TCP connect runs in an executor thread.
+
+Only search-bind is supported: NTLM binds need a multi-step exchange that
+ldap3 performs synchronously. Select it with LDAP_STRATEGY=async.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+import logging
+
+from ldap3 import Connection, ASYNC, SIMPLE
+from ldap3.core.exceptions import LDAPCommunicationError, LDAPResponseTimeoutError, LDAPBindError
+from ldap3.operation.bind import bind_operation
+
+from .ldap_auth import LDAPAuthenticator, DIRECTORY_UNAVAILABLE_ERRORS
+
+logger = logging.getLogger(__name__)
+
+USER_ATTRIBUTES = ['sAMAccountName', 'displayName', 'mail', 'givenName', 'sn', 'memberOf']
+
+
+class _EventLoopThread:
+    """An asyncio event loop running forever in a daemon thread"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.pid = os.getpid()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='ldap-async', daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result
+
+        On timeout the coroutine is cancelled: it would otherwise keep its
+        connection and report its own outcome after the caller gave up.
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class AsyncLDAPAuthenticator(LDAPAuthenticator):
+    """LDAP authenticator whose logins run on a shared asyncio event loop
+
+    Configuration, server selection, circuit breaker and caches are those of
+    LDAPAuthenticator; only authenticate() changes.
+    """
+
+    def __init__(self, config=None, client_strategy=ASYNC, poll_interval=0.002):
+        self.client_strategy = client_strategy
+        self.poll_interval = poll_interval
+        self._loop_thread = None
+        self._loop_lock = threading.Lock()
+        self._service_conn = None
+        self._service_lock = None
+        super().__init__(config)
+
+    def _event_loop(self):
+        """The background loop, recreated after a fork"""
+        with self._loop_lock:
+            if self._loop_thread is None or self._loop_thread.pid != os.getpid():
+                self._loop_thread = _EventLoopThread()
+                self._service_conn = None
+                self._service_lock = None
+            return self._loop_thread
+
+    def authenticate(self, username, password):
+        """Authenticate on the event loop; blocks only the calling thread"""
+        if not self._may_authenticate(username, password):
+            return None
+        timeout = self.config.get('login_deadline', 15) + self.config['timeout']
+        try:
+            return self._event_loop().run(self._authenticate(username, password), timeout)
+        except concurrent.futures.TimeoutError as e:
+            logger.error(f"LDAP authentication for {username} did not complete in {timeout}s")
+            self.breaker.record_failure(e)
+            return None
+
+    async def authenticate_async(self, username, password):
+        """Authenticate from a coroutine running on the authenticator's loop"""
+        if not self._may_authenticate(username, password):
+            return None
+        return await self._authenticate(username, password)
+
+    async def _authenticate(self, username, password):
+        deadline = time.monotonic() + self.config.get('login_deadline', 15)
+        try:
+            user_info = await self._search_bind(username, password, deadline)
+        except DIRECTORY_UNAVAILABLE_ERRORS as e:
+            logger.error(f"LDAP directory unavailable while authenticating {username}: {e}")
+            self.breaker.record_failure(e)
+            return None
+        except Exception as e:
+            # Not a sign of an unavailable directory: leave the breaker alone
+            logger.exception(f"LDAP authentication error for user {username}: {e}")
+            self.breaker.record_ignored()
+            return None
+        return self._authenticated(username, user_info)
+
+    async def _wait(self, conn, message_id, deadline):
+        """Poll for the response to message_id without blocking the loop"""
+        delay = self.poll_interval
+        while True:
+            try:
+                return conn.get_response(message_id, timeout=0)
+            except LDAPResponseTimeoutError:
+                self._remaining(deadline)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+
+    async def _open(self, deadline, user=None, password=None):
+        """Open a connection, failing over between servers like _connect()"""
+        loop = asyncio.get_running_loop()
+        last_error = None
+        for _ in range(len(self.server)):
+            remaining = self._remaining(deadline)
+            conn = Connection(self._server_within(remaining), user=user, password=password,
+                              client_strategy=self.client_strategy,
+                              receive_timeout=min(remaining, self.config['timeout']))
+            started = time.monotonic()
+            try:
+                await loop.run_in_executor(None, conn.open)
+            except LDAPCommunicationError as e:
+                logger.warning(f"LDAP server {conn.server.name} unavailable: {e}")
+                self.server.record_failure(conn.server)
+                last_error = e
+                continue
+            self.server.record_success(conn.server, time.monotonic() - started)
+            return conn
+        raise last_error
+
+    async def _bind(self, conn, user, password, deadline):
+        """Send a simple bind and await its result without blocking"""
+        request = bind_operation(conn.version, SIMPLE, user, password, auto_encode=conn.auto_encode)
+        message_id = conn.strategy.post_send_single_response(conn.strategy.send('bindRequest', request, None))
+        _, result = await self._wait(conn, message_id, deadline)
+        return result['result'] == 0
+
+    async def _close(self, conn):
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, conn.unbind)
+        except Exception:
+            pass
+
+    async def _shared_connection(self, deadline):
+        """The shared connection used for user searches"""
+        if self._service_lock is None:
+            self._service_lock = asyncio.Lock()
+        async with self._service_lock:
+            conn = self._service_conn
+            if conn is not None and not conn.closed:
+                return conn
+            conn = await self._open(deadline)
+            if self.config['bind_user'] and self.config['bind_password']:
+                if not await self._bind(conn, self.config['bind_user'], self.config['bind_password'], deadline):
+                    await self._close(conn)
+                    raise LDAPBindError("LDAP service account bind failed")
+            self._service_conn = conn
+            return conn
+
+    async def _search(self, username, deadline):
+        """Search for a user entry; retried once on a fresh service connection"""
+        search_filter = self.config['user_search_filter'].format(username=username)
+        for attempt in range(2):
+            conn = await self._shared_connection(deadline)
+            try:
+                message_id = conn.search(
+                    search_base=self.config['user_search_base'],
+                    search_filter=search_filter,
+                    attributes=USER_ATTRIBUTES
+                )
+                response, _ = await self._wait(conn, message_id, deadline)
+                entries = [entry for entry in response or [] if entry.get('type') == 'searchResEntry']
+                return entries[0] if entries else None
+            except LDAPCommunicationError as e:
+                if self._service_conn is conn:
+                    self._service_conn = None
+                await self._close(conn)
+                if attempt:
+                    raise
+                logger.info(f"Retrying LDAP search for {username} after connection error: {e}")
+
+    async def _search_bind(self, username, password, deadline):
+        entry = await self._search(username, deadline)
+        if entry is None:
+            logger.warning(f"User {username} not found in LDAP")
+            self._unknown_users.set(self._normalize_username(username), True)
+            return None
+
+        conn = await self._open(deadline)
+        try:
+            if not await self._bind(conn, entry['dn'], password, deadline):
+                logger.debug(f"Search bind authentication failed for {username}")
+                return None
+        finally:
+            await self._close(conn)
+
+        logger.info(f"LDAP authentication successful for {username} (async search bind)")
+        return self.build_user_info(username, entry['dn'], entry['attributes'])
+
+    def close(self):
+        """Stop the event loop and close the shared connection"""
+        with self._loop_lock:
+            loop_thread, self._loop_thread = self._loop_thread, None
+        if loop_thread is None:
+            return
+        if self._service_conn is not None:
+            try:
+                self._service_conn.unbind()
+            except Exception:
+                pass
+            self._service_conn = None
+        loop_thread.stop()
@@ -1,16 +1,47 @@
 """
 LDAP Authentication module for CARPEM Oncocentre
 Provides authentication against Active Directory/LDAP servers
+
+The shared authenticator is created on first use through ldap_auth (see
+directory.py), so LDAP-disabled deployments never build a server.
 """
 
 import ldap3
-from ldap3 import Server, Connection, ALL, NTLM, SIMPLE
-from ldap3.core.exceptions import LDAPException
+from ldap3 import Server, Connection, ALL, DSA, SCHEMA, NONE, NTLM, SIMPLE
+from ldap3.protocol.rfc4512 import DsaInfo, SchemaInfo
+from ldap3.core.exceptions import (LDAPException, LDAPCommunicationError, LDAPBindError,
+                                   LDAPResponseTimeoutError)
+from .ldap_pool import LDAPConnectionPool, LatencyAwareServerPool, LDAPPoolExhausted
+from .circuit_breaker import CircuitBreaker, CLOSED
+from .cache import TTLCache
+from collections import OrderedDict
 import os
+import re
+import copy
+import time
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+class LDAPDeadlineExceeded(LDAPException):
+    """Raised when a login has used up its time budget for directory calls"""
+
+# Errors meaning the directory is unreachable or too slow, as opposed to a
+# rejected bind, which proves the directory is answering
+DIRECTORY_UNAVAILABLE_ERRORS = (
+    LDAPCommunicationError,
+    LDAPResponseTimeoutError,
+    LDAPPoolExhausted,
+    LDAPDeadlineExceeded
+)
+
+# LDAP_GET_INFO values: what ldap3 reads from the server root DSE / schema
+GET_INFO_LEVELS = {'NONE': NONE, 'DSA': DSA, 'SCHEMA': SCHEMA, 'ALL': ALL}
+
+# Bind methods tried by authenticate(), in their default order
+AUTH_METHODS = ('domain', 'search_bind')
+
 class LDAPAuthenticator:
     """LDAP authentication handler"""
     
@@ -18,7 +49,29 @@ class LDAPAuthenticator:
         """Initialize LDAP authenticator with configuration"""
         self.config = config or self._get_default_config()
         self.server = None
-        self._initialize_server()
+        self.pool = None
+        # Bind method that last worked, per user and for the whole deployment
+        self._method_hints = OrderedDict()
+        self._preferred_method = None
+        self._hints_lock = threading.Lock()
+        # Usernames the directory recently reported as nonexistent
+        self._unknown_users = TTLCache(
+            self.config.get('negative_cache_ttl', 60),
+            maxsize=self.config.get('negative_cache_size', 10000)
+        )
+        # Recently resolved group memberships
+        self._group_cache = TTLCache(
+            self.config.get('group_cache_ttl', 300),
+            maxsize=self.config.get('group_cache_size', 10000)
+        )
+        self.breaker = CircuitBreaker(
+            'ldap',
+            failure_threshold=self.config.get('breaker_failure_threshold', 5),
+            recovery_timeout=self.config.get('breaker_recovery_timeout', 30)
+        )
+        self._server_info_lock = threading.Lock()
+        if self.config['enabled']:
+            self._initialize_server()
     
     def _get_default_config(self):
         """Get LDAP configuration from environment variables"""
@@ -33,23 +86,215 @@ class LDAPAuthenticator:
             'bind_user': os.environ.get('LDAP_BIND_USER', None),  # Optional service account
             'bind_password': os.environ.get('LDAP_BIND_PASSWORD', None),
             'timeout': int(os.environ.get('LDAP_TIMEOUT', '10')),
-            'enabled': os.environ.get('LDAP_ENABLED', 'true').lower() == 'true'
+            'enabled': os.environ.get('LDAP_ENABLED', 'true').lower() == 'true',
+            'pool_size': int(os.environ.get('LDAP_POOL_SIZE', '4')),
+            'pool_max_idle': int(os.environ.get('LDAP_POOL_MAX_IDLE', '300')),
+            'pool_max_lifetime': int(os.environ.get('LDAP_POOL_MAX_LIFETIME', '3600')),
+            'pool_check_interval': int(os.environ.get('LDAP_POOL_CHECK_INTERVAL', '60')),
+            'server_failure_threshold': int(os.environ.get('LDAP_SERVER_FAILURE_THRESHOLD', '2')),
+            'server_quarantine': int(os.environ.get('LDAP_SERVER_QUARANTINE', '60')),
+            'breaker_failure_threshold': int(os.environ.get('LDAP_BREAKER_FAILURE_THRESHOLD', '5')),
+            'breaker_recovery_timeout': int(os.environ.get('LDAP_BREAKER_RECOVERY_TIMEOUT', '30')),
+            'login_deadline': float(os.environ.get('LDAP_LOGIN_DEADLINE', '15')),
+            'method_hint_size': int(os.environ.get('LDAP_METHOD_HINT_SIZE', '1000')),
+            'negative_cache_ttl': int(os.environ.get('LDAP_NEGATIVE_CACHE_TTL', '60')),
+            'negative_cache_size': int(os.environ.get('LDAP_NEGATIVE_CACHE_SIZE', '10000')),
+            'group_cache_ttl': int(os.environ.get('LDAP_GROUP_CACHE_TTL', '300')),
+            'group_cache_size': int(os.environ.get('LDAP_GROUP_CACHE_SIZE', '10000')),
+            'admin_groups': os.environ.get('LDAP_ADMIN_GROUPS', ''),
+            'pi_groups': os.environ.get('LDAP_PI_GROUPS', ''),
+            'get_info': os.environ.get('LDAP_GET_INFO', 'NONE').upper(),
+            'server_info_cache': os.environ.get('LDAP_SERVER_INFO_CACHE', '')
         }
     
     def _initialize_server(self):
-        """Initialize LDAP server connection"""
+        """Initialize LDAP server pool (LDAP_SERVER may list several controllers)"""
         try:
-            self.server = Server(
-                self.config['server'],
-                port=self.config['port'],
-                use_ssl=self.config['use_ssl'],
-                get_info=ALL,
-                connect_timeout=self.config['timeout']
+            hosts = [host.strip() for host in self.config['server'].split(',') if host.strip()]
+            if not hosts:
+                raise ValueError("LDAP_SERVER is empty")
+            get_info = self.config.get('get_info', 'NONE')
+            if get_info not in GET_INFO_LEVELS:
+                raise ValueError(f"Invalid LDAP_GET_INFO {get_info!r}, expected one of {', '.join(GET_INFO_LEVELS)}")
+            servers = [
+                Server(
+                    host,
+                    port=self.config['port'],
+                    use_ssl=self.config['use_ssl'],
+                    get_info=GET_INFO_LEVELS[get_info],
+                    connect_timeout=self.config['timeout']
+                )
+                for host in hosts
+            ]
+            for server in servers:
+                self._load_server_info(server)
+            self.server = LatencyAwareServerPool(
+                servers,
+                failure_threshold=self.config.get('server_failure_threshold', 2),
+                quarantine_seconds=self.config.get('server_quarantine', 60)
             )
-            logger.info(f"LDAP server initialized: {self.config['server']}:{self.config['port']}")
+            logger.info(f"LDAP server pool initialized: {', '.join(server.name for server in servers)}")
         except Exception as e:
             logger.error(f"Failed to initialize LDAP server: {e}")
             self.server = None
+            return
+        
+        self.pool = LDAPConnectionPool(
+            self._service_connection,
+            size=self.config.get('pool_size', 4),
+            max_idle=self.config.get('pool_max_idle', 300),
+            max_lifetime=self.config.get('pool_max_lifetime', 3600),
+            check_interval=self.config.get('pool_check_interval', 60),
+            acquire_timeout=self.config['timeout']
+        )
+    
+    def _server_info_paths(self, server):
+        """Cache files for a server's DSA and schema info, or None if not caching"""
+        cache_dir = self.config.get('server_info_cache')
+        if not cache_dir:
+            return None
+        name = re.sub(r'[^A-Za-z0-9.-]+', '_', server.name)
+        return (os.path.join(cache_dir, f'{name}.dsa.json'),
+                os.path.join(cache_dir, f'{name}.schema.json'))
+    
+    def _load_server_info(self, server):
+        """Attach server info cached on disk so it is not read from the server"""
+        paths = self._server_info_paths(server)
+        if server.get_info == NONE or paths is None or not all(os.path.exists(path) for path in paths):
+            return
+        try:
+            dsa_path, schema_path = paths
+            schema = SchemaInfo.from_file(schema_path)
+            server.attach_dsa_info(DsaInfo.from_file(dsa_path, schema))
+            server.attach_schema_info(schema)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable LDAP server info cache for {server.name}: {e}")
+            return
+        server.get_info = NONE
+        logger.info(f"Loaded LDAP server info for {server.name} from {dsa_path}")
+    
+    def _remember_server_info(self, server):
+        """Keep server info read on the first bind instead of re-reading it on every bind"""
+        with self._server_info_lock:
+            if server.get_info == NONE or (server.info is None and server.schema is None):
+                return
+            server.get_info = NONE
+        paths = self._server_info_paths(server)
+        if paths is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+            if server.info is not None:
+                server.info.to_file(paths[0])
+            if server.schema is not None:
+                server.schema.to_file(paths[1])
+        except Exception as e:
+            logger.warning(f"Could not cache LDAP server info for {server.name}: {e}")
+    
+    @staticmethod
+    def _remaining(deadline):
+        """Seconds left before deadline (None if unbounded)"""
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LDAPDeadlineExceeded("LDAP login deadline exceeded")
+        return remaining
+    
+    def _server_within(self, remaining):
+        """Server to connect to, with a connect timeout of at most remaining seconds"""
+        if remaining is None or remaining >= self.config['timeout']:
+            return self.server
+        # The pool's Server objects are shared between threads: shorten the
+        # timeout on a copy of the controller the pool would pick
+        server = copy.copy(self.server.ranked_servers()[0])
+        server.connect_timeout = remaining
+        return server
+    
+    def _connect(self, user=None, password=None, deadline=None, **kwargs):
+        """Open and bind a new connection, failing over between servers"""
+        last_error = None
+        for _ in range(len(self.server)):
+            remaining = self._remaining(deadline)
+            if remaining is not None:
+                # Never wait for a response beyond the login's time budget
+                kwargs['receive_timeout'] = min(remaining, self.config['timeout'])
+            conn = Connection(self._server_within(remaining), user=user, password=password, **kwargs)
+            started = time.monotonic()
+            try:
+                conn.open()
+            except LDAPCommunicationError as e:
+                # Unreachable or slow controller: count it and try the next one
+                logger.warning(f"LDAP server {conn.server.name} unavailable: {e}")
+                self.server.record_failure(conn.server)
+                last_error = e
+                continue
+            self.server.record_success(conn.server, time.monotonic() - started)
+            break
+        else:
+            raise last_error
+        
+        if not conn.bind():
+            conn.unbind()
+            raise LDAPBindError(f"LDAP bind failed: {conn.result}")
+        self._remember_server_info(conn.server)
+        return conn
+    
+    def _service_connection(self):
+        """Open a connection bound with the service account (or anonymously)"""
+        if self.config['bind_user'] and self.config['bind_password']:
+            return self._connect(self.config['bind_user'], self.config['bind_password'])
+        return self._connect()
+    
+    def _search_user(self, username, attributes, deadline=None):
+        """Search for a user entry over a pooled service-account connection"""
+        search_filter = self.config['user_search_filter'].format(username=username)
+        for attempt in range(2):
+            try:
+                with self.pool.connection(timeout=self._remaining(deadline)) as conn:
+                    conn.search(
+                        search_base=self.config['user_search_base'],
+                        search_filter=search_filter,
+                        attributes=attributes
+                    )
+                    return conn.entries[0] if conn.entries else None
+            except LDAPCommunicationError as e:
+                # A pooled connection may have been dropped by the server;
+                # retry once on a freshly opened one
+                if attempt:
+                    raise
+                logger.info(f"Retrying LDAP search for {username} after connection error: {e}")
+    
+    def _method_order(self, username):
+        """Bind methods to try, starting with the one that last worked"""
+        with self._hints_lock:
+            first = self._method_hints.get(username.lower()) or self._preferred_method
+        if first is None:
+            return list(AUTH_METHODS)
+        return [first] + [method for method in AUTH_METHODS if method != first]
+    
+    def _remember_method(self, username, method):
+        """Record the bind method that authenticated username"""
+        key = username.lower()
+        with self._hints_lock:
+            self._method_hints[key] = method
+            self._method_hints.move_to_end(key)
+            while len(self._method_hints) > self.config.get('method_hint_size', 1000):
+                self._method_hints.popitem(last=False)
+            self._preferred_method = method
+    
+    @staticmethod
+    def _normalize_username(username):
+        """Key used for per-user caches (sAMAccountName is case-insensitive)"""
+        return username.strip().lower()
+    
+    def is_known_unknown(self, username):
+        """True if the directory recently reported username as nonexistent"""
+        return self._normalize_username(username) in self._unknown_users
+    
+    def forget_unknown_user(self, username):
+        """Drop a cached "not found" result, e.g. after the account was created"""
+        self._unknown_users.pop(self._normalize_username(username))
     
     def is_enabled(self):
         """Check if LDAP authentication is enabled"""
@@ -66,45 +311,78 @@ class LDAPAuthenticator:
         Returns:
             dict: User information if successful, None if failed
         """
-        if not self.is_enabled():
-            logger.warning("LDAP authentication is disabled")
+        if not self._may_authenticate(username, password):
             return None
         
-        if not username or not password:
-            logger.warning("Username or password is empty")
-            return None
+        # Total time budget for every directory call made by this login
+        deadline = time.monotonic() + self.config.get('login_deadline', 15)
+        
+        methods = {
+            'domain': self._authenticate_domain_user,       # direct bind with DOMAIN\username
+            'search_bind': self._authenticate_search_bind   # search for the DN, then bind
+        }
         
         try:
-            # Try different authentication methods
+            # Try the method that last worked first, then the other one
             user_info = None
+            for method in self._method_order(username):
+                user_info = methods[method](username, password, deadline)
+                if user_info:
+                    self._remember_method(username, method)
+                    break
+                if self.is_known_unknown(username):
+                    # The search found no such account, no other bind can succeed
+                    break
             
-            # Method 1: Direct bind with domain\username
-            user_info = self._authenticate_domain_user(username, password)
-            
-            # Method 2: Search and bind (if method 1 fails)
-            if not user_info:
-                user_info = self._authenticate_search_bind(username, password)
-            
-            return user_info
-            
+        except DIRECTORY_UNAVAILABLE_ERRORS as e:
+            logger.error(f"LDAP directory unavailable while authenticating {username}: {e}")
+            self.breaker.record_failure(e)
+            return None
         except Exception as e:
-            logger.error(f"LDAP authentication error for user {username}: {e}")
+            # Not a sign of an unavailable directory: leave the breaker alone
+            logger.exception(f"LDAP authentication error for user {username}: {e}")
+            self.breaker.record_ignored()
             return None
+        
+        return self._authenticated(username, user_info)
+    
+    def _may_authenticate(self, username, password):
+        """Checks made before any directory traffic for a login"""
+        if not self.is_enabled():
+            logger.warning("LDAP authentication is disabled")
+            return False
+        
+        if not username or not password:
+            logger.warning("Username or password is empty")
+            return False
+        
+        # Do not search the directory again for a name it just reported missing
+        if self.is_known_unknown(username):
+            logger.info(f"LDAP user {username} recently not found, skipping directory lookup")
+            return False
+        
+        # Fail fast while the directory is known to be down
+        if not self.breaker.allow_request():
+            logger.warning(f"LDAP circuit breaker open, not authenticating {username}")
+            return False
+        return True
     
-    def _authenticate_domain_user(self, username, password):
+    def _authenticated(self, username, user_info):
+        """Bookkeeping once the directory answered a login"""
+        self.breaker.record_success()
+        # groups is None when the memberships could not be read: cache nothing
+        if user_info and user_info.get('groups') is not None:
+            self._group_cache.set(self._normalize_username(username), list(user_info['groups']))
+        return user_info
+    
+    def _authenticate_domain_user(self, username, password, deadline=None):
         """Authenticate using domain\\username format"""
         try:
             # Format: DOMAIN\\username or username@domain.com
             domain_username = f"{self.config['domain']}\\\\{username}"
             
-            conn = Connection(
-                self.server,
-                user=domain_username,
-                password=password,
-                authentication=NTLM,
-                auto_bind=True,
-                raise_exceptions=True
-            )
+            conn = self._connect(domain_username, password, deadline=deadline,
+                                 authentication=NTLM, raise_exceptions=True)
             
             # Get user information
             user_info = self._get_user_info(conn, username)
@@ -113,72 +391,67 @@ class LDAPAuthenticator:
             logger.info(f"LDAP authentication successful for {username} (domain bind)")
             return user_info
             
+        except DIRECTORY_UNAVAILABLE_ERRORS:
+            raise
         except LDAPException as e:
             logger.debug(f"Domain authentication failed for {username}: {e}")
             return None
     
-    def _authenticate_search_bind(self, username, password):
+    def _authenticate_search_bind(self, username, password, deadline=None):
         """Authenticate by searching for user DN then binding"""
         try:
-            # First, bind with service account (if configured) or anonymous
-            if self.config['bind_user'] and self.config['bind_password']:
-                search_conn = Connection(
-                    self.server,
-                    user=self.config['bind_user'],
-                    password=self.config['bind_password'],
-                    auto_bind=True
-                )
-            else:
-                search_conn = Connection(self.server, auto_bind=True)
-            
-            # Search for user
-            search_filter = self.config['user_search_filter'].format(username=username)
-            search_conn.search(
-                search_base=self.config['user_search_base'],
-                search_filter=search_filter,
-                attributes=['distinguishedName', 'sAMAccountName', 'displayName', 
-                           'mail', 'givenName', 'sn', 'memberOf']
+            # Search for user over a pooled service-account connection
+            user_entry = self._search_user(
+                username,
+                ['distinguishedName', 'sAMAccountName', 'displayName',
+                 'mail', 'givenName', 'sn', 'memberOf'],
+                deadline
             )
             
-            if not search_conn.entries:
+            if user_entry is None:
                 logger.warning(f"User {username} not found in LDAP")
-                search_conn.unbind()
+                self._unknown_users.set(self._normalize_username(username), True)
                 return None
             
             # Get user DN
-            user_entry = search_conn.entries[0]
-            user_dn = user_entry.distinguishedName.value
-            search_conn.unbind()
+            user_dn = user_entry.entry_dn
             
             # Now bind with user credentials
-            user_conn = Connection(
-                self.server,
-                user=user_dn,
-                password=password,
-                auto_bind=True,
-                raise_exceptions=True
-            )
+            user_conn = self._connect(user_dn, password, deadline=deadline, raise_exceptions=True)
             
             # Create user info from LDAP attributes
-            user_info = {
-                'username': username,
-                'dn': user_dn,
-                'display_name': getattr(user_entry.displayName, 'value', username),
-                'email': getattr(user_entry.mail, 'value', ''),
-                'first_name': getattr(user_entry.givenName, 'value', ''),
-                'last_name': getattr(user_entry.sn, 'value', ''),
-                'groups': [group for group in getattr(user_entry.memberOf, 'values', [])],
-                'auth_source': 'ldap'
-            }
+            user_info = self.build_user_info(username, user_dn, user_entry.entry_attributes_as_dict)
             
             user_conn.unbind()
             logger.info(f"LDAP authentication successful for {username} (search bind)")
             return user_info
             
+        except DIRECTORY_UNAVAILABLE_ERRORS:
+            raise
         except LDAPException as e:
             logger.debug(f"Search bind authentication failed for {username}: {e}")
             return None
     
+    @staticmethod
+    def build_user_info(username, dn, attributes):
+        """Build the user info dict from a search result's attributes"""
+        def single(name, default=''):
+            value = attributes.get(name)
+            if isinstance(value, (list, tuple)):
+                value = value[0] if value else None
+            return value if value is not None else default
+        
+        return {
+            'username': username,
+            'dn': dn,
+            'display_name': single('displayName', username),
+            'email': single('mail'),
+            'first_name': single('givenName'),
+            'last_name': single('sn'),
+            'groups': list(attributes.get('memberOf') or []),
+            'auth_source': 'ldap'
+        }
+    
     def _get_user_info(self, conn, username):
         """Extract user information from LDAP connection"""
         try:
@@ -207,14 +480,14 @@ class LDAPAuthenticator:
         except Exception as e:
             logger.error(f"Error getting user info for {username}: {e}")
         
-        # Fallback user info
+        # Fallback user info; groups None means unknown, so roles are left as they are
         return {
             'username': username,
             'display_name': username,
             'email': '',
             'first_name': '',
             'last_name': '',
-            'groups': [],
+            'groups': None,
             'auth_source': 'ldap'
         }
     
@@ -225,7 +498,7 @@ class LDAPAuthenticator:
         
         try:
             # Try to connect
-            conn = Connection(self.server, auto_bind=True)
+            conn = self._connect()
             conn.unbind()
             return True, "LDAP connection successful"
         except Exception as e:
@@ -236,35 +509,92 @@ class LDAPAuthenticator:
         if not self.is_enabled():
             return []
         
+        if self.is_known_unknown(username):
+            return []
+        
+        key = self._normalize_username(username)
+        cached = self._group_cache.get(key)
+        if cached is not None:
+            return list(cached)
+        
+        if not self.breaker.allow_request():
+            logger.warning(f"LDAP circuit breaker open, not fetching groups for {username}")
+            return []
+        
         try:
-            if self.config['bind_user'] and self.config['bind_password']:
-                conn = Connection(
-                    self.server,
-                    user=self.config['bind_user'],
-                    password=self.config['bind_password'],
-                    auto_bind=True
-                )
-            else:
-                conn = Connection(self.server, auto_bind=True)
-            
-            search_filter = self.config['user_search_filter'].format(username=username)
-            conn.search(
-                search_base=self.config['user_search_base'],
-                search_filter=search_filter,
-                attributes=['memberOf']
-            )
-            
-            if conn.entries:
-                groups = getattr(conn.entries[0].memberOf, 'values', [])
-                conn.unbind()
+            entry = self._search_user(username, ['memberOf'])
+            self.breaker.record_success()
+            if entry is not None:
+                groups = list(getattr(entry.memberOf, 'values', []))
+                self._group_cache.set(key, groups)
                 return groups
-            
-            conn.unbind()
+            self._unknown_users.set(key, True)
             return []
             
+        except DIRECTORY_UNAVAILABLE_ERRORS as e:
+            logger.error(f"LDAP directory unavailable while getting groups for {username}: {e}")
+            self.breaker.record_failure(e)
+            return []
         except Exception as e:
-            logger.error(f"Error getting groups for {username}: {e}")
+            logger.exception(f"Error getting groups for {username}: {e}")
+            self.breaker.record_ignored()
             return []
 
-# Global LDAP authenticator instance
-ldap_auth = LDAPAuthenticator()
\ No newline at end of file
+    @staticmethod
+    def _parse_groups(value):
+        """Lower-cased group names from a ';'-separated setting"""
+        return {group.strip().lower() for group in (value or '').split(';') if group.strip()}
+    
+    @staticmethod
+    def _group_names(group_dn):
+        """A memberOf value matches by full DN or by its CN"""
+        dn = group_dn.strip().lower()
+        first_rdn = dn.split(',', 1)[0]
+        names = {dn}
+        if first_rdn.startswith('cn='):
+            names.add(first_rdn[3:])
+        return names
+    
+    def resolve_roles(self, groups):
+        """Map memberOf values to User role flags
+        
+        Only roles with configured groups (LDAP_ADMIN_GROUPS, LDAP_PI_GROUPS)
+        appear in the result, so unmapped flags stay under manual control.
+        
+        Returns:
+            dict: {'is_admin': bool, 'is_principal_investigator': bool} (subset)
+        """
+        names = set()
+        for group in groups or []:
+            names |= self._group_names(group)
+        
+        return {flag: bool(names & mapped) for flag, mapped in self._role_groups().items()}
+    
+    def _role_groups(self):
+        """{role flag: configured group names} for the mapped roles"""
+        role_groups = {}
+        for flag, setting in (('is_admin', 'admin_groups'), ('is_principal_investigator', 'pi_groups')):
+            mapped = self._parse_groups(self.config.get(setting))
+            if mapped:
+                role_groups[flag] = mapped
+        return role_groups
+    
+    def mapped_roles(self):
+        """Role flags managed by directory groups"""
+        return set(self._role_groups())
+    
+    def is_available(self):
+        """False while the circuit breaker is rejecting directory calls"""
+        return self.breaker.state == CLOSED
+    
+    def status(self):
+        """Directory health for the admin dashboard"""
+        return {
+            'enabled': self.is_enabled(),
+            'breaker': self.breaker.snapshot(),
+            'servers': self.server.server_stats() if self.server is not None else [],
+            'pool': self.pool.stats() if self.pool is not None else None
+        }
+
+# Shared instance, created on first use (see directory.py)
+from .directory import get_ldap_authenticator, ldap_auth
\ No newline at end of file
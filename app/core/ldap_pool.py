@@ -0,0 +1,240 @@
+"""
+Connection and server pooling for LDAP
+
+Searching for a user DN requires a connection bound with the service account
+(or anonymously). Opening one per login costs a TCP/TLS handshake plus a bind
+round trip, so pre-bound connections are kept in a small thread-safe pool,
+health-checked when they have been idle for a while and recycled once they
+exceed their idle or lifetime limits.
+
+When several domain controllers are configured, LatencyAwareServerPool picks
+the fastest healthy one and quarantines controllers that keep failing.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+from ldap3 import BASE, FIRST, ServerPool
+from ldap3.core.exceptions import LDAPException
+
+logger = logging.getLogger(__name__)
+
+
+class LDAPPoolExhausted(LDAPException):
+    """Raised when no pooled connection became available in time"""
+
+
+class _PooledConnection:
+    """A bound connection with its bookkeeping timestamps"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+
+class LDAPConnectionPool:
+    """Thread-safe pool of pre-bound LDAP connections"""
+
+    def __init__(self, factory, size=4, max_idle=300, max_lifetime=3600,
+                 check_interval=60, acquire_timeout=10):
+        """
+        Args:
+            factory (callable): Returns a new, bound ldap3 Connection
+            size (int): Maximum number of connections (idle + in use)
+            max_idle (float): Seconds after which an idle connection is closed
+            max_lifetime (float): Seconds after which a connection is recycled
+            check_interval (float): Idle seconds before a health check on checkout
+            acquire_timeout (float): Seconds to wait for a free connection
+        """
+        self._factory = factory
+        self.size = size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.acquire_timeout = acquire_timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _is_expired(self, pooled, now):
+        """Check idle and lifetime limits"""
+        return (now - pooled.last_used > self.max_idle or
+                now - pooled.created_at > self.max_lifetime)
+
+    def _is_healthy(self, pooled):
+        """Cheap liveness probe: a base-scope read of the root DSE"""
+        conn = pooled.conn
+        if conn.closed or not conn.bound:
+            return False
+        try:
+            conn.search('', '(objectClass=*)', search_scope=BASE, attributes=['1.1'])
+        except LDAPException as e:
+            logger.debug(f"Pooled LDAP connection failed health check: {e}")
+            return False
+        pooled.last_checked = time.monotonic()
+        return True
+
+    def _discard(self, pooled):
+        """Close a connection, ignoring errors from an already dead socket"""
+        try:
+            pooled.conn.unbind()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        """Return a usable pooled connection, creating one if needed"""
+        while True:
+            with self._lock:
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                return _PooledConnection(self._factory())
+
+            now = time.monotonic()
+            if self._is_expired(pooled, now):
+                self._discard(pooled)
+                continue
+            if now - pooled.last_checked > self.check_interval and not self._is_healthy(pooled):
+                self._discard(pooled)
+                continue
+            return pooled
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a bound connection; it is returned to the pool on success"""
+        if timeout is None:
+            timeout = self.acquire_timeout
+        if not self._slots.acquire(timeout=min(timeout, self.acquire_timeout)):
+            raise LDAPPoolExhausted("No pooled LDAP connection available")
+        pooled = None
+        try:
+            pooled = self._checkout()
+            yield pooled.conn
+        except Exception:
+            # The connection may be in an unknown state, do not reuse it
+            if pooled is not None:
+                self._discard(pooled)
+            raise
+        else:
+            pooled.last_used = time.monotonic()
+            with self._lock:
+                self._idle.append(pooled)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection (e.g. after fork or on shutdown)"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def stats(self):
+        """Return a snapshot of pool usage"""
+        with self._lock:
+            idle = len(self._idle)
+        return {'size': self.size, 'idle': idle}
+
+
+class _ServerStats:
+    """Connection latency and failure history for one domain controller"""
+
+    def __init__(self, order):
+        self.order = order
+        self.latency = None
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.quarantined_until = 0.0
+
+
+class LatencyAwareServerPool(ServerPool):
+    """ldap3 ServerPool that routes to the fastest healthy server
+
+    Every connection attempt reports back through record_success() or
+    record_failure(). Servers are ranked by smoothed connect latency; a
+    server that just failed drops behind the others, and one that fails
+    failure_threshold times in a row is quarantined for quarantine_seconds.
+    """
+
+    def __init__(self, servers, failure_threshold=2, quarantine_seconds=60, smoothing=0.3):
+        super().__init__(servers, pool_strategy=FIRST, active=False, exhaust=False)
+        self.failure_threshold = failure_threshold
+        self.quarantine_seconds = quarantine_seconds
+        self.smoothing = smoothing
+        self._stats_lock = threading.Lock()
+        self._stats = {server.name: _ServerStats(order) for order, server in enumerate(self.servers)}
+
+    def _rank(self, server, now):
+        stats = self._stats[server.name]
+        quarantined = stats.quarantined_until > now
+        return (
+            quarantined,
+            stats.quarantined_until if quarantined else 0.0,
+            stats.consecutive_failures > 0,
+            stats.latency or 0.0,
+            stats.order
+        )
+
+    def ranked_servers(self):
+        """Servers in the order they should be tried"""
+        now = time.monotonic()
+        with self._stats_lock:
+            return sorted(self.servers, key=lambda server: self._rank(server, now))
+
+    # ldap3 keeps a ServerPoolState per connection forever; selection here is
+    # driven by the shared statistics instead, so no per-connection state
+    def initialize(self, connection):
+        pass
+
+    def get_server(self, connection):
+        return self.ranked_servers()[0]
+
+    def get_current_server(self, connection):
+        return self.ranked_servers()[0]
+
+    def record_success(self, server, latency):
+        """Record a successful connection and its connect latency (seconds)"""
+        with self._stats_lock:
+            stats = self._stats.get(server.name)
+            if stats is None:
+                return
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency += self.smoothing * (latency - stats.latency)
+            stats.consecutive_failures = 0
+            stats.quarantined_until = 0.0
+
+    def record_failure(self, server):
+        """Record a failed connection; quarantine the server past the threshold"""
+        with self._stats_lock:
+            stats = self._stats.get(server.name)
+            if stats is None:
+                return
+            stats.consecutive_failures += 1
+            stats.total_failures += 1
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.quarantined_until = time.monotonic() + self.quarantine_seconds
+                logger.warning(f"LDAP server {server.name} quarantined for {self.quarantine_seconds}s "
+                               f"after {stats.consecutive_failures} consecutive failures")
+
+    def server_stats(self):
+        """Return a snapshot of per-server health for display"""
+        now = time.monotonic()
+        snapshot = []
+        with self._stats_lock:
+            for server in self.servers:
+                stats = self._stats[server.name]
+                snapshot.append({
+                    'server': server.name,
+                    'latency_ms': round(stats.latency * 1000, 1) if stats.latency is not None else None,
+                    'consecutive_failures': stats.consecutive_failures,
+                    'total_failures': stats.total_failures,
+                    'quarantined': stats.quarantined_until > now,
+                    'quarantine_remaining': max(0, round(stats.quarantined_until - now))
+                })
+        return snapshot
@@ -0,0 +1,218 @@
+"""
+Directory synchronisation for CARPEM Oncocentre
+
+Pre-provisions LDAP users and their whitelist entries from the members of
+configured Active Directory groups, so first logins do not have to create
+accounts and the whitelist follows the directory. Members are read with
+Simple Paged Results searches; the database is updated in batched
+transactions. Admin and PI flags follow the group-to-role mapping.
+
+Accounts the sync provisioned (those whose whitelist entry it created) are
+deactivated once they leave every synced group. Usernames whitelisted by
+hand or through AUTHORIZED_USERS are left alone. Usernames are matched
+case-insensitively, as the directory does.
+
+Run it periodically with scripts/sync_ldap_directory.py.
+"""
+
+from datetime import timedelta
+import logging
+
+from ldap3.utils.conv import escape_filter_chars
+
+from .models import db, User, WhitelistEntry
+
+logger = logging.getLogger(__name__)
+
+# Description of whitelist entries managed by the sync; entries added by
+# hand, and their users, are never deactivated by it
+SYNC_DESCRIPTION = 'Synchronised from directory groups'
+
+
+def is_sync_managed(entry):
+    """Whether a whitelist entry was created by the directory sync"""
+    return entry is not None and entry.description == SYNC_DESCRIPTION
+
+# Matching rule that makes Active Directory expand nested group membership
+LDAP_MATCHING_RULE_IN_CHAIN = '1.2.840.113556.1.4.1941'
+
+USER_ATTRIBUTES = ['sAMAccountName', 'displayName', 'mail', 'givenName', 'sn', 'memberOf']
+
+
+class DirectorySync:
+    """Synchronise users and whitelist entries with directory group members"""
+
+    def __init__(self, authenticator, groups, page_size=500, batch_size=500,
+                 nested_groups=False, sync_interval=None):
+        """
+        Args:
+            authenticator (LDAPAuthenticator): Provides the pooled service connection
+            groups (list): DNs of the groups whose members get access
+            page_size (int): Entries per Simple Paged Results page
+            batch_size (int): Rows written per database transaction
+            nested_groups (bool): Include members of nested groups (Active Directory only)
+            sync_interval (timedelta): Passed to User.update_from_ldap
+        """
+        self.authenticator = authenticator
+        self.groups = [group for group in groups if group]
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.nested_groups = nested_groups
+        self.sync_interval = sync_interval
+
+    def _member_filter(self):
+        rule = f':{LDAP_MATCHING_RULE_IN_CHAIN}:' if self.nested_groups else ''
+        clauses = ''.join(f'(memberOf{rule}={escape_filter_chars(group)})' for group in self.groups)
+        return f'(&(objectClass=person)(|{clauses}))'
+
+    def fetch_members(self):
+        """Return {lower-cased username: user info} for every member of the groups"""
+        config = self.authenticator.config
+        members = {}
+        with self.authenticator.pool.connection() as conn:
+            results = conn.extend.standard.paged_search(
+                search_base=config['user_search_base'],
+                search_filter=self._member_filter(),
+                attributes=USER_ATTRIBUTES,
+                paged_size=self.page_size,
+                generator=True
+            )
+            for result in results:
+                if result.get('type') != 'searchResEntry':
+                    continue  # referrals
+                attributes = result['attributes']
+                username = attributes.get('sAMAccountName')
+                if isinstance(username, (list, tuple)):
+                    username = username[0] if username else None
+                if not username:
+                    continue
+                members[username.lower()] = self.authenticator.build_user_info(
+                    username, result['dn'], attributes
+                )
+        return members
+
+    def _apply(self, items, apply, dry_run):
+        """Call apply(item) for each item, committing every batch_size changes"""
+        pending = 0
+        for item in items:
+            if apply(item):
+                pending += 1
+            if pending >= self.batch_size and not dry_run:
+                db.session.commit()
+                pending = 0
+        if dry_run:
+            db.session.flush()
+        elif pending:
+            db.session.commit()
+
+    def run(self, created_by_id, deactivate_leavers=True, dry_run=False):
+        """Synchronise the database with the directory
+
+        Args:
+            created_by_id (int): Admin user recorded as creator of whitelist entries
+            deactivate_leavers (bool): Deactivate provisioned LDAP users no longer in any group
+            dry_run (bool): Compute the changes but roll them back
+
+        Returns:
+            dict: Counters of created, updated, whitelisted and deactivated accounts
+        """
+        if not self.groups:
+            raise ValueError("No directory groups configured for synchronisation")
+
+        members = self.fetch_members()
+        stats = {'members': len(members), 'created': 0, 'updated': 0,
+                 'reactivated': 0, 'whitelisted': 0, 'deactivated': 0}
+
+        users = {user.username.lower(): user for user in User.query.all()}
+        whitelist = {entry.username.lower(): entry for entry in WhitelistEntry.query.all()}
+
+        def upsert_user(item):
+            key, user_info = item
+            user = users.get(key)
+            roles = self.authenticator.resolve_roles(user_info['groups'])
+            if user is None:
+                user = User.create_from_ldap(user_info)
+                user.apply_ldap_roles(roles)
+                db.session.add(user)
+                users[key] = user
+                stats['created'] += 1
+                return True
+            if user.auth_source != 'ldap':
+                return False  # local accounts are managed by hand
+            changed = user.apply_ldap_roles(roles)
+            changed = user.update_from_ldap(user_info, self.sync_interval) or changed
+            if not user.is_active:
+                user.is_active = True
+                stats['reactivated'] += 1
+                changed = True
+            if changed:
+                stats['updated'] += 1
+            return changed
+
+        def upsert_whitelist(item):
+            key, user_info = item
+            entry = whitelist.get(key)
+            if entry is None:
+                entry = WhitelistEntry(username=user_info['username'], created_by=created_by_id,
+                                       description=SYNC_DESCRIPTION, is_active=True)
+                db.session.add(entry)
+                whitelist[key] = entry
+            elif not entry.is_active:
+                entry.is_active = True
+            else:
+                return False
+            stats['whitelisted'] += 1
+            return True
+
+        def deactivate(key):
+            entry = whitelist.get(key)
+            if not is_sync_managed(entry):
+                return False  # whitelisted by hand, or never provisioned by the sync
+            changed = False
+            user = users.get(key)
+            if user is not None and user.auth_source == 'ldap' and user.is_active:
+                user.is_active = False
+                stats['deactivated'] += 1
+                changed = True
+            if entry.is_active:
+                entry.is_active = False
+                changed = True
+            return changed
+
+        # Keep the loaded rows usable across batch commits instead of
+        # reloading each one with its own SELECT
+        session = db.session()
+        expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
+        try:
+            self._apply(sorted(members.items()), upsert_user, dry_run)
+            self._apply(sorted(members.items()), upsert_whitelist, dry_run)
+
+            if deactivate_leavers:
+                if members:
+                    leavers = sorted(set(whitelist) - set(members))
+                    self._apply(leavers, deactivate, dry_run)
+                else:
+                    # An empty result is far more likely a misconfigured group
+                    # or search base than everybody leaving
+                    logger.warning("Directory sync found no members, not deactivating anyone")
+        finally:
+            session.expire_on_commit = expire_on_commit
+            if dry_run:
+                db.session.rollback()
+
+        logger.info(f"Directory sync: {stats}")
+        return stats
+
+def sync_from_config(app, authenticator, created_by_id, **kwargs):
+    """Build a DirectorySync from the application configuration and run it"""
+    config = app.config
+    groups = [group.strip() for group in config.get('LDAP_SYNC_GROUPS', '').split(';')]
+    sync = DirectorySync(
+        authenticator,
+        groups,
+        page_size=config.get('LDAP_SYNC_PAGE_SIZE', 500),
+        batch_size=config.get('LDAP_SYNC_BATCH_SIZE', 500),
+        nested_groups=config.get('LDAP_SYNC_NESTED_GROUPS', False),
+        sync_interval=timedelta(seconds=config.get('LDAP_SYNC_INTERVAL', 3600))
+    )
+    return sync.run(created_by_id, **kwargs)
@@ -1,12 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, validates
 from flask_login import UserMixin
 from datetime import datetime
-import bcrypt
-from cryptography.fernet import Fernet
 import os
 import base64
+import hashlib
+import hmac
+import threading
+import logging
+from .hashing import password_hasher
+from .sequence import parse_oncocentre_id
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 def get_encryption_key():
     """Get or create encryption key for database fields"""
@@ -15,17 +23,46 @@ def get_encryption_key():
         with open(key_path, 'rb') as key_file:
             return key_file.read()
     else:
+        from cryptography.fernet import Fernet
         key = Fernet.generate_key()
         with open(key_path, 'wb') as key_file:
             key_file.write(key)
         return key
 
-ENCRYPTION_KEY = get_encryption_key()
-cipher_suite = Fernet(ENCRYPTION_KEY)
+_cipher_suite = None
+_cipher_lock = threading.Lock()
+
+def get_cipher_suite():
+    """Fernet cipher for patient fields, loaded on first use rather than at import"""
+    global _cipher_suite
+    if _cipher_suite is None:
+        with _cipher_lock:
+            if _cipher_suite is None:
+                from cryptography.fernet import Fernet
+                _cipher_suite = Fernet(get_encryption_key())
+    return _cipher_suite
+
+_index_key = None
+
+def blind_index(value):
+    """Keyed hash of a value stored encrypted, for equality lookups
+
+    Fernet tokens are randomised, so ciphertexts cannot be compared. The
+    HMAC key is derived from the encryption key, so the index stays valid
+    as long as the data can be decrypted, whatever happens to SECRET_KEY.
+    """
+    global _index_key
+    if _index_key is None:
+        with _cipher_lock:
+            if _index_key is None:
+                _index_key = hashlib.sha256(b'oncocentre-blind-index:' + get_encryption_key()).digest()
+    return hmac.new(_index_key, str(value).encode('utf-8'), hashlib.sha256).hexdigest()
 
 class User(UserMixin, db.Model):
     """User model for authentication and user management"""
 
+    __resource__ = 'users'  # see ResourceVersion
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=True)  # Nullable for LDAP users
@@ -45,8 +82,7 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Hash and set password"""
-        salt = bcrypt.gensalt()
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+        self.password_hash = password_hasher.hash_password(password)
 
     def check_password(self, password):
         """Check if provided password matches hash"""
@@ -55,13 +91,21 @@ class User(UserMixin, db.Model):
             return False
         if not self.password_hash:
             return False
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.verify_password(password, self.password_hash)
 
     @property
     def patient_count(self):
         """Get the number of patients created by this user"""
         return Patient.query.filter_by(created_by=self.id).count()
 
+    @classmethod
+    def find_by_username(cls, username):
+        """User named username, ignoring case as the directory does (exact match first)"""
+        user = cls.query.filter_by(username=username).first()
+        if user is None and username:
+            user = cls.query.filter(db.func.lower(cls.username) == username.lower()).first()
+        return user
+
     @classmethod
     def create_from_ldap(cls, ldap_info):
         """Create a new user from LDAP information"""
@@ -78,14 +122,51 @@ class User(UserMixin, db.Model):
         )
         return user
 
-    def update_from_ldap(self, ldap_info):
-        """Update user information from LDAP"""
-        self.email = ldap_info.get('email', self.email)
-        self.first_name = ldap_info.get('first_name', self.first_name)
-        self.last_name = ldap_info.get('last_name', self.last_name)
-        self.display_name = ldap_info.get('display_name', self.display_name)
-        self.ldap_dn = ldap_info.get('dn', self.ldap_dn)
-        self.last_ldap_sync = datetime.utcnow()
+    # User column -> ldap_info key
+    LDAP_ATTRIBUTES = {
+        'email': 'email',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'display_name': 'display_name',
+        'ldap_dn': 'dn'
+    }
+
+    def update_from_ldap(self, ldap_info, sync_interval=None):
+        """Update user information from LDAP
+
+        Only attributes whose value differs are assigned. last_ldap_sync is
+        refreshed when something changed, or when it is older than
+        sync_interval (a timedelta; None refreshes it every time).
+
+        Returns:
+            bool: True if the user was modified and needs to be committed
+        """
+        changed = False
+        for column, key in self.LDAP_ATTRIBUTES.items():
+            value = ldap_info.get(key, getattr(self, column))
+            if value != getattr(self, column):
+                setattr(self, column, value)
+                changed = True
+
+        now = datetime.utcnow()
+        if (changed or sync_interval is None or self.last_ldap_sync is None or
+                now - self.last_ldap_sync >= sync_interval):
+            self.last_ldap_sync = now
+            changed = True
+        return changed
+
+    def apply_ldap_roles(self, roles):
+        """Set role flags resolved from directory groups
+
+        Returns:
+            bool: True if a flag changed
+        """
+        changed = False
+        for flag, value in roles.items():
+            if getattr(self, flag) != value:
+                setattr(self, flag, value)
+                changed = True
+        return changed
 
     @property
     def full_name(self):
@@ -106,28 +187,44 @@ class User(UserMixin, db.Model):
         return f'<User {self.username} ({self.auth_source})>'
 
 class Patient(db.Model):
+    __resource__ = 'patients'  # see ResourceVersion
+    __table_args__ = (db.Index('ix_patient_id_number', 'id_year', 'id_sequence'),
+                      db.Index('ix_patient_ipp_index', 'created_by', 'ipp_index'))
+
     id = db.Column(db.Integer, primary_key=True)
     ipp_encrypted = db.Column(db.Text, nullable=False)  # Encrypted IPP
+    ipp_index = db.Column(db.String(64))  # blind_index(ipp), to find a patient by IPP
     first_name_encrypted = db.Column(db.Text, nullable=False)  # Encrypted first name
     last_name_encrypted = db.Column(db.Text, nullable=False)  # Encrypted last name
     birth_date_encrypted = db.Column(db.Text, nullable=False)  # Encrypted birth date
     sex = db.Column(db.String(1), nullable=False)  # M or F (not encrypted as less sensitive)
     oncocentre_id = db.Column(db.String(50), unique=True, nullable=False)
+    # Numeric parts of oncocentre_id, set with it: sort on these, not the string
+    id_year = db.Column(db.Integer)
+    id_sequence = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
     # Relationship
     creator = db.relationship('User', backref=db.backref('patients', lazy=True))
     
+    @validates('oncocentre_id')
+    def _split_oncocentre_id(self, key, value):
+        try:
+            self.id_year, self.id_sequence = parse_oncocentre_id(value)
+        except ValueError:
+            self.id_year = self.id_sequence = None
+        return value
+    
     def _encrypt_data(self, data):
         """Encrypt sensitive data"""
         if isinstance(data, str):
-            return cipher_suite.encrypt(data.encode()).decode()
-        return cipher_suite.encrypt(str(data).encode()).decode()
+            return get_cipher_suite().encrypt(data.encode()).decode()
+        return get_cipher_suite().encrypt(str(data).encode()).decode()
     
     def _decrypt_data(self, encrypted_data):
         """Decrypt sensitive data"""
-        return cipher_suite.decrypt(encrypted_data.encode()).decode()
+        return get_cipher_suite().decrypt(encrypted_data.encode()).decode()
     
     @property
     def ipp(self):
@@ -138,6 +235,7 @@ class Patient(db.Model):
     def ipp(self, value):
         """Encrypt and store IPP"""
         self.ipp_encrypted = self._encrypt_data(value)
+        self.ipp_index = blind_index(value)
     
     @property
     def first_name(self):
@@ -175,6 +273,18 @@ class Patient(db.Model):
             date_str = str(value)
         self.birth_date_encrypted = self._encrypt_data(date_str)
     
+    @property
+    def cache_key(self):
+        """Changes whenever any displayed field does, without decrypting anything
+
+        Fernet tokens are randomised, so re-encrypting a field changes it too.
+        """
+        content = '|'.join(str(value) for value in (
+            self.id, self.oncocentre_id, self.sex, self.created_at, self.ipp_encrypted,
+            self.first_name_encrypted, self.last_name_encrypted, self.birth_date_encrypted
+        ))
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+    
     def __repr__(self):
         return f'<Patient {self.oncocentre_id}>'
 
@@ -182,6 +292,8 @@ class Patient(db.Model):
 class WhitelistEntry(db.Model):
     """Whitelist entry model for managing authorized users"""
 
+    __resource__ = 'whitelist'  # see ResourceVersion
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
@@ -200,8 +312,9 @@ class WhitelistEntry(db.Model):
 
     @classmethod
     def is_username_authorized(cls, username):
-        """Check if a username is in the active whitelist"""
-        entry = cls.query.filter_by(username=username, is_active=True).first()
+        """Check if a username is in the active whitelist, ignoring case"""
+        entry = cls.query.filter(db.func.lower(cls.username) == (username or '').lower(),
+                                 cls.is_active.is_(True)).first()
         return entry is not None
 
     @classmethod
@@ -257,4 +370,142 @@ class WhitelistEntry(db.Model):
         return added_count
 
     def __repr__(self):
-        return f'<WhitelistEntry {self.username} ({"active" if self.is_active else "inactive"})>'
\ No newline at end of file
+        return f'<WhitelistEntry {self.username} ({"active" if self.is_active else "inactive"})>'
+
+
+class LoginThrottleBucket(db.Model):
+    """Login throttling token bucket shared between worker processes"""
+
+    __tablename__ = 'login_throttle_bucket'
+
+    key = db.Column(db.String(200), primary_key=True)  # 'user:<name>' or 'ip:<address>'
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False, index=True)  # Unix time of last refill
+
+    def __repr__(self):
+        return f'<LoginThrottleBucket {self.key}>'
+
+
+class IdempotencyKey(db.Model):
+    """Outcome of a patient creation, replayed when the client retries with the same key
+
+    The row is committed in the same transaction as the patient, so a retry
+    either finds it or the original request did not happen at all. Rows
+    older than IDEMPOTENCY_KEY_TTL are ignored and purged. A bulk creation
+    points at its first patient and lists every identifier in oncocentre_ids.
+    """
+
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (db.UniqueConstraint('user_id', 'key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(200), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # HMAC of the submitted fields
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id', ondelete='CASCADE'), nullable=False)
+    created = db.Column(db.Boolean, nullable=False)  # False: the patient already existed
+    oncocentre_ids = db.Column(db.Text)  # JSON list of the identifiers, bulk creations only
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    patient = db.relationship('Patient')
+
+    @classmethod
+    def find(cls, user_id, key):
+        """The entry for user_id and key, if any (check created_at for expiry)"""
+        return cls.query.filter_by(user_id=user_id, key=key).first()
+
+    @classmethod
+    def purge(cls, before):
+        """Delete the entries stored before the given time"""
+        return cls.query.filter(cls.created_at < before).delete(synchronize_session=False)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} -> {self.patient_id}>'
+
+
+class IdSequence(db.Model):
+    """Next unleased oncocentre sequence number of a year (see sequence.IdAllocator)"""
+
+    __tablename__ = 'id_sequence'
+
+    year = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<IdSequence {self.year} next={self.next_value}>'
+
+
+class IdLease(db.Model):
+    """A block of sequence numbers [start, stop) handed to one worker
+
+    released_from is the first number the worker had not used when it shut
+    down; returned tells whether those numbers went back to IdSequence (no
+    gap) or were abandoned because another worker had leased after them.
+    A lease never released belongs to a running worker or one that crashed.
+    """
+
+    __tablename__ = 'id_lease'
+
+    id = db.Column(db.Integer, primary_key=True)
+    year = db.Column(db.Integer, nullable=False, index=True)
+    start = db.Column(db.Integer, nullable=False)
+    stop = db.Column(db.Integer, nullable=False)
+    holder = db.Column(db.String(100), nullable=False)  # host:pid
+    leased_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime)
+    released_from = db.Column(db.Integer)
+    returned = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<IdLease {self.year} [{self.start}, {self.stop}) {self.holder}>'
+
+
+class ResourceVersion(db.Model):
+    """Change counter for the rows of one model, used as a cheap HTTP validator
+
+    Every flush that inserts, updates or deletes instances of a model
+    declaring __resource__ increments that resource's version, so list pages
+    can answer 304 Not Modified after reading a single row.
+    """
+
+    __tablename__ = 'resource_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def current(cls, *names):
+        """Versions of the given resources, in order (0 if never changed)"""
+        rows = db.session.execute(db.select(cls.name, cls.version).where(cls.name.in_(names)))
+        versions = dict(rows.all())
+        return tuple(versions.get(name, 0) for name in names)
+
+    def __repr__(self):
+        return f'<ResourceVersion {self.name} {self.version}>'
+
+
+@event.listens_for(Session, 'after_flush')
+def bump_resource_versions(session, flush_context):
+    """Increment the version of every resource changed by this flush"""
+    changed = {getattr(obj, '__resource__', None) for obj in session.new}
+    changed.update(getattr(obj, '__resource__', None) for obj in session.deleted)
+    changed.update(getattr(obj, '__resource__', None) for obj in session.dirty
+                   if session.is_modified(obj, include_collections=False))
+    changed.discard(None)
+    if not changed:
+        return
+
+    table = ResourceVersion.__table__
+    connection = session.connection()
+    try:
+        # Savepoint: a missing table (schema not upgraded yet) must not
+        # fail the caller's transaction
+        with connection.begin_nested():
+            for name in sorted(changed):
+                result = connection.execute(
+                    table.update().where(table.c.name == name).values(version=table.c.version + 1)
+                )
+                if result.rowcount == 0:
+                    connection.execute(table.insert().values(name=name, version=1))
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not update resource versions {sorted(changed)}: {e}")
@@ -1,8 +1,341 @@
 """
-Patient model with encrypted sensitive data
+Patient access rules and creation, shared by the HTML views and the JSON API
+
+Patient is re-exported from models for backward compatibility.
 """
 
-# Re-export Patient from models for backward compatibility
-from .models import Patient
+import hmac
+import json
+import hashlib
+import itertools
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from .models import Patient, IdempotencyKey, blind_index, db
+from .utils import allocate_oncocentre_ids, generate_oncocentre_id, validate_patient_data
+
+# Fields a client may request; the encrypted ones cost a decryption each
+PLAIN_FIELDS = ('oncocentre_id', 'sex', 'created_at')
+ENCRYPTED_FIELDS = ('ipp', 'first_name', 'last_name', 'birth_date')
+PATIENT_FIELDS = PLAIN_FIELDS + ENCRYPTED_FIELDS
+
+# Expired idempotency keys are purged every this many stored keys
+IDEMPOTENCY_PURGE_INTERVAL = 100
+_stored_keys = itertools.count(1)
+
+
+class PatientAccessDenied(Exception):
+    """The user's role does not allow this patient operation"""
+
+
+class IdempotencyKeyReused(Exception):
+    """An idempotency key was sent again with different patient data"""
+
+
+class BulkValidationError(ValueError):
+    """Some items of a bulk creation are invalid; nothing was created
+
+    Attributes:
+        errors: list of (index, message) for the invalid items
+    """
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid patient(s)")
+        self.errors = errors
+
+
+def can_view_patients(user):
+    """Administrators who are not principal investigators see no patients"""
+    return not (user.is_admin and not user.is_principal_investigator)
+
+
+def can_create_patients(user):
+    """Administrators cannot create patient identifiers"""
+    return not user.is_admin
+
+
+def visible_patients(user):
+    """Query of the patients user may see: all for PIs, their own otherwise
+
+    Raises:
+        PatientAccessDenied: for administrators who are not PIs
+    """
+    if not can_view_patients(user):
+        raise PatientAccessDenied('Administrators cannot view patient lists')
+    if user.is_principal_investigator:
+        return Patient.query
+    return Patient.query.filter_by(created_by=user.id)
+
+
+def iter_patients(query, chunk_size=500):
+    """Yield the patients of query, newest first, fetching chunk_size at a time
+
+    Each chunk is its own short keyset query (id below the last one seen),
+    fully read before its rows are yielded. No cursor stays open while a
+    page is streamed, which on SQLite would hold a shared lock and block
+    every writer until the client has downloaded the whole list.
+    """
+    last_id = None
+    while True:
+        chunk_query = query
+        if last_id is not None:
+            chunk_query = chunk_query.filter(Patient.id < last_id)
+        chunk = chunk_query.order_by(Patient.id.desc()).limit(chunk_size).all()
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1].id
+
+
+def create_patient(user, ipp, first_name, last_name, birth_date, sex, idempotency_key=None):
+    """Create a patient with the next oncocentre identifier
+
+    With an idempotency_key, a retry of the same request by the same user
+    returns the original result without validating, allocating an
+    identifier or encrypting anything again.
+
+    Returns:
+        tuple: (patient, created) - created is False when user already has
+            a patient with this IPP, which is returned instead
+
+    Raises:
+        PatientAccessDenied: for administrators
+        ValueError: if the data is invalid (message lists the problems)
+        IdempotencyKeyReused: if idempotency_key came with different data
+    """
+    if not can_create_patients(user):
+        raise PatientAccessDenied('Administrators cannot create patient identifiers')
+
+    stored = fingerprint = None
+    if idempotency_key:
+        fingerprint = _fingerprint(ipp, first_name, last_name, birth_date, sex)
+        stored = IdempotencyKey.find(user.id, idempotency_key)
+        if stored is not None and stored.created_at >= _idempotency_cutoff():
+            return _replay(stored, fingerprint)
+
+    errors = validate_patient_data(ipp, first_name, last_name, birth_date, sex)
+    if errors:
+        raise ValueError('; '.join(errors))
+    ipp, first_name, last_name = ipp.strip(), first_name.strip(), last_name.strip()
+
+    # Check if patient with same IPP already exists for this user
+    existing_patient = Patient.query.filter_by(created_by=user.id, ipp_index=blind_index(ipp)).first()
+    if existing_patient:
+        patient, created = existing_patient, False
+    else:
+        patient, created = _new_patient(user, generate_oncocentre_id(), ipp, first_name, last_name,
+                                        birth_date, sex), True
+        db.session.add(patient)
+
+    if not idempotency_key:
+        db.session.commit()
+        return patient, created
+
+    # Stored with the patient: a failed commit leaves nothing to replay.
+    # Nothing is written to the session before the identifier is allocated
+    # (see IdAllocator._lease). An expired entry not purged yet still holds
+    # the key: reuse its row
+    entry = stored or IdempotencyKey(user_id=user.id, key=idempotency_key)
+    entry.fingerprint, entry.patient, entry.created = fingerprint, patient, created
+    entry.created_at = datetime.utcnow()
+    db.session.add(entry)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        db.session.rollback()
+        stored = IdempotencyKey.find(user.id, idempotency_key)
+        if stored is None:
+            raise
+        return _replay(stored, fingerprint)
+    _key_stored()
+    return patient, created
+
+
+def _idempotency_cutoff():
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('IDEMPOTENCY_KEY_TTL', 86400))
+
+
+def _key_stored():
+    """Count a committed idempotency key, purging the expired ones now and then"""
+    if next(_stored_keys) % IDEMPOTENCY_PURGE_INTERVAL == 0:
+        IdempotencyKey.purge(_idempotency_cutoff())
+        db.session.commit()
+
+
+def _fingerprint(*values):
+    """Keyed hash of the submitted fields, so no patient data is stored in clear"""
+    secret = current_app.secret_key
+    if isinstance(secret, str):
+        secret = secret.encode('utf-8')
+    message = '\x1f'.join(str(value) for value in values).encode('utf-8')
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    """(patient, created) recorded by a stored idempotency key
+
+    Raises:
+        IdempotencyKeyReused: if the stored request had other data
+    """
+    if not hmac.compare_digest(stored.fingerprint, fingerprint):
+        raise IdempotencyKeyReused('Idempotency key already used for a different patient')
+    return stored.patient, stored.created
+
+
+def _replay_bulk(stored, fingerprint):
+    """Oncocentre identifiers recorded by a stored bulk idempotency key
+
+    Raises:
+        IdempotencyKeyReused: if the stored request had other data
+    """
+    if not hmac.compare_digest(stored.fingerprint, fingerprint) or stored.oncocentre_ids is None:
+        raise IdempotencyKeyReused('Idempotency key already used for a different request')
+    return json.loads(stored.oncocentre_ids)
+
+
+def validate_patients(items, user=None):
+    """Problems with a batch of patients, as a list of (index, message)
+
+    Items that are None (already rejected by the caller) are skipped. An
+    IPP may appear only once per batch and, with user, must not be one
+    that user already registered.
+    """
+    errors, ipps = [], {}
+    for index, item in enumerate(items):
+        if item is None:
+            continue
+        item_errors = validate_patient_data(item.get('ipp'), item.get('first_name'), item.get('last_name'),
+                                            item.get('birth_date'), item.get('sex'))
+        if item_errors:
+            errors.append((index, '; '.join(item_errors)))
+        else:
+            ipps[index] = item['ipp'].strip()
+
+    registered = _registered_ipps(user, ipps.values()) if user is not None and ipps else {}
+    seen_ipps = {}
+    for index, ipp in ipps.items():
+        if ipp in registered:
+            errors.append((index, f"IPP already registered as {registered[ipp]}"))
+        elif ipp in seen_ipps:
+            errors.append((index, f"IPP already used by item {seen_ipps[ipp]}"))
+        else:
+            seen_ipps[ipp] = index
+    return sorted(errors)
+
+
+def _registered_ipps(user, ipps):
+    """{ipp: oncocentre_id} of the given IPPs user already registered, in one query"""
+    by_index = {blind_index(ipp): ipp for ipp in ipps}
+    rows = db.session.execute(
+        db.select(Patient.ipp_index, Patient.oncocentre_id)
+        .where(Patient.created_by == user.id, Patient.ipp_index.in_(list(by_index)))
+    ).all()
+    return {by_index[row.ipp_index]: row.oncocentre_id for row in rows}
+
+
+def create_patients(user, items, attempts=3, idempotency_key=None):
+    """Create several patients in one transaction with consecutive identifiers
+
+    Every item is validated before anything is written: either all patients
+    are created or none. The identifiers are leased as one block, so the
+    whole batch costs one sequence update and one commit. An idempotency_key
+    works as in create_patient, for the batch as a whole.
+
+    Args:
+        items: list of dicts with ipp, first_name, last_name, birth_date and sex
+        attempts: retries when an identifier of the block is already taken
+
+    Returns:
+        list: oncocentre identifiers of the patients, in the order of items
+
+    Raises:
+        PatientAccessDenied: for administrators
+        BulkValidationError: if any item is invalid, or has an IPP user
+            already registered
+        IdempotencyKeyReused: if idempotency_key came with different data
+    """
+    if not can_create_patients(user):
+        raise PatientAccessDenied('Administrators cannot create patient identifiers')
+
+    stored = fingerprint = None
+    if idempotency_key:
+        fingerprint = _fingerprint('bulk', *(item.get(field) for item in items for field in ENCRYPTED_FIELDS + ('sex',)))
+        stored = IdempotencyKey.find(user.id, idempotency_key)
+        if stored is not None and stored.created_at >= _idempotency_cutoff():
+            return _replay_bulk(stored, fingerprint)
+
+    errors = validate_patients(items, user)
+    if errors:
+        raise BulkValidationError(errors)
+    rows = [(item['ipp'].strip(), item['first_name'].strip(), item['last_name'].strip(),
+             item['birth_date'], item['sex']) for item in items]
+
+    for attempt in range(attempts):
+        oncocentre_ids = allocate_oncocentre_ids(len(rows))
+        patients = [_new_patient(user, oncocentre_id, *row) for oncocentre_id, row in zip(oncocentre_ids, rows)]
+        db.session.add_all(patients)
+        if idempotency_key:
+            # An expired entry not purged yet still holds the key: reuse its row
+            entry = stored or IdempotencyKey(user_id=user.id, key=idempotency_key)
+            entry.fingerprint, entry.patient, entry.created = fingerprint, patients[0], True
+            entry.oncocentre_ids, entry.created_at = json.dumps(oncocentre_ids), datetime.utcnow()
+            db.session.add(entry)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # An identifier of the block was already taken outside the allocator,
+            # or a concurrent retry with the same key committed first
+            db.session.rollback()
+            if idempotency_key:
+                stored = IdempotencyKey.find(user.id, idempotency_key)
+                if stored is not None and stored.created_at >= _idempotency_cutoff():
+                    return _replay_bulk(stored, fingerprint)
+            if attempt == attempts - 1:
+                raise
+            continue
+        if idempotency_key:
+            _key_stored()
+        return oncocentre_ids
+
+
+def _new_patient(user, oncocentre_id, ipp, first_name, last_name, birth_date, sex):
+    patient = Patient(
+        oncocentre_id=oncocentre_id,
+        sex=sex,
+        created_by=user.id
+    )
+
+    # Set encrypted fields using properties
+    patient.ipp = ipp
+    patient.first_name = first_name
+    patient.last_name = last_name
+    patient.birth_date = birth_date
+    return patient
+
+
+def serialize_patient(patient, fields=PATIENT_FIELDS):
+    """Dictionary of the requested fields; only those fields are decrypted"""
+    data = {}
+    for field in fields:
+        value = getattr(patient, field)
+        data[field] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
+
 
-__all__ = ['Patient']
\ No newline at end of file
+__all__ = [
+    'Patient',
+    'PatientAccessDenied',
+    'BulkValidationError',
+    'IdempotencyKeyReused',
+    'PATIENT_FIELDS',
+    'can_view_patients',
+    'can_create_patients',
+    'visible_patients',
+    'create_patient',
+    'validate_patients',
+    'create_patients',
+    'serialize_patient'
+]
@@ -0,0 +1,332 @@
+"""
+Oncocentre identifier sequences with hi/lo block leasing
+
+Each worker leases a block of ID_BLOCK_SIZE sequence numbers per year from
+the id_sequence table in one short transaction, then hands them out from
+memory. Workers on any number of nodes therefore touch the database once
+per block instead of serialising every inclusion on a "max ID" lookup.
+
+Sequence numbers are zero-padded to ONCOCENTRE_ID_WIDTH digits. Past the
+largest number of that width, ONCOCENTRE_ID_OVERFLOW decides: 'widen' keeps
+going with more digits, 'error' refuses new identifiers. Either way, order
+identifiers on their numeric parts (Patient.id_year, Patient.id_sequence
+or oncocentre_sort_key), never on the string.
+
+Numbers are unique but not gapless: identifiers are no longer in creation
+order across workers, and a worker that stops leaves the rest of its block
+unused. At shutdown the unused tail is given back when no later block was
+leased, and recorded on the lease otherwise; scripts/id_gap_report.py lists
+the gaps and where they come from.
+"""
+
+import os
+import re
+import atexit
+import socket
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ID_PREFIX = 'ONCOCENTRE'
+OVERFLOW_POLICIES = ('widen', 'error')
+
+_ID_PATTERN = re.compile(rf'^{ID_PREFIX}_(\d{{4}})_(\d+)$')
+
+
+class SequenceExhausted(Exception):
+    """The year's sequence reached its width and ONCOCENTRE_ID_OVERFLOW is 'error'"""
+
+
+# Session.info flag: the session flushed writes that are not committed yet
+_UNCOMMITTED_WRITES = 'oncocentre_uncommitted_writes'
+
+
+@event.listens_for(Session, 'after_flush')
+def _flushed(session, flush_context):
+    session.info[_UNCOMMITTED_WRITES] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _transaction_ended(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_UNCOMMITTED_WRITES, None)
+
+
+def format_oncocentre_id(year, sequence, width=5):
+    """ONCOCENTRE_YYYY_NNNNN, with more digits once sequence needs them"""
+    return f"{ID_PREFIX}_{year}_{sequence:0{width}d}"
+
+
+def parse_oncocentre_id(oncocentre_id):
+    """(year, sequence) of an identifier of any sequence width
+
+    Raises:
+        ValueError: if oncocentre_id is not ONCOCENTRE_YYYY_<digits>
+    """
+    match = _ID_PATTERN.match(oncocentre_id or '')
+    if not match:
+        raise ValueError(f"Not an oncocentre identifier: {oncocentre_id!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def oncocentre_sort_key(oncocentre_id):
+    """Sort key ordering identifiers by year then sequence number (malformed ones first)"""
+    try:
+        return parse_oncocentre_id(oncocentre_id) + ('',)
+    except ValueError:
+        return (-1, -1, oncocentre_id or '')
+
+
+class _Block:
+    """Leased numbers [next, stop) still to hand out"""
+
+    __slots__ = ('lease_id', 'next', 'stop')
+
+    def __init__(self, lease_id, start, stop):
+        self.lease_id = lease_id
+        self.next = start
+        self.stop = stop
+
+
+class IdAllocator:
+    """Per-process allocator of sequence numbers from leased blocks"""
+
+    def __init__(self, app=None):
+        self.block_size = 20
+        self.width = 5
+        self.overflow = 'widen'
+        self._app = None
+        self._blocks = {}  # year -> _Block
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure the block size and format, and give unused numbers back at exit"""
+        self.block_size = max(1, app.config.get('ID_BLOCK_SIZE', 20))
+        self.width = max(1, app.config.get('ONCOCENTRE_ID_WIDTH', 5))
+        self.overflow = app.config.get('ONCOCENTRE_ID_OVERFLOW', 'widen')
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"ONCOCENTRE_ID_OVERFLOW must be one of {', '.join(OVERFLOW_POLICIES)}")
+        self._app = app
+        with self._lock:
+            self._blocks.clear()
+        if not self._atexit_registered:
+            atexit.register(self.release)
+            self._atexit_registered = True
+        app.extensions['id_allocator'] = self
+
+    def allocate(self, year, count=1):
+        """Reserve count consecutive sequence numbers of year
+
+        Single numbers come from the worker's current block; larger requests
+        lease a block of exactly count numbers so they stay consecutive.
+
+        Returns:
+            range: the reserved numbers
+
+        Raises:
+            SequenceExhausted: if a number would need more than width digits
+                and the overflow policy is 'error'
+            RuntimeError: if the current session already has writes
+        """
+        self._check_session()
+        if count != 1:
+            start, stop, _ = self._lease(year, count)
+            self._check_width(year, stop - 1)
+            return range(start, stop)
+        with self._lock:
+            block = self._blocks.get(year)
+            if block is None or block.next >= block.stop:
+                start, stop, lease_id = self._lease(year, self.block_size)
+                block = self._blocks[year] = _Block(lease_id, start, stop)
+            self._check_width(year, block.next)
+            sequence = block.next
+            block.next += 1
+        return range(sequence, sequence + 1)
+
+    def format(self, year, sequence):
+        """Identifier for a sequence number, padded to the configured width"""
+        return format_oncocentre_id(year, sequence, self.width)
+
+    def _check_width(self, year, sequence):
+        if self.overflow == 'error' and sequence >= 10 ** self.width:
+            raise SequenceExhausted(f"No oncocentre identifiers left for {year} "
+                                    f"(ONCOCENTRE_ID_WIDTH={self.width})")
+
+    @staticmethod
+    def _check_session():
+        """Refuse to allocate while the current session holds writes
+
+        Leases commit on their own connection. On SQLite, a session with
+        flushed writes keeps the database locked, so the lease would wait for
+        the request's own lock until "database is locked". Checked on every
+        allocation, not only when a block runs out, so misuse fails at once.
+        """
+        from .models import db
+
+        session = db.session()
+        if session.info.get(_UNCOMMITTED_WRITES) or session.new or session.dirty or session.deleted:
+            raise RuntimeError("Allocate oncocentre identifiers before writing to the session")
+
+    def preview(self, year):
+        """Number the next allocation in this worker will most likely return, without reserving it"""
+        from .models import db, IdSequence
+
+        with self._lock:
+            block = self._blocks.get(year)
+            if block is not None and block.next < block.stop:
+                return block.next
+        next_value = db.session.execute(
+            db.select(IdSequence.next_value).where(IdSequence.year == year)
+        ).scalar()
+        if next_value is None:
+            with db.engine.connect() as conn:
+                next_value = _highest_sequence(conn, year) + 1
+        return next_value
+
+    def release(self):
+        """Give back or record the unused part of every block (worker shutdown)"""
+        with self._lock:
+            blocks, self._blocks = self._blocks, {}
+        blocks = {year: block for year, block in blocks.items() if block.next < block.stop}
+        if not blocks or self._app is None:
+            return
+        from sqlalchemy.exc import SQLAlchemyError
+
+        try:
+            with self._app.app_context():
+                for year, block in blocks.items():
+                    self._release_block(year, block)
+        except SQLAlchemyError as e:
+            logger.warning(f"Could not release unused oncocentre IDs: {e}")
+
+    def reset_after_fork(self):
+        """Forget blocks inherited from the parent process, which still owns them"""
+        with self._lock:
+            self._blocks = {}
+
+    def _lease(self, year, size):
+        """Take size numbers from id_sequence in one transaction
+
+        The lease commits on its own connection, whatever happens to the
+        caller's transaction (see _check_session).
+
+        Returns:
+            tuple: (start, stop, lease_id)
+        """
+        from sqlalchemy.exc import IntegrityError
+        from .models import db, IdSequence, IdLease
+
+        for attempt in range(2):
+            try:
+                with db.engine.begin() as conn:
+                    # The UPDATE locks the row until commit, so blocks never overlap
+                    result = conn.execute(
+                        db.update(IdSequence).where(IdSequence.year == year)
+                        .values(next_value=IdSequence.next_value + size)
+                    )
+                    if result.rowcount:
+                        stop = conn.execute(
+                            db.select(IdSequence.next_value).where(IdSequence.year == year)
+                        ).scalar_one()
+                        start = stop - size
+                    else:
+                        # First lease of the year: continue after existing identifiers
+                        start = _highest_sequence(conn, year) + 1
+                        stop = start + size
+                        conn.execute(db.insert(IdSequence).values(year=year, next_value=stop))
+                    lease_id = conn.execute(
+                        db.insert(IdLease).values(year=year, start=start, stop=stop, holder=_holder(),
+                                                  leased_at=datetime.utcnow())
+                    ).inserted_primary_key[0]
+                return start, stop, lease_id
+            except IntegrityError:
+                # Another worker created the year's sequence concurrently
+                if attempt:
+                    raise
+
+    def _release_block(self, year, block):
+        from .models import db, IdSequence, IdLease
+
+        with db.engine.begin() as conn:
+            # Only possible while nobody has leased after this block
+            returned = conn.execute(
+                db.update(IdSequence)
+                .where(IdSequence.year == year, IdSequence.next_value == block.stop)
+                .values(next_value=block.next)
+            ).rowcount == 1
+            conn.execute(
+                db.update(IdLease).where(IdLease.id == block.lease_id)
+                .values(released_at=datetime.utcnow(), released_from=block.next, returned=returned)
+            )
+
+
+def find_gaps(year):
+    """Sequence numbers of year below the next unleased one that no patient has
+
+    Returns:
+        list: (start, stop, reason) for each run of missing numbers [start, stop)
+    """
+    from .models import db, IdSequence, IdLease
+
+    with db.engine.connect() as conn:
+        used = set(_used_sequences(conn, year))
+        next_value = conn.execute(db.select(IdSequence.next_value).where(IdSequence.year == year)).scalar()
+        leases = conn.execute(db.select(IdLease).where(IdLease.year == year).order_by(IdLease.id)).all()
+    if next_value is None:
+        next_value = max(used, default=0) + 1
+
+    def reason(number):
+        for lease in reversed(leases):
+            if not lease.start <= number < lease.stop:
+                continue
+            if lease.released_from is not None and number >= lease.released_from:
+                if lease.returned:
+                    continue  # handed out again by a later lease
+                return f"released unused by {lease.holder}"
+            if lease.released_at is None:
+                return f"leased by {lease.holder} (still running, or stopped without releasing)"
+            return "allocated but not saved (failed creation or deleted patient)"
+        return "not leased (created before block leasing, or deleted patient)"
+
+    gaps = []
+    for number in range(1, next_value):
+        if number in used:
+            continue
+        why = reason(number)
+        if gaps and gaps[-1][1] == number and gaps[-1][2] == why:
+            gaps[-1] = (gaps[-1][0], number + 1, why)
+        else:
+            gaps.append((number, number + 1, why))
+    return gaps
+
+
+def _holder():
+    return f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+def _used_sequences(conn, year):
+    """Sequence numbers of the existing identifiers of year"""
+    from .models import db, Patient
+
+    return conn.execute(db.select(Patient.id_sequence).where(Patient.id_year == year)).scalars()
+
+
+def _highest_sequence(conn, year):
+    """Highest sequence number among existing identifiers of year (0 if none)"""
+    from .models import db, Patient
+
+    # Index lookup on (id_year, id_sequence)
+    highest = conn.execute(db.select(db.func.max(Patient.id_sequence)).where(Patient.id_year == year)).scalar()
+    return highest or 0
+
+
+# Global instance, configured by create_app()
+id_allocator = IdAllocator()
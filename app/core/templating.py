@@ -0,0 +1,106 @@
+"""
+Template compilation and fragment caches
+
+- Compiled templates are kept in a FileSystemBytecodeCache, so a worker
+  (re)started by Gunicorn loads bytecode instead of re-parsing the
+  templates. Entries are keyed on the template source, so edits are picked
+  up automatically.
+
+- stream_page() renders a template incrementally, in chunks of about
+  buffer_size characters, for pages whose size grows with the data.
+
+- The {% cache %} tag stores the rendered output of a block in an
+  in-process TTLCache under the given key parts, e.g.
+
+      {% cache 'patient-row', patient.cache_key %} ... {% endcache %}
+
+  Key parts must change whenever the block's output would: use row
+  versions or content hashes, never just an id. The template name and line
+  are added to the key automatically.
+"""
+
+import os
+import hashlib
+import logging
+
+from flask import stream_template, get_flashed_messages
+from jinja2 import nodes, FileSystemBytecodeCache
+from jinja2.ext import Extension
+
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension adding the {% cache key, ... %}...{% endcache %} tag"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        # Disabled until configure_templates() sets a TTL
+        environment.extend(fragment_cache=TTLCache(0))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [nodes.Const(f'{parser.name}:{lineno}'), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.List(parts)]),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, parts, caller):
+        cache = self.environment.fragment_cache
+        key = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        output = cache.get(key)
+        if output is None:
+            output = caller()
+            cache.set(key, output)
+        return output
+
+
+def stream_page(template_name, buffer_size=8192, **context):
+    """Render a template as a stream of chunks, for returning from a view
+
+    Jinja yields many tiny strings; grouping them keeps the number of writes
+    and compressor flushes low while the first chunk still leaves early.
+    """
+    # The session cookie is sent before the body: pop flash messages now
+    # (they stay cached on the request context for the template)
+    get_flashed_messages()
+    # Called now, while the request context is active; stream_template keeps
+    # that context alive for the rest of the iteration
+    return _grouped(stream_template(template_name, **context), buffer_size)
+
+
+def _grouped(chunks, buffer_size):
+    pending, size = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+def configure_templates(app):
+    """Install the bytecode cache and the fragment cache tag on app's Jinja environment"""
+    env = app.jinja_env
+
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', True):
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR') or None
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # None: a per-user directory under the system temp dir
+            env.bytecode_cache = FileSystemBytecodeCache(directory)
+        except OSError as e:
+            logger.warning(f"Template bytecode cache disabled: {e}")
+
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache = TTLCache(app.config.get('TEMPLATE_FRAGMENT_CACHE_TTL', 600),
+                                  app.config.get('TEMPLATE_FRAGMENT_CACHE_SIZE', 5000))
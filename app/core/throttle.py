@@ -0,0 +1,227 @@
+"""
+Login throttling with token buckets
+
+Every login attempt takes one token from a bucket keyed on the username and
+one from a bucket keyed on the client IP. Buckets refill continuously at a
+configured rate up to a burst size; an attempt finding either bucket empty
+is rejected before the whitelist lookup, password hashing or any LDAP call.
+
+Buckets live in process memory by default. With LOGIN_THROTTLE_BACKEND set
+to 'database' they are stored in the login_throttle_bucket table so that
+every worker process shares them. Each attempt reads its buckets, then
+writes them back with a compare-and-set UPDATE, retrying when another
+worker got there first, so concurrent attempts are never lost.
+"""
+
+import threading
+import time
+import logging
+import itertools
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class _BucketChanged(Exception):
+    """A database bucket was written by another worker between read and update"""
+
+
+class _Bucket:
+    """Token count and the time it was last refilled"""
+
+    __slots__ = ('tokens', 'updated_at')
+
+    def __init__(self, tokens, updated_at):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class LoginThrottle:
+    """Per-username and per-IP token buckets for login attempts"""
+
+    # Read/compare-and-set rounds before a contended attempt is rejected
+    DATABASE_ATTEMPTS = 5
+    # Refilled database buckets are purged every this many recorded attempts
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.backend = 'memory'
+        self.limits = {}
+        self.max_keys = 10000
+        self.proxy_count = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = itertools.count(1)  # recorded database attempts
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure limits from application settings"""
+        self.enabled = app.config.get('LOGIN_THROTTLE_ENABLED', True)
+        self.backend = app.config.get('LOGIN_THROTTLE_BACKEND', 'memory')
+        # kind -> (tokens per second, burst)
+        self.limits = {
+            'user': (app.config.get('LOGIN_THROTTLE_USER_RATE', 5) / 60.0,
+                     app.config.get('LOGIN_THROTTLE_USER_BURST', 5)),
+            'ip': (app.config.get('LOGIN_THROTTLE_IP_RATE', 30) / 60.0,
+                   app.config.get('LOGIN_THROTTLE_IP_BURST', 30))
+        }
+        if any(rate <= 0 for rate, _ in self.limits.values()):
+            # An empty bucket would never refill: use LOGIN_THROTTLE_ENABLED to turn throttling off
+            raise ValueError("LOGIN_THROTTLE_USER_RATE and LOGIN_THROTTLE_IP_RATE must be positive")
+        self.max_keys = app.config.get('LOGIN_THROTTLE_MAX_KEYS', 10000)
+        self.proxy_count = app.config.get('LOGIN_THROTTLE_PROXY_COUNT', 0)
+        with self._lock:
+            self._buckets.clear()
+        app.extensions['login_throttle'] = self
+
+    def client_ip(self, request):
+        """Client address, taken from X-Forwarded-For behind trusted proxies"""
+        if self.proxy_count:
+            forwarded = [addr.strip() for addr in request.headers.get('X-Forwarded-For', '').split(',') if addr.strip()]
+            if len(forwarded) >= self.proxy_count:
+                return forwarded[-self.proxy_count]
+        return request.remote_addr or 'unknown'
+
+    @staticmethod
+    def _refill(bucket, rate, burst, now):
+        bucket.tokens = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+        bucket.updated_at = now
+
+    def _take(self, buckets, now):
+        """Refill buckets; consume one token from each unless one is empty
+
+        Args:
+            buckets (list): (kind, _Bucket) pairs
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until a token is available
+        """
+        retry_after = 0.0
+        for kind, bucket in buckets:
+            rate, burst = self.limits[kind]
+            self._refill(bucket, rate, burst, now)
+            if bucket.tokens < 1:
+                retry_after = max(retry_after, (1 - bucket.tokens) / rate)
+        if retry_after:
+            return retry_after
+        for _, bucket in buckets:
+            bucket.tokens -= 1
+        return 0.0
+
+    def hit(self, username, ip):
+        """Record a login attempt
+
+        Returns:
+            float: 0 if the attempt may proceed, otherwise seconds to wait
+        """
+        if not self.enabled:
+            return 0.0
+        keys = [('user', f'user:{username.strip().lower()}'), ('ip', f'ip:{ip}')]
+        if self.backend == 'database':
+            return self._hit_database(keys)
+        return self._hit_memory(keys)
+
+    def _hit_memory(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            buckets = []
+            for kind, key in keys:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = _Bucket(self.limits[kind][1], now)
+                self._buckets.move_to_end(key)
+                buckets.append((kind, bucket))
+            retry_after = self._take(buckets, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def _hit_database(self, keys):
+        from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+        for attempt in range(self.DATABASE_ATTEMPTS):
+            try:
+                return self._hit_database_once(keys)
+            except (IntegrityError, _BucketChanged):
+                # Another worker created or updated one of the buckets since we read it
+                continue
+            except SQLAlchemyError as e:
+                # Never lock everybody out because the throttle table is unavailable
+                logger.warning(f"Login throttle database unavailable, allowing attempt: {e}")
+                return 0.0
+        # Only a flood of attempts on the same bucket gets here: reject rather
+        # than let attempts through unthrottled
+        logger.warning(f"Login throttle buckets {[key for _, key in keys]} too contended, rejecting attempt")
+        return 1.0
+
+    def _load_buckets(self, keys):
+        """Stored rows of the buckets, read outside the write transaction"""
+        from .models import db, LoginThrottleBucket
+
+        with db.engine.connect() as conn:
+            return {
+                row.key: row for row in conn.execute(
+                    db.select(LoginThrottleBucket.__table__).where(LoginThrottleBucket.key.in_([key for _, key in keys]))
+                )
+            }
+
+    def _hit_database_once(self, keys):
+        from .models import db, LoginThrottleBucket
+
+        # Wall-clock time: buckets are shared between processes
+        now = time.time()
+        rows = self._load_buckets(keys)
+        buckets = []
+        for kind, key in keys:
+            row = rows.get(key)
+            buckets.append((kind, _Bucket(row.tokens, row.updated_at) if row else
+                            _Bucket(self.limits[kind][1], now)))
+        retry_after = self._take(buckets, now)
+
+        with db.engine.begin() as conn:
+            for (kind, key), (_, bucket) in zip(keys, buckets):
+                values = {'tokens': bucket.tokens, 'updated_at': bucket.updated_at}
+                row = rows.get(key)
+                if row is None:
+                    conn.execute(db.insert(LoginThrottleBucket).values(key=key, **values))
+                    continue
+                # Compare-and-set: only applies if nobody wrote the bucket since
+                # it was read, otherwise a concurrent attempt would be lost
+                updated = conn.execute(
+                    db.update(LoginThrottleBucket)
+                    .where(LoginThrottleBucket.key == key,
+                           LoginThrottleBucket.tokens == row.tokens,
+                           LoginThrottleBucket.updated_at == row.updated_at)
+                    .values(**values)
+                ).rowcount
+                if not updated:
+                    raise _BucketChanged(key)  # rolls back the other bucket too
+
+        # Counted once committed, so retried rounds count once
+        if next(self._hits) % self.PURGE_INTERVAL == 0:
+            self._purge_database(now)
+        return retry_after
+
+    def _purge_database(self, now):
+        """Drop buckets that have refilled completely"""
+        from sqlalchemy.exc import SQLAlchemyError
+        from .models import db, LoginThrottleBucket
+
+        refill_time = max(burst / rate for rate, burst in self.limits.values())
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(db.delete(LoginThrottleBucket).where(LoginThrottleBucket.updated_at < now - refill_time))
+        except SQLAlchemyError as e:
+            # The attempt is already recorded: keep its answer
+            logger.warning(f"Could not purge login throttle buckets: {e}")
+
+    def reset(self):
+        """Forget every in-memory bucket"""
+        with self._lock:
+            self._buckets.clear()
+
+
+# Global instance, configured by create_app()
+login_throttle = LoginThrottle()
@@ -1,31 +1,22 @@
 from datetime import datetime
-from .models import Patient, db
+from .sequence import id_allocator
+
+def allocate_oncocentre_ids(count):
+    """Allocate count consecutive ONCOCENTRE identifiers of the current year"""
+    current_year = datetime.now().year
+    return [id_allocator.format(current_year, sequence) for sequence in id_allocator.allocate(current_year, count)]
 
 def generate_oncocentre_id():
-    """Generate the next ONCOCENTRE identifier following the format ONCOCENTRE_YYYY_NNNNN"""
+    """Generate the next ONCOCENTRE identifier following the format ONCOCENTRE_YYYY_NNNNN
+
+    NNNNN has ONCOCENTRE_ID_WIDTH digits, more on overflow (see sequence.py).
+    """
+    return allocate_oncocentre_ids(1)[0]
+
+def preview_oncocentre_id():
+    """The identifier the next patient will probably get, without reserving it"""
     current_year = datetime.now().year
-    
-    # Find the highest sequence number for the current year
-    last_patient = Patient.query.filter(
-        Patient.oncocentre_id.like(f'ONCOCENTRE_{current_year}_%')
-    ).order_by(Patient.id.desc()).first()
-    
-    if last_patient:
-        # Extract sequence number from the last ID
-        last_id_parts = last_patient.oncocentre_id.split('_')
-        if len(last_id_parts) == 3:
-            try:
-                last_sequence = int(last_id_parts[2])
-                next_sequence = last_sequence + 1
-            except ValueError:
-                next_sequence = 1
-        else:
-            next_sequence = 1
-    else:
-        next_sequence = 1
-    
-    # Format with zero padding
-    return f"ONCOCENTRE_{current_year}_{next_sequence:05d}"
+    return id_allocator.format(current_year, id_allocator.preview(current_year))
 
 def validate_patient_data(ipp, first_name, last_name, birth_date, sex):
     """Validate patient data before creating identifier"""
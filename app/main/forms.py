@@ -2,9 +2,11 @@
 Patient management forms
 """
 
+import uuid
+
 from flask_wtf import FlaskForm
-from wtforms import StringField, DateField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Length
+from wtforms import StringField, DateField, SelectField, SubmitField, HiddenField
+from wtforms.validators import DataRequired, Length, Optional
 
 class PatientForm(FlaskForm):
     """Patient creation form"""
@@ -13,4 +15,6 @@ class PatientForm(FlaskForm):
     last_name = StringField('Last Name', validators=[DataRequired(), Length(max=100)])
     birth_date = DateField('Birth Date', validators=[DataRequired()])
     sex = SelectField('Sex', choices=[('M', 'Male'), ('F', 'Female')], validators=[DataRequired()])
+    # New for every rendered form: a resubmission creates no second patient
+    idempotency_key = HiddenField(default=lambda: uuid.uuid4().hex, validators=[Optional(), Length(max=200)])
     submit = SubmitField('Create Patient')
\ No newline at end of file
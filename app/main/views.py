@@ -2,10 +2,14 @@
 Main application routes for patient management
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
 from flask_login import login_required, current_user
-from ..core.models import Patient, db
-from ..core import generate_oncocentre_id, validate_patient_data
+from ..core.models import Patient, ResourceVersion, db
+from ..core.http_cache import conditional_page, cached_page
+from ..core.templating import stream_page
+from ..core import preview_oncocentre_id
+from ..core.patient import (PatientAccessDenied, IdempotencyKeyReused, visible_patients, iter_patients,
+                            create_patient as create_patient_record)
 from .forms import PatientForm
 
 main_bp = Blueprint('main', __name__)
@@ -27,7 +31,7 @@ def index():
 def preview_id():
     """AJAX endpoint to preview the next oncocentre ID"""
     try:
-        next_id = generate_oncocentre_id()
+        next_id = preview_oncocentre_id()
         return jsonify({'oncocentre_id': next_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -44,43 +48,22 @@ def create_patient():
     form = PatientForm()
     
     if form.validate_on_submit():
-        ipp = form.ipp.data.strip()
-        first_name = form.first_name.data.strip()
-        last_name = form.last_name.data.strip()
-        birth_date = form.birth_date.data
-        sex = form.sex.data
-        
-        # Check if patient with same IPP already exists for this user
-        existing_patient = Patient.query.filter_by(created_by=current_user.id).filter(
-            Patient.ipp_encrypted.like('%' + ipp + '%')
-        ).first()
-        
-        if existing_patient and existing_patient.ipp == ipp:
-            flash(f'Patient with IPP {ipp} already exists with ID {existing_patient.oncocentre_id}', 'warning')
-            return redirect(url_for('main.index'))
-        
-        # Generate oncocentre ID and create patient
-        oncocentre_id = generate_oncocentre_id()
-        
-        patient = Patient(
-            oncocentre_id=oncocentre_id,
-            sex=sex,
-            created_by=current_user.id
-        )
-        
-        # Set encrypted fields using properties
-        patient.ipp = ipp
-        patient.first_name = first_name
-        patient.last_name = last_name
-        patient.birth_date = birth_date
-        
         try:
-            db.session.add(patient)
-            db.session.commit()
-            flash(f'Patient created successfully with ID: {oncocentre_id}', 'success')
+            patient, created = create_patient_record(current_user, form.ipp.data, form.first_name.data,
+                                                     form.last_name.data, form.birth_date.data, form.sex.data,
+                                                     idempotency_key=form.idempotency_key.data or None)
+        except (ValueError, IdempotencyKeyReused) as e:
+            flash(str(e), 'error')
+            return redirect(url_for('main.index'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating patient: {str(e)}', 'error')
+            return redirect(url_for('main.index'))
+        
+        if created:
+            flash(f'Patient created successfully with ID: {patient.oncocentre_id}', 'success')
+        else:
+            flash(f'Patient with IPP {patient.ipp} already exists with ID {patient.oncocentre_id}', 'warning')
     else:
         for field, errors in form.errors.items():
             for error in errors:
@@ -92,16 +75,25 @@ def create_patient():
 @login_required
 def list_patients():
     """List patients - all for principal investigators, own for users, none for admins"""
-    # Admins cannot view patients
-    if current_user.is_admin and not current_user.is_principal_investigator:
+    # Admins cannot view patients; principal investigators see all patients,
+    # regular users only their own
+    try:
+        query = visible_patients(current_user)
+    except PatientAccessDenied:
         flash('Administrators cannot view patient lists. Please use a regular user account.', 'warning')
         return redirect(url_for('admin.dashboard'))
     
-    # Principal investigators see all patients
-    if current_user.is_principal_investigator:
-        patients = Patient.query.order_by(Patient.created_at.desc()).all()
-    else:
-        # Regular users see only their own patients
-        patients = Patient.query.filter_by(created_by=current_user.id).order_by(Patient.created_at.desc()).all()
+    # Answer 304 from two aggregates before loading or decrypting any patient
+    latest_id, count = query.with_entities(db.func.max(Patient.id), db.func.count(Patient.id)).one()
+    etag, not_modified = conditional_page(
+        'patients', latest_id, count, ResourceVersion.current('patients'),
+        current_user.id, current_user.username, current_user.is_admin, current_user.is_principal_investigator
+    )
+    if not_modified:
+        return not_modified
     
-    return render_template('main/patients.html', patients=patients, is_pi=current_user.is_principal_investigator)
\ No newline at end of file
+    # Stream rows as they are fetched and decrypted, a chunk at a time, so the
+    # first bytes leave immediately and memory does not grow with the registry
+    patients = iter_patients(query, current_app.config.get('PATIENT_LIST_CHUNK_SIZE', 500))
+    return cached_page(stream_page('main/patients.html', patients=patients, patient_count=count,
+                                   is_pi=current_user.is_principal_investigator), etag)
\ No newline at end of file
@@ -0,0 +1,61 @@
+"""
+Gunicorn configuration for production serving
+
+    gunicorn --config gunicorn.conf.py wsgi:app
+    python scripts/serve.py              # same, with optional TLS options
+
+Every setting can be overridden from the environment; see the sizing guide
+in docs/DEPLOYMENT_GUIDE.md (section 5) before changing workers/threads.
+"""
+
+import os
+import multiprocessing
+
+
+def _int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+
+# Processes x threads. Requests mostly wait on SQLite, LDAP and bcrypt (which
+# runs in its own pool), so a few threads per worker keep CPUs busy without
+# one process per concurrent request.
+workers = _int('GUNICORN_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 9))
+threads = _int('GUNICORN_THREADS', 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Import the application once in the master; workers share its memory
+# copy-on-write. Connections are reopened per worker in post_fork().
+preload_app = True
+
+# Seconds a worker may spend on one request, and to finish in-flight
+# requests on restart/shutdown
+timeout = _int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Behind Nginx: keep upstream connections open between requests
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers periodically (staggered) to bound memory growth
+max_requests = _int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+
+# Only trust X-Forwarded-* from the local reverse proxy
+forwarded_allow_ips = os.environ.get('GUNICORN_FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Reset connections and pools inherited from the master"""
+    import wsgi
+    wsgi.reset_after_fork()
+
+
+def ssl_context(conf, default_ssl_context_factory):
+    """TLS settings when Gunicorn terminates TLS itself (--certfile/--keyfile)"""
+    from scripts.run_https import tune_ssl_context
+    return tune_ssl_context(default_ssl_context_factory())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+HTTP throughput benchmark for sizing Gunicorn workers and threads
+
+Opens --concurrency keep-alive connections to a running server and requests
+the given paths in a loop for --duration seconds, then reports requests per
+second, latency percentiles and errors. Logged-in pages need a session
+cookie (--cookie 'session=...', copied from a browser).
+
+    python scripts/benchmark_http.py http://127.0.0.1:8000 --concurrency 32 \\
+        --path /auth/login --path /static/css/style.css
+"""
+
+import sys
+import time
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+
+def worker(url, paths, headers, stop_at, latencies, errors, lock):
+    """One client: a keep-alive connection issuing requests until stop_at"""
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    if parts.scheme == 'https':
+        import ssl
+        conn = connection_class(parts.netloc, timeout=30, context=ssl._create_unverified_context())
+    else:
+        conn = connection_class(parts.netloc, timeout=30)
+
+    local_latencies, local_errors, index = [], 0, 0
+    while time.perf_counter() < stop_at:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                local_errors += 1
+            else:
+                local_latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            local_errors += 1
+            conn.close()
+    conn.close()
+
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def benchmark(url, paths, concurrency, duration, cookie=None):
+    headers = {'Cookie': cookie} if cookie else {}
+    latencies, errors, lock = [], [0], threading.Lock()
+    stop_at = time.perf_counter() + duration
+    threads = [threading.Thread(target=worker, args=(url, paths, headers, stop_at, latencies, errors, lock))
+               for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{url} {', '.join(paths)}: {concurrency} connections, {elapsed:.1f}s")
+    print(f"   requests:   {len(latencies)} ok, {errors[0]} errors")
+    print(f"   throughput: {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        print(f"   latency:    p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+              f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    return len(latencies) / elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('url', help='Server base URL, e.g. http://127.0.0.1:8000')
+    parser.add_argument('--path', action='append', help='Path to request (repeatable, default: /auth/login)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent connections (default: 16)')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run (default: 20)')
+    parser.add_argument('--cookie', help='Cookie header for authenticated pages')
+    args = parser.parse_args()
+
+    if not args.url.startswith(('http://', 'https://')):
+        print("ERROR: URL must start with http:// or https://")
+        sys.exit(1)
+    benchmark(args.url.rstrip('/'), args.path or ['/auth/login'], args.concurrency, args.duration, args.cookie)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Measure application cold start
+
+Each run starts a fresh interpreter with `python -X importtime`, builds the
+application and serves GET /auth/login through the test client. Reports
+the slowest imports and the time from interpreter start to the first
+response, so import-time regressions show up before deployment.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app({config!r})
+imported = time.perf_counter()
+response = app.test_client().get({path!r})
+served = time.perf_counter()
+print('STARTUP', imported - started, served - started, response.status_code, file=sys.stderr)
+print('MODULES', ' '.join(m for m in ('ldap3', 'cryptography.fernet', 'bcrypt') if m in sys.modules), file=sys.stderr)
+"""
+
+
+def run_once(config_name, path):
+    """Run the probe in a fresh interpreter and parse its stderr"""
+    code = PROBE.format(config=config_name, path=path)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'probe failed')
+
+    imports, startup, modules = [], None, []
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:'):
+            # import time: self [us] | cumulative | imported package
+            fields = line[len('import time:'):].split('|')
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                imports.append((int(fields[1]), fields[2].rstrip()))
+        elif line.startswith('STARTUP '):
+            _, build, first, status = line.split()
+            startup = (float(build), float(first), int(status))
+        elif line.startswith('MODULES'):
+            modules = line.split()[1:]
+    return imports, startup, modules
+
+
+def benchmark(config_name, path, runs, top):
+    build_times, first_times = [], []
+    imports = modules = None
+    for _ in range(runs):
+        imports, (build, first, status), modules = run_once(config_name, path)
+        build_times.append(build)
+        first_times.append(first)
+
+    print(f"Cold start over {runs} run(s), config '{config_name}', GET {path} -> {status}")
+    print(f"   create_app():       median {statistics.median(build_times) * 1000:.0f} ms")
+    print(f"   first response:     median {statistics.median(first_times) * 1000:.0f} ms")
+    print(f"   heavy modules loaded: {', '.join(modules) if modules else 'none'}")
+
+    print("\nSlowest imports (cumulative, last run):")
+    top_level = [(us, name) for us, name in imports if not name.startswith('  ')]
+    for us, name in sorted(top_level, reverse=True)[:top]:
+        print(f"   {us / 1000:8.1f} ms  {name.strip()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='testing', help='Configuration name (default: testing)')
+    parser.add_argument('--path', default='/auth/login', help='First request path (default: /auth/login)')
+    parser.add_argument('--runs', type=int, default=3, help='Number of cold starts (default: 3)')
+    parser.add_argument('--top', type=int, default=15, help='Number of imports to list (default: 15)')
+    args = parser.parse_args()
+
+    try:
+        benchmark(args.config, args.path, args.runs, args.top)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
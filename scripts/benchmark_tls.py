@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+TLS handshake benchmark
+
+For each certificate key type, starts a local TLS server using the tuned
+context from run_https.py and measures, from a client on the same machine:
+
+- full handshakes (new session every time);
+- resumed handshakes (the client presents the session from a previous
+  connection; OpenSSL uses a session ticket).
+
+Both ends run on this machine, so times include client and server work.
+"""
+
+import os
+import ssl
+import sys
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scripts.run_https import KEY_TYPES, generate_certificate, tune_ssl_context
+
+
+def serve(listener, context, stop):
+    """Accept connections, complete the handshake and send one byte"""
+    listener.settimeout(0.2)
+    while not stop.is_set():
+        try:
+            sock, _ = listener.accept()
+        except socket.timeout:
+            continue
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            with context.wrap_socket(sock, server_side=True) as tls:
+                tls.sendall(b'x')
+                tls.recv(1)
+        except (OSError, ssl.SSLError):
+            pass
+
+
+def handshake(port, context, session=None):
+    """One connection; returns (seconds, session, reused)"""
+    started = time.perf_counter()
+    with socket.create_connection(('127.0.0.1', port)) as sock:
+        # Without this, delayed ACKs dominate the measurement
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with context.wrap_socket(sock, server_hostname='localhost', session=session) as tls:
+            # Reading the byte also receives TLS 1.3 session tickets
+            tls.recv(1)
+            elapsed = time.perf_counter() - started
+            reused, session = tls.session_reused, tls.session
+            tls.sendall(b'x')
+    return elapsed, session, reused
+
+
+def benchmark(key_type, count, tls_version):
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_file, key_file = generate_certificate(os.path.join(tmp, 'server.crt'),
+                                                   os.path.join(tmp, 'server.key'), key_type)
+        server_context = tune_ssl_context(ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER))
+        server_context.load_cert_chain(cert_file, key_file)
+        client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_context.load_verify_locations(cert_file)
+        client_context.minimum_version = client_context.maximum_version = tls_version
+
+        listener = socket.create_server(('127.0.0.1', 0))
+        stop = threading.Event()
+        thread = threading.Thread(target=serve, args=(listener, server_context, stop), daemon=True)
+        thread.start()
+        port = listener.getsockname()[1]
+        try:
+            full = [handshake(port, client_context)[0] for _ in range(count)]
+            _, session, _ = handshake(port, client_context)
+            resumed, reused_count = [], 0
+            for _ in range(count):
+                elapsed, session, reused = handshake(port, client_context, session)
+                resumed.append(elapsed)
+                reused_count += reused
+        finally:
+            stop.set()
+            thread.join()
+            listener.close()
+    return statistics.median(full), statistics.median(resumed), reused_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200, help='Handshakes per measurement (default: 200)')
+    parser.add_argument('--key-type', action='append', choices=KEY_TYPES,
+                        help='Key types to compare (repeatable, default: all)')
+    parser.add_argument('--tls', choices=('1.2', '1.3'), default='1.3', help='TLS version (default: 1.3)')
+    args = parser.parse_args()
+
+    tls_version = ssl.TLSVersion.TLSv1_3 if args.tls == '1.3' else ssl.TLSVersion.TLSv1_2
+    print(f"TLS {args.tls} handshakes on 127.0.0.1, median of {args.count} ({ssl.OPENSSL_VERSION})")
+    for key_type in args.key_type or KEY_TYPES:
+        full, resumed, reused = benchmark(key_type, args.count, tls_version)
+        print(f"   {key_type:8} full {full * 1000:7.2f} ms   resumed {resumed * 1000:7.2f} ms   "
+              f"({reused}/{args.count} resumed)")
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed static assets into static/dist/
+
+Run after every change to static/ (and after scripts/vendor_assets.py) as
+part of a deployment; restart the application afterwards to load the new
+manifest.
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.assets import build_manifest
+from app.core.encoding import supported_encodings
+
+STATIC_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clean', action='store_true',
+                        help='Delete previously built files (pages cached by browsers may still reference them)')
+    args = parser.parse_args()
+
+    assets = build_manifest(STATIC_FOLDER, clean=args.clean)
+    for logical, entry in sorted(assets.items()):
+        encodings = ', '.join(entry['encodings']) or 'uncompressed'
+        print(f"   {logical} -> {entry['path']} ({entry['size']} bytes; {encodings})")
+    print(f"OK Built {len(assets)} assets with {', '.join(supported_encodings())} variants")
+    if 'br' not in supported_encodings():
+        print("Note: install the brotli package to also produce .br variants")
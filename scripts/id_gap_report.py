@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Report oncocentre sequence numbers that were never assigned to a patient
+
+Identifiers are handed out from blocks leased by each worker (ID_BLOCK_SIZE),
+so gaps are expected: unused numbers of a worker that stopped after another
+leased a block, creations that failed after allocation, deleted patients.
+Each missing range is listed with the likely reason.
+
+    python scripts/id_gap_report.py [--year 2025] [config]
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.core.sequence import find_gaps
+
+def main():
+    parser = argparse.ArgumentParser(description='List unassigned oncocentre sequence numbers')
+    parser.add_argument('config', nargs='?', default=os.environ.get('FLASK_CONFIG', 'production'))
+    parser.add_argument('--year', type=int, default=datetime.now().year)
+    args = parser.parse_args()
+
+    app = create_app(args.config)
+    with app.app_context():
+        gaps = find_gaps(args.year)
+
+    if not gaps:
+        print(f"OK No gaps in the {args.year} sequence")
+        return
+    missing = sum(stop - start for start, stop, _ in gaps)
+    print(f"{missing} unassigned number(s) in the {args.year} sequence:")
+    for start, stop, reason in gaps:
+        numbers = str(start) if stop - start == 1 else f"{start}-{stop - 1}"
+        print(f"  {numbers:>13}  {reason}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Create missing database tables
+
+create_app() no longer creates the schema in production (AUTO_CREATE_SCHEMA),
+so run this once after installing or upgrading the application.
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.core.models import db
+
+def init_db(config_name):
+    """Create every table that does not exist yet"""
+    app = create_app(config_name)
+
+    with app.app_context():
+        existing = set(db.inspect(db.engine).get_table_names())
+        db.create_all()
+        created = sorted(set(db.inspect(db.engine).get_table_names()) - existing)
+
+    if created:
+        print(f"OK Created tables: {', '.join(created)}")
+    else:
+        print("OK Database schema is up to date")
+    return True
+
+if __name__ == '__main__':
+    config_name = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('FLASK_CONFIG', 'production')
+    init_db(config_name)
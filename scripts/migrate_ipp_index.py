@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Add the IPP blind index column and fill it for existing patients
+
+IPPs are stored Fernet-encrypted, and Fernet tokens differ every time, so
+"does this user already have this IPP" is answered from patient.ipp_index,
+a keyed hash of the IPP. Patients created before the column existed have
+none and would not be found; this adds the column and its index, then
+decrypts each of their IPPs once to fill it. Safe to run more than once.
+
+    python scripts/migrate_ipp_index.py [config]
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.core.models import db, Patient, blind_index, get_cipher_suite
+
+BATCH_SIZE = 1000
+
+def migrate_ipp_index(config_name):
+    """Add the missing column and index, then backfill it"""
+    app = create_app(config_name)
+
+    with app.app_context():
+        db.create_all()
+        columns = {column['name'] for column in db.inspect(db.engine).get_columns('patient')}
+        if 'ipp_index' not in columns:
+            with db.engine.begin() as conn:
+                conn.execute(db.text("ALTER TABLE patient ADD COLUMN ipp_index VARCHAR(64)"))
+            print("OK Added column patient.ipp_index")
+        # Only this script's index: the others may cover columns not added yet
+        _index('ix_patient_ipp_index').create(db.engine, checkfirst=True)
+
+        table = Patient.__table__
+        cipher = get_cipher_suite()
+        updated, unreadable = 0, []
+        with db.engine.begin() as conn:
+            rows = conn.execute(db.select(table.c.id, table.c.oncocentre_id, table.c.ipp_encrypted)
+                                .where(table.c.ipp_index.is_(None)))
+            batch = []
+            for row in rows.all():
+                try:
+                    ipp = cipher.decrypt(row.ipp_encrypted.encode()).decode()
+                except Exception:
+                    unreadable.append(row.oncocentre_id)
+                    continue
+                batch.append({'row_id': row.id, 'ipp_index': blind_index(ipp)})
+                if len(batch) == BATCH_SIZE:
+                    updated += _update(conn, batch)
+                    batch = []
+            if batch:
+                updated += _update(conn, batch)
+
+    print(f"OK Indexed the IPP of {updated} patient(s)")
+    for oncocentre_id in unreadable:
+        print(f"WARN IPP could not be decrypted, left unindexed: {oncocentre_id}")
+    return True
+
+def _index(name):
+    return next(index for index in Patient.__table__.indexes if index.name == name)
+
+def _update(conn, batch):
+    table = Patient.__table__
+    statement = table.update().where(table.c.id == db.bindparam('row_id')).values(
+        ipp_index=db.bindparam('ipp_index'))
+    conn.execute(statement, batch)
+    return len(batch)
+
+if __name__ == '__main__':
+    config_name = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('FLASK_CONFIG', 'production')
+    migrate_ipp_index(config_name)
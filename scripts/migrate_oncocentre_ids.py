@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Add the numeric oncocentre ID columns and fill them for existing patients
+
+Patients now store the year and sequence number of their identifier in
+id_year / id_sequence, which the allocator and any ordering use instead of
+the ONCOCENTRE_YYYY_NNNNN string. Existing identifiers are kept as they are;
+this only adds the columns and their index, then parses every identifier.
+Safe to run more than once.
+
+    python scripts/migrate_oncocentre_ids.py [config]
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.core.models import db, Patient
+from app.core.sequence import parse_oncocentre_id
+
+BATCH_SIZE = 1000
+
+def migrate_oncocentre_ids(config_name):
+    """Add missing columns and index, then backfill them"""
+    app = create_app(config_name)
+
+    with app.app_context():
+        db.create_all()
+        columns = {column['name'] for column in db.inspect(db.engine).get_columns('patient')}
+        with db.engine.begin() as conn:
+            for name in ('id_year', 'id_sequence'):
+                if name not in columns:
+                    conn.execute(db.text(f"ALTER TABLE patient ADD COLUMN {name} INTEGER"))
+                    print(f"OK Added column patient.{name}")
+        # Only this script's index: the others may cover columns not added yet
+        _index('ix_patient_id_number').create(db.engine, checkfirst=True)
+
+        table = Patient.__table__
+        updated, invalid = 0, []
+        with db.engine.begin() as conn:
+            rows = conn.execute(db.select(table.c.id, table.c.oncocentre_id).where(table.c.id_sequence.is_(None)))
+            batch = []
+            for row in rows.all():
+                try:
+                    year, sequence = parse_oncocentre_id(row.oncocentre_id)
+                except ValueError:
+                    invalid.append(row.oncocentre_id)
+                    continue
+                batch.append({'row_id': row.id, 'year': year, 'sequence': sequence})
+                if len(batch) == BATCH_SIZE:
+                    updated += _update(conn, batch)
+                    batch = []
+            if batch:
+                updated += _update(conn, batch)
+
+    print(f"OK Filled the numeric ID of {updated} patient(s)")
+    for oncocentre_id in invalid:
+        print(f"WARN Not an ONCOCENTRE_YYYY_NNNNN identifier, left unnumbered: {oncocentre_id}")
+    return True
+
+def _index(name):
+    return next(index for index in Patient.__table__.indexes if index.name == name)
+
+def _update(conn, batch):
+    table = Patient.__table__
+    statement = table.update().where(table.c.id == db.bindparam('row_id')).values(
+        id_year=db.bindparam('year'), id_sequence=db.bindparam('sequence'))
+    conn.execute(statement, batch)
+    return len(batch)
+
+if __name__ == '__main__':
+    config_name = sys.argv[1] if len(sys.argv) > 1 else os.environ.get('FLASK_CONFIG', 'production')
+    migrate_oncocentre_ids(config_name)
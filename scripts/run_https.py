@@ -1,52 +1,136 @@
 #!/usr/bin/env python3
 """
 HTTPS server for the CARPEM Oncocentre application
+
+Single-process Werkzeug server for demonstrations and testing. Production
+traffic should go through scripts/serve.py (Gunicorn, several workers).
+
+Self-signed certificates are generated in-process with ECDSA P-256 keys,
+whose handshakes are much cheaper than RSA-4096 (see
+scripts/benchmark_tls.py).
 """
 
 import os
 import ssl
 import sys
+import argparse
+import datetime
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from app import create_app
-
-def create_ssl_context():
-    """Create SSL context with self-signed certificates"""
-    import subprocess
-    import tempfile
-    
-    cert_file = 'server.crt'
-    key_file = 'server.key'
-    
-    # Generate self-signed certificate if it doesn't exist
+KEY_TYPES = ('ec', 'rsa2048', 'rsa4096')
+
+# TLS 1.2 suites: forward secrecy and AEAD only (TLS 1.3 suites are fixed)
+TLS12_CIPHERS = 'ECDHE+AESGCM:ECDHE+CHACHA20'
+
+
+def generate_certificate(cert_file='server.crt', key_file='server.key', key_type='ec',
+                         hostnames=('localhost',), days=365):
+    """Write a self-signed certificate and its private key"""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if key_type == 'ec':
+        key = ec.generate_private_key(ec.SECP256R1())
+    elif key_type in ('rsa2048', 'rsa4096'):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=int(key_type[3:]))
+    else:
+        raise ValueError(f"Unknown key type {key_type!r} (expected one of {', '.join(KEY_TYPES)})")
+
+    subject = x509.Name([
+        x509.NameAttribute(NameOID.COUNTRY_NAME, 'FR'),
+        x509.NameAttribute(NameOID.STATE_OR_PROVINCE_NAME, 'IDF'),
+        x509.NameAttribute(NameOID.LOCALITY_NAME, 'Paris'),
+        x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'CARPEM'),
+        x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, 'Oncocentre'),
+        x509.NameAttribute(NameOID.COMMON_NAME, hostnames[0]),
+    ])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=days))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName(name) for name in hostnames]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+
+    # Private key readable by the owner only
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open(cert_file, 'wb') as f:
+        f.write(certificate.public_bytes(serialization.Encoding.PEM))
+    return cert_file, key_file
+
+
+def ensure_certificate(cert_file='server.crt', key_file='server.key', key_type='ec'):
+    """Generate a self-signed certificate unless one already exists"""
     if not os.path.exists(cert_file) or not os.path.exists(key_file):
-        print("Generating self-signed SSL certificate...")
-        subprocess.run([
-            'openssl', 'req', '-x509', '-newkey', 'rsa:4096', '-nodes',
-            '-out', cert_file, '-keyout', key_file, '-days', '365',
-            '-subj', '/C=FR/ST=IDF/L=Paris/O=CARPEM/OU=Oncocentre/CN=localhost'
-        ], check=True)
+        print(f"Generating self-signed SSL certificate ({key_type})...")
+        generate_certificate(cert_file, key_file, key_type)
         print(f"SSL certificate created: {cert_file}, {key_file}")
-    
-    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    return cert_file, key_file
+
+
+def tune_ssl_context(context):
+    """Restrict a server context to fast, forward-secret TLS with resumption
+
+    - TLS 1.2 minimum, ECDHE key exchange with AEAD ciphers, server order;
+    - session tickets (stateless resumption, also across reconnects) and the
+      server-side session cache, so returning clients skip the full handshake.
+    """
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.set_ciphers(TLS12_CIPHERS)
+    context.set_ecdh_curve('prime256v1')
+    context.options |= ssl.OP_CIPHER_SERVER_PREFERENCE | ssl.OP_NO_COMPRESSION
+    context.options &= ~ssl.OP_NO_TICKET
+    if hasattr(context, 'num_tickets'):
+        context.num_tickets = 2
+    return context
+
+
+def create_ssl_context(cert_file='server.crt', key_file='server.key', key_type='ec'):
+    """Create a tuned SSL context, generating a self-signed certificate if needed"""
+    cert_file, key_file = ensure_certificate(cert_file, key_file, key_type)
+
+    context = tune_ssl_context(ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER))
     context.load_cert_chain(cert_file, key_file)
     return context
 
+
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--key-type', choices=KEY_TYPES, default='ec',
+                        help='Key for a newly generated certificate (default: ec = ECDSA P-256)')
+    parser.add_argument('--regenerate', action='store_true',
+                        help='Replace the existing server.crt/server.key')
+    args = parser.parse_args()
+
+    from app import create_app
+
     # Create application
     app = create_app('production')
-    
+
     # Set up SSL context
-    ssl_context = create_ssl_context()
-    
+    if args.regenerate:
+        generate_certificate(key_type=args.key_type)
+    ssl_context = create_ssl_context(key_type=args.key_type)
+
     print("Starting CARPEM Oncocentre HTTPS server...")
     print("Access the application at: https://localhost:5000")
     print("Login with: admin / admin123 (change in production)")
-    
+
     # Run HTTPS server
     app.run(
         host='0.0.0.0',
         port=5000,
         ssl_context=ssl_context,
         debug=False
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Production server for the CARPEM Oncocentre application
+
+Runs wsgi:app under Gunicorn with gunicorn.conf.py: a master process that
+preloads the application and several worker processes, each with a few
+threads. Command-line options override the GUNICORN_* environment settings.
+
+Graceful operations on the master process:
+    kill -HUP <pid>    restart workers, letting in-flight requests finish
+    kill -TERM <pid>   stop after in-flight requests (graceful_timeout)
+    kill -USR2 <pid>   start a new master with upgraded code, then TERM the old one
+"""
+
+import os
+import sys
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+
+def build_command(args):
+    """Gunicorn command line for the given options"""
+    command = [sys.executable, '-m', 'gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py')]
+    if args.bind:
+        command += ['--bind', args.bind]
+    if args.workers:
+        command += ['--workers', str(args.workers)]
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+        if args.threads > 1:
+            command += ['--worker-class', 'gthread']
+    if args.https:
+        from scripts.run_https import ensure_certificate
+        cert_file, key_file = ensure_certificate(args.cert, args.key)
+        command += ['--certfile', cert_file, '--keyfile', key_file]
+    return command + ['wsgi:app']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bind', help='Address to listen on (default: $GUNICORN_BIND or 127.0.0.1:8000)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: $GUNICORN_WORKERS)')
+    parser.add_argument('--threads', type=int, help='Threads per worker (default: $GUNICORN_THREADS or 4)')
+    parser.add_argument('--https', action='store_true',
+                        help='Terminate TLS in Gunicorn (normally done by Nginx)')
+    parser.add_argument('--cert', default='server.crt', help='Certificate file (generated if missing)')
+    parser.add_argument('--key', default='server.key', help='Private key file (generated if missing)')
+    args = parser.parse_args()
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("ERROR: Gunicorn is not installed (pip install gunicorn; not available on Windows)")
+        sys.exit(1)
+
+    os.chdir(ROOT)
+    command = build_command(args)
+    print(f"Starting CARPEM Oncocentre with: {' '.join(command[1:])}")
+    os.execv(sys.executable, command)
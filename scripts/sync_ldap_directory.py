@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Synchronise users and the whitelist with the members of the LDAP_SYNC_GROUPS
+directory groups. Meant to run from cron.
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.core.models import User
+from app.core.directory import get_ldap_authenticator
+from app.core.ldap_sync import sync_from_config
+
+
+def sync_directory(config_name, dry_run=False, deactivate_leavers=True):
+    """Run one directory synchronisation"""
+    app = create_app(config_name)
+
+    with app.app_context():
+        ldap_auth = get_ldap_authenticator()
+        if not ldap_auth.is_enabled():
+            print("ERROR: LDAP is disabled or not configured")
+            return False
+
+        admin_user = User.query.filter_by(is_admin=True).order_by(User.id).first()
+        if not admin_user:
+            print("ERROR: No admin user found to record as creator of whitelist entries")
+            return False
+
+        try:
+            stats = sync_from_config(app, ldap_auth, admin_user.id,
+                                     deactivate_leavers=deactivate_leavers, dry_run=dry_run)
+        except Exception as e:
+            print(f"ERROR: Directory sync failed: {e}")
+            return False
+
+        prefix = "DRY RUN " if dry_run else ""
+        print(f"{prefix}OK {stats['members']} group members: "
+              f"{stats['created']} created, {stats['updated']} updated, "
+              f"{stats['reactivated']} reactivated, {stats['whitelisted']} whitelisted, "
+              f"{stats['deactivated']} deactivated")
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--config', default=os.environ.get('FLASK_CONFIG', 'development'),
+                        help='Configuration name (default: $FLASK_CONFIG or development)')
+    parser.add_argument('--dry-run', action='store_true', help='Show the changes without saving them')
+    parser.add_argument('--keep-leavers', action='store_true',
+                        help='Do not deactivate users who left the synced groups')
+    args = parser.parse_args()
+
+    success = sync_directory(args.config, dry_run=args.dry_run, deactivate_leavers=not args.keep_leavers)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Download pinned third-party front-end libraries into static/vendor/
+
+Templates use the local copy when present and fall back to the CDN
+otherwise. Downloads are checked against their published SRI hashes. Run
+once (from a machine with Internet access if needed), then
+scripts/build_assets.py.
+"""
+
+import os
+import sys
+import base64
+import hashlib
+import urllib.request
+
+STATIC_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static'))
+
+# static path -> (URL, SRI hash)
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+        'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM'
+    ),
+    'vendor/bootstrap/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+        'sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz'
+    ),
+}
+
+
+def sri_hash(data):
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode('ascii')
+
+
+def vendor_assets():
+    """Download every missing asset; returns False if any failed"""
+    success = True
+    for path, (url, integrity) in VENDOR_ASSETS.items():
+        target = os.path.join(STATIC_FOLDER, *path.split('/'))
+        if os.path.exists(target):
+            print(f"OK {path} already present")
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                data = response.read()
+        except OSError as e:
+            print(f"ERROR: Could not download {url}: {e}")
+            success = False
+            continue
+        if sri_hash(data) != integrity:
+            print(f"ERROR: {url} does not match its pinned hash, not saved")
+            success = False
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        print(f"OK {path} ({len(data)} bytes)")
+    return success
+
+
+if __name__ == '__main__':
+    sys.exit(0 if vendor_assets() else 1)
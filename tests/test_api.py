@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Tests for the patient JSON API
+"""
+
+import os
+import sys
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from datetime import datetime, timedelta
+
+from app.core.models import db, User, Patient, WhitelistEntry, IdempotencyKey
+from tests.test_conditional_get import make_app, login, add_patient
+
+
+def make_api_app():
+    """Testing app with a PI (one patient), a regular user (two patients) and an admin"""
+    app = make_app()
+    with app.app_context():
+        pi = User.query.filter_by(username='pi').one()
+        user = User(username='doctor')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(WhitelistEntry(username='doctor', created_by=pi.id))
+        add_patient(user.id, 'ONCOCENTRE_2025_00002')
+        add_patient(user.id, 'ONCOCENTRE_2025_00003')
+    return app
+
+
+def test_requires_login():
+    with make_api_app().test_client() as client:
+        response = client.get('/api/v1/patients')
+        assert response.status_code == 401
+        assert response.get_json() == {'error': 'Authentication required'}
+    print("✓ API requires authentication")
+
+
+def test_role_rules_match_patient_list():
+    """PIs see everything, users their own patients, admins nothing"""
+    app = make_api_app()
+    with app.test_client() as client:
+        login(client, 'pi')
+        ids = [p['oncocentre_id'] for p in client.get('/api/v1/patients').get_json()['data']]
+        assert ids == ['ONCOCENTRE_2025_00003', 'ONCOCENTRE_2025_00002', 'ONCOCENTRE_2025_00001']
+
+    with app.test_client() as client:
+        login(client, 'doctor')
+        ids = [p['oncocentre_id'] for p in client.get('/api/v1/patients').get_json()['data']]
+        assert ids == ['ONCOCENTRE_2025_00003', 'ONCOCENTRE_2025_00002']
+        assert client.get('/api/v1/patients/ONCOCENTRE_2025_00001').status_code == 404
+        patient = client.get('/api/v1/patients/ONCOCENTRE_2025_00002').get_json()
+        assert patient['first_name'] == 'Marie' and patient['birth_date'] == '1967-11-07'
+
+    with app.test_client() as client:
+        login(client, 'admin')
+        assert client.get('/api/v1/patients').status_code == 403
+    print("✓ API enforces the patient list role rules")
+
+
+def test_cursor_pagination_and_field_selection():
+    """Pages follow next_cursor; plain fields are returned without decrypting"""
+    app = make_api_app()
+    with app.test_client() as client:
+        login(client, 'pi')
+        with mock.patch.object(Patient, '_decrypt_data') as decrypt:
+            seen, cursor = [], None
+            while True:
+                url = '/api/v1/patients?limit=2&fields=oncocentre_id,sex'
+                page = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+                assert all(set(p) == {'oncocentre_id', 'sex'} for p in page['data'])
+                seen += [p['oncocentre_id'] for p in page['data']]
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            assert decrypt.call_count == 0
+        assert seen == ['ONCOCENTRE_2025_00003', 'ONCOCENTRE_2025_00002', 'ONCOCENTRE_2025_00001']
+
+        assert client.get('/api/v1/patients?fields=password').status_code == 400
+        assert client.get('/api/v1/patients?cursor=%%%').status_code == 400
+    print("✓ Cursor pagination and field selection work")
+
+
+def test_create_patient():
+    """POST creates a patient; the same IPP again returns the existing one"""
+    app = make_api_app()
+    body = {'ipp': '12345', 'first_name': 'Ada', 'last_name': 'Lovelace', 'birth_date': '1980-12-10', 'sex': 'F'}
+    with app.test_client() as client:
+        login(client, 'doctor')
+        response = client.post('/api/v1/patients', json=body)
+        assert response.status_code == 201
+        created = response.get_json()
+        assert created['oncocentre_id'].startswith('ONCOCENTRE_')
+        assert response.headers['Location'].endswith(created['oncocentre_id'])
+
+        again = client.post('/api/v1/patients', json={**body, 'first_name': 'Augusta'})
+        assert again.status_code == 200
+        assert again.get_json()['oncocentre_id'] == created['oncocentre_id']
+        assert client.post('/api/v1/patients', json={**body, 'ipp': '1234'}).status_code == 201
+
+        assert client.post('/api/v1/patients', json={**body, 'sex': 'X'}).status_code == 400
+        assert client.post('/api/v1/patients', json={**body, 'birth_date': '10/12/1980'}).status_code == 400
+        assert client.post('/api/v1/patients', data=body).status_code == 415
+
+    with app.test_client() as client:
+        login(client, 'admin')
+        assert client.post('/api/v1/patients', json=body).status_code == 403
+    print("✓ Patients can be created through the API")
+
+
+def test_idempotency_key_replays_creation():
+    """A retried POST with the same key returns the first patient without creating another"""
+    app = make_api_app()
+    body = {'ipp': '777', 'first_name': 'Ada', 'last_name': 'Lovelace', 'birth_date': '1980-12-10', 'sex': 'F'}
+    headers = {'Idempotency-Key': 'retry-1'}
+    with app.test_client() as client:
+        login(client, 'doctor')
+        first = client.post('/api/v1/patients', json=body, headers=headers)
+        assert first.status_code == 201
+        with mock.patch.object(Patient, '_encrypt_data') as encrypt:
+            retry = client.post('/api/v1/patients', json=body, headers=headers)
+            assert encrypt.call_count == 0
+        assert retry.status_code == 201
+        assert retry.get_json()['oncocentre_id'] == first.get_json()['oncocentre_id']
+        assert client.post('/api/v1/patients', json={**body, 'ipp': '778'}, headers=headers).status_code == 422
+
+        # Expired keys no longer replay, and their row is reused
+        with app.app_context():
+            assert Patient.query.count() == 4
+            IdempotencyKey.query.update({'created_at': datetime.utcnow() - timedelta(days=2)})
+            db.session.commit()
+        again = client.post('/api/v1/patients', json={**body, 'ipp': '778'}, headers=headers)
+        assert again.status_code == 201
+        assert again.get_json()['oncocentre_id'] != first.get_json()['oncocentre_id']
+        with app.app_context():
+            assert IdempotencyKey.query.count() == 1
+
+    with app.test_client() as client:
+        # Keys are per user
+        login(client, 'pi')
+        assert client.post('/api/v1/patients', json=body, headers=headers).status_code == 201
+    print("✓ Idempotency keys make patient creation retries safe")
+
+
+def test_bulk_create_patients():
+    """A batch gets consecutive identifiers in one commit, or nothing if any item is invalid"""
+    app = make_api_app()
+    items = [{'ipp': f'IPP{i}', 'first_name': 'Ada', 'last_name': f'Patient{i}',
+              'birth_date': '1980-12-10', 'sex': 'F'} for i in range(5)]
+    with app.test_client() as client:
+        login(client, 'doctor')
+        commits = []
+
+        def count_commit(session):
+            commits.append(session)
+        event.listen(Session, 'after_commit', count_commit)
+        try:
+            response = client.post('/api/v1/patients/bulk', json={'patients': items})
+        finally:
+            event.remove(Session, 'after_commit', count_commit)
+        assert response.status_code == 201
+        ids = response.get_json()['oncocentre_ids']
+        sequences = [int(oncocentre_id.rsplit('_', 1)[1]) for oncocentre_id in ids]
+        assert sequences == list(range(sequences[0], sequences[0] + 5))
+        assert len(commits) == 1
+        with app.app_context():
+            assert [Patient.query.filter_by(oncocentre_id=i).one().last_name for i in ids] == \
+                [f'Patient{i}' for i in range(5)]
+
+        fresh = {**items[0], 'ipp': 'other'}
+        invalid = [fresh, {**items[1], 'sex': 'X'}, 'nope', items[0], fresh]
+        response = client.post('/api/v1/patients/bulk', json={'patients': invalid})
+        assert response.status_code == 400
+        errors = response.get_json()['errors']
+        assert [error['index'] for error in errors] == [1, 2, 3, 4]
+        assert errors[2]['error'] == f'IPP already registered as {ids[0]}'
+        assert errors[3]['error'] == 'IPP already used by item 0'
+        with app.app_context():
+            assert Patient.query.count() == 3 + 5
+
+        # Retrying with the same Idempotency-Key returns the first identifiers
+        headers = {'Idempotency-Key': 'bulk-1'}
+        retried = [{**item, 'ipp': f'NEW{i}'} for i, item in enumerate(items[:2])]
+        first = client.post('/api/v1/patients/bulk', json={'patients': retried}, headers=headers)
+        assert first.status_code == 201
+        again = client.post('/api/v1/patients/bulk', json={'patients': retried}, headers=headers)
+        assert again.status_code == 201
+        assert again.get_json() == first.get_json()
+        assert client.post('/api/v1/patients/bulk', json={'patients': retried[:1]},
+                           headers=headers).status_code == 422
+        with app.app_context():
+            assert Patient.query.count() == 3 + 5 + 2
+
+        assert client.post('/api/v1/patients/bulk', json={'patients': []}).status_code == 400
+        app.config['API_BULK_MAX_ITEMS'] = 2
+        assert client.post('/api/v1/patients/bulk', json={'patients': items}).status_code == 413
+    print("✓ Patients can be created in bulk")
+
+
+if __name__ == '__main__':
+    test_requires_login()
+    test_role_rules_match_patient_list()
+    test_cursor_pagination_and_field_selection()
+    test_create_patient()
+    test_idempotency_key_replays_creation()
+    test_bulk_create_patients()
+    print("\n✓ Patient API tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for compression of dynamic responses
+"""
+
+import os
+import sys
+import gzip
+import json
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask, Response, jsonify
+from app.core.compression import ResponseCompressor
+
+ROWS = [{'oncocentre_id': f'ONCOCENTRE_2025_{i:05d}', 'sex': 'F'} for i in range(200)]
+
+
+def make_app(**settings):
+    """Throwaway app with a few representative views"""
+    app = Flask(__name__)
+    app.config.update(COMPRESS_MIN_SIZE=500, **settings)
+    ResponseCompressor(app)
+
+    @app.route('/json')
+    def rows():
+        return jsonify(ROWS)
+
+    @app.route('/small')
+    def small():
+        return 'ok'
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'<tr><td>{row["oncocentre_id"]}</td></tr>' for row in ROWS), mimetype='text/html')
+
+    @app.route('/png')
+    def png():
+        return Response(b'\x89PNG' * 1000, mimetype='image/png')
+
+    return app
+
+
+def test_large_text_responses_are_compressed():
+    """JSON above the threshold is gzipped when the client accepts it"""
+    with make_app().test_client() as client:
+        response = client.get('/json', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) == len(response.data)
+        assert json.loads(gzip.decompress(response.data)) == ROWS
+
+        # Without Accept-Encoding the identity representation is sent
+        response = client.get('/json')
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+    print("✓ Large JSON responses are compressed")
+
+
+def test_small_and_binary_responses_are_skipped():
+    """Small bodies and non-text types are not compressed"""
+    with make_app().test_client() as client:
+        assert 'Content-Encoding' not in client.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+        assert 'Content-Encoding' not in client.get('/png', headers={'Accept-Encoding': 'gzip'}).headers
+    print("✓ Small and binary responses are left alone")
+
+
+def test_streamed_responses_are_compressed():
+    """Streamed pages are compressed incrementally without Content-Length"""
+    with make_app().test_client() as client:
+        response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in response.headers
+        html = gzip.decompress(response.data).decode()
+        assert html.count('<tr>') == len(ROWS)
+    print("✓ Streamed responses are compressed")
+
+
+def test_compression_can_be_disabled():
+    with make_app(COMPRESS_ENABLED=False).test_client() as client:
+        assert 'Content-Encoding' not in client.get('/json', headers={'Accept-Encoding': 'gzip'}).headers
+    print("✓ Compression can be disabled")
+
+
+if __name__ == '__main__':
+    test_large_text_responses_are_compressed()
+    test_small_and_binary_responses_are_skipped()
+    test_streamed_responses_are_compressed()
+    test_compression_can_be_disabled()
+    print("\n✓ Response compression tests passed")
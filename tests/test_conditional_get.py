@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tests for ETag / 304 handling on list pages
+"""
+
+import os
+import sys
+from datetime import date
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app
+from app.config import TestingConfig
+from app.core.models import db, User, Patient, WhitelistEntry, ResourceVersion
+
+
+def make_app(database_path=None):
+    """Testing app with a principal investigator, an admin and one patient
+
+    database_path puts the database in a file instead of memory, so that
+    separate connections lock each other out like in production.
+    """
+    uri = f'sqlite:///{database_path}' if database_path else TestingConfig.SQLALCHEMY_DATABASE_URI
+    with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', uri):
+        app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        pi = User(username='pi', is_principal_investigator=True)
+        pi.set_password('testpass')
+        admin = User(username='admin', is_admin=True)
+        admin.set_password('testpass')
+        db.session.add_all([pi, admin])
+        db.session.commit()
+        db.session.add_all([WhitelistEntry(username='pi', created_by=pi.id),
+                            WhitelistEntry(username='admin', created_by=pi.id)])
+        add_patient(pi.id, 'ONCOCENTRE_2025_00001')
+    return app
+
+
+def add_patient(user_id, oncocentre_id):
+    patient = Patient(oncocentre_id=oncocentre_id, sex='F', created_by=user_id)
+    patient.ipp = oncocentre_id[-5:]
+    patient.first_name = 'Marie'
+    patient.last_name = 'Curie'
+    patient.birth_date = date(1967, 11, 7)
+    db.session.add(patient)
+    db.session.commit()
+
+
+def login(client, username):
+    client.post('/auth/login', data={'username': username, 'password': 'testpass', 'auth_method': 'local'})
+    # Consume the welcome flash message
+    client.get('/auth/login')
+
+
+def test_versions_follow_writes():
+    """Flushing a versioned model bumps its resource version"""
+    app = make_app()
+    with app.app_context():
+        patients, whitelist = ResourceVersion.current('patients', 'whitelist')
+        assert patients >= 1
+        WhitelistEntry.remove_username('admin')
+        assert ResourceVersion.current('patients', 'whitelist') == (patients, whitelist + 1)
+    print("✓ Resource versions follow writes")
+
+
+def test_patient_list_answers_304_without_decrypting():
+    """An unchanged patient list is revalidated without touching patient rows"""
+    app = make_app()
+    with app.test_client() as client:
+        login(client, 'pi')
+        response = client.get('/patients')
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert 'private' in response.headers['Cache-Control'] and 'no-cache' in response.headers['Cache-Control']
+
+        with mock.patch.object(Patient, '_decrypt_data') as decrypt:
+            response = client.get('/patients', headers={'If-None-Match': etag})
+            assert response.status_code == 304
+            assert response.data == b''
+            assert decrypt.call_count == 0
+
+        with app.app_context():
+            add_patient(User.query.filter_by(username='pi').one().id, 'ONCOCENTRE_2025_00002')
+        response = client.get('/patients', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        assert 'ONCOCENTRE_2025_00002' in response.get_data(as_text=True)
+    print("✓ Patient list answers 304 until a patient is added")
+
+
+def test_whitelist_page_revalidates_after_change():
+    """Whitelist changes give the admin page a new ETag"""
+    app = make_app()
+    with app.test_client() as client:
+        login(client, 'admin')
+        etag = client.get('/admin/whitelist').headers['ETag']
+        assert client.get('/admin/whitelist', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/admin/users').status_code == 200
+
+        client.post('/admin/whitelist/add', data={'username': 'newdoctor'})
+        # The redirect target shows the flash message, so it is never a 304
+        response = client.get('/admin/whitelist', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert 'newdoctor' in response.get_data(as_text=True)
+        new_etag = response.headers['ETag']
+        assert new_etag != etag
+        assert client.get('/admin/whitelist', headers={'If-None-Match': new_etag}).status_code == 304
+    print("✓ Whitelist page revalidates after a change")
+
+
+if __name__ == '__main__':
+    test_versions_follow_writes()
+    test_patient_list_answers_304_without_decrypting()
+    test_whitelist_page_revalidates_after_change()
+    print("\n✓ Conditional GET tests passed")
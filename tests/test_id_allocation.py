@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Tests for leased blocks of oncocentre sequence numbers
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+from datetime import date
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.config import TestingConfig
+from app.core.models import db, User, Patient, IdSequence, IdLease, blind_index, get_cipher_suite
+from app.core.patient import create_patient
+from app.core.sequence import IdAllocator, SequenceExhausted, find_gaps, oncocentre_sort_key, id_allocator
+from tests.test_conditional_get import make_app, add_patient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+from init_db import init_db
+from migrate_oncocentre_ids import migrate_oncocentre_ids
+from migrate_ipp_index import migrate_ipp_index
+
+# Tables as they were before identifiers were numbered and IPPs indexed
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, password_hash VARCHAR(128),
+    is_active BOOLEAN NOT NULL, is_admin BOOLEAN NOT NULL, is_principal_investigator BOOLEAN NOT NULL,
+    created_at DATETIME, auth_source VARCHAR(20) NOT NULL, email VARCHAR(120), first_name VARCHAR(50),
+    last_name VARCHAR(50), display_name VARCHAR(100), ldap_dn TEXT, last_ldap_sync DATETIME
+);
+CREATE TABLE patient (
+    id INTEGER PRIMARY KEY, ipp_encrypted TEXT NOT NULL, first_name_encrypted TEXT NOT NULL,
+    last_name_encrypted TEXT NOT NULL, birth_date_encrypted TEXT NOT NULL, sex VARCHAR(1) NOT NULL,
+    oncocentre_id VARCHAR(50) NOT NULL UNIQUE, created_at DATETIME,
+    created_by INTEGER NOT NULL REFERENCES user (id)
+);
+"""
+
+
+def make_file_app():
+    """make_app() on a database file, where the leases' own connections and
+    the session lock each other out like in production (unlike :memory:)"""
+    return make_app(os.path.join(tempfile.mkdtemp(), 'oncocentre.db'))
+
+
+def make_workers(app, count, block_size=5):
+    """Allocators sharing app's database, like separate worker processes"""
+    app.config['ID_BLOCK_SIZE'] = block_size
+    return [IdAllocator(app) for _ in range(count)]
+
+
+def test_workers_hand_out_unique_numbers_from_blocks():
+    """Workers lease separate blocks, continuing after existing identifiers"""
+    app = make_file_app()  # has ONCOCENTRE_2025_00001
+    first, second = make_workers(app, 2)
+    with app.app_context():
+        numbers = []
+        for _ in range(6):
+            numbers += first.allocate(2025)
+            numbers += second.allocate(2025)
+        # Blocks 2-6 and 7-11, then 12-16 and 17-21
+        assert numbers[:4] == [2, 7, 3, 8]
+        assert sorted(numbers) == list(range(2, 13)) + [17]
+        assert IdLease.query.count() == 4
+        assert list(first.allocate(2025, count=3)) == [22, 23, 24]
+        assert db.session.get(IdSequence, 2025).next_value == 25
+    print("✓ Workers allocate unique numbers from leased blocks")
+
+
+def test_release_returns_or_records_unused_numbers():
+    """Unused numbers go back when possible; find_gaps explains the others"""
+    app = make_file_app()
+    first, second = make_workers(app, 2)
+    with app.app_context():
+        pi = User.query.filter_by(username='pi').one()
+
+        # Nobody leased after the block: the unused numbers go back
+        assert list(first.allocate(2025)) == [2]
+        add_patient(pi.id, 'ONCOCENTRE_2025_00002')
+        first.release()
+        assert db.session.get(IdSequence, 2025).next_value == 3
+        assert list(second.preview(2025) for _ in range(2)) == [3, 3]
+
+        # A later lease exists: the unused numbers stay a recorded gap
+        assert list(first.allocate(2025)) == [3]
+        assert list(second.allocate(2025)) == [8]
+        add_patient(pi.id, 'ONCOCENTRE_2025_00008')
+        first.release()
+        lease = db.session.get(IdLease, 2)
+        assert (lease.released_from, lease.returned) == (4, False)
+        assert db.session.get(IdSequence, 2025).next_value == 13
+
+    with app.app_context():
+        gaps = find_gaps(2025)
+    assert [(start, stop) for start, stop, _ in gaps] == [(3, 4), (4, 8), (9, 13)]
+    assert 'not saved' in gaps[0][2]
+    assert 'released unused' in gaps[1][2]
+    assert 'still running' in gaps[2][2]
+    print("✓ Unused numbers are returned or reported as gaps")
+
+
+def test_sequence_width_and_overflow():
+    """Identifiers widen past ONCOCENTRE_ID_WIDTH digits and sort on their numbers"""
+    app = make_file_app()
+    app.config['ONCOCENTRE_ID_WIDTH'] = 2
+    allocator, = make_workers(app, 1)
+    with app.app_context():
+        pi = User.query.filter_by(username='pi').one()
+        add_patient(pi.id, 'ONCOCENTRE_2025_98')
+        identifiers = [allocator.format(2025, sequence) for sequence in allocator.allocate(2025, count=3)]
+        assert identifiers == ['ONCOCENTRE_2025_99', 'ONCOCENTRE_2025_100', 'ONCOCENTRE_2025_101']
+        add_patient(pi.id, identifiers[1])
+        patient = Patient.query.filter_by(oncocentre_id='ONCOCENTRE_2025_100').one()
+        assert (patient.id_year, patient.id_sequence) == (2025, 100)
+        ordered = Patient.query.order_by(Patient.id_year, Patient.id_sequence).all()
+        assert [p.oncocentre_id for p in ordered] == ['ONCOCENTRE_2025_00001', 'ONCOCENTRE_2025_98',
+                                                      'ONCOCENTRE_2025_100']
+    assert sorted(['ONCOCENTRE_2025_100', 'ONCOCENTRE_2024_99999', 'ONCOCENTRE_2025_99'],
+                  key=oncocentre_sort_key) == ['ONCOCENTRE_2024_99999', 'ONCOCENTRE_2025_99', 'ONCOCENTRE_2025_100']
+
+    app.config['ONCOCENTRE_ID_OVERFLOW'] = 'error'
+    allocator, = make_workers(app, 1)
+    with app.app_context():
+        try:
+            allocator.allocate(2025)
+            assert False, "allocation past the width should fail"
+        except SequenceExhausted:
+            pass
+    print("✓ Sequence width and overflow policy are applied")
+
+
+def test_allocation_never_waits_for_the_sessions_own_lock():
+    """Reusing an expired idempotency key allocates before writing; writes first fail loudly"""
+    app = make_file_app()
+    app.config['IDEMPOTENCY_KEY_TTL'] = 0
+    allocator, = make_workers(app, 1)
+    with app.app_context():
+        pi = User.query.filter_by(username='pi').one()
+        values = dict(first_name='Ada', last_name='Lovelace', birth_date=date(1980, 12, 10), sex='F')
+        first, created = create_patient(pi, '100', idempotency_key='retry-1', **values)
+        assert created
+        # The key has expired: its row is reused for a new patient, by a
+        # worker that has to lease a block first
+        id_allocator.reset_after_fork()
+        second, created = create_patient(pi, '101', idempotency_key='retry-1', **values)
+        assert created and second.oncocentre_id != first.oncocentre_id
+
+        add_patient(pi.id, 'ONCOCENTRE_2025_00002')
+        db.session.get(Patient, second.id).sex = 'M'
+        try:
+            allocator.allocate(2025)
+            assert False, "allocating with a dirty session should fail"
+        except RuntimeError:
+            pass
+        db.session.flush()
+        try:
+            allocator.allocate(2025)
+            assert False, "allocating with flushed writes should fail"
+        except RuntimeError:
+            pass
+        db.session.rollback()
+        assert list(allocator.allocate(2025)) == [3]
+    print("✓ Allocation never waits for the session's own lock")
+
+
+def make_baseline_database():
+    """Database file with the baseline schema and two patients, plus its URI"""
+    path = os.path.join(tempfile.mkdtemp(), 'oncocentre.db')
+    encrypt = lambda value: get_cipher_suite().encrypt(value.encode()).decode()
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO user (id, username, is_active, is_admin, is_principal_investigator, auth_source) "
+                     "VALUES (1, 'pi', 1, 0, 1, 'local')")
+        for row_id, oncocentre_id in ((1, 'ONCOCENTRE_2024_00007'), (2, 'ONCOCENTRE_2025_00012')):
+            conn.execute("INSERT INTO patient (id, ipp_encrypted, first_name_encrypted, last_name_encrypted, "
+                         "birth_date_encrypted, sex, oncocentre_id, created_by) VALUES (?, ?, ?, ?, ?, 'F', ?, 1)",
+                         (row_id, encrypt(f'IPP{row_id}'), encrypt('Marie'), encrypt('Curie'),
+                          encrypt('1967-11-07'), oncocentre_id))
+    return path, f'sqlite:///{path}'
+
+
+def test_migrations_upgrade_a_baseline_database():
+    """init_db then the migration scripts, in order, bring an old database up to date"""
+    path, uri = make_baseline_database()
+    with mock.patch.object(TestingConfig, 'SQLALCHEMY_DATABASE_URI', uri):
+        assert init_db('testing')
+        assert migrate_oncocentre_ids('testing')
+        assert migrate_ipp_index('testing')
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT oncocentre_id, id_year, id_sequence, ipp_index FROM patient ORDER BY id").fetchall()
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(patient)")}
+    assert rows == [('ONCOCENTRE_2024_00007', 2024, 7, blind_index('IPP1')),
+                    ('ONCOCENTRE_2025_00012', 2025, 12, blind_index('IPP2'))]
+    assert {'ix_patient_id_number', 'ix_patient_ipp_index'} <= indexes
+    print("✓ Migrations upgrade a baseline database")
+
+
+if __name__ == '__main__':
+    test_workers_hand_out_unique_numbers_from_blocks()
+    test_release_returns_or_records_unused_numbers()
+    test_sequence_width_and_overflow()
+    test_allocation_never_waits_for_the_sessions_own_lock()
+    test_migrations_upgrade_a_baseline_database()
+    print("\n✓ ID allocation tests passed")
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+LDAP authentication tests against an in-memory ldap3 mock directory
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+import subprocess
+import time
+from unittest import mock
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ldap3 import Server, Connection, MOCK_SYNC, MOCK_ASYNC, NTLM, NONE, OFFLINE_AD_2012_R2
+from ldap3.core.exceptions import LDAPBindError, LDAPCommunicationError
+
+from app import create_app
+from app.core.models import db, User
+from app.core.ldap_auth import LDAPAuthenticator, get_ldap_authenticator
+from app.core.ldap_pool import LDAPConnectionPool, LatencyAwareServerPool
+from app.core.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from app.core.models import WhitelistEntry
+from app.core.ldap_sync import DirectorySync, SYNC_DESCRIPTION
+from app.core.ldap_async import AsyncLDAPAuthenticator
+
+SERVICE_DN = 'cn=svc,ou=users,dc=carpem,dc=fr'
+USER_DN = 'cn=alice,ou=users,dc=carpem,dc=fr'
+
+
+def ldap_config(**overrides):
+    """Test configuration for the mock directory"""
+    config = {
+        'server': 'mock-dc',
+        'port': 389,
+        'use_ssl': False,
+        'domain': 'CARPEM',
+        'base_dn': 'dc=carpem,dc=fr',
+        'user_search_base': 'ou=users,dc=carpem,dc=fr',
+        'user_search_filter': '(sAMAccountName={username})',
+        'bind_user': SERVICE_DN,
+        'bind_password': 'svcpass',
+        'timeout': 5,
+        'enabled': True,
+    }
+    config.update(overrides)
+    return config
+
+
+class MockLDAPAuthenticator(LDAPAuthenticator):
+    """Authenticator whose connections talk to ldap3's mock strategy
+
+    NTLM binds are refused, like in our Active Directory where only
+    search-bind works.
+    """
+
+    def __init__(self, config=None):
+        self.connections_opened = 0
+        self.ntlm_attempts = 0
+        super().__init__(config or ldap_config())
+        self.populate()
+
+    def populate(self):
+        conn = Connection(self.server, client_strategy=MOCK_SYNC)
+        conn.strategy.add_entry(SERVICE_DN, {
+            'objectClass': 'person', 'sAMAccountName': 'svc', 'userPassword': 'svcpass'
+        })
+        conn.strategy.add_entry(USER_DN, {
+            'objectClass': 'person', 'sAMAccountName': 'alice', 'userPassword': 'secret',
+            'displayName': 'Alice Martin', 'givenName': 'Alice', 'sn': 'Martin',
+            'mail': 'alice@carpem.fr', 'memberOf': ['cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr']
+        })
+
+    def _connect(self, user=None, password=None, **kwargs):
+        self.connections_opened += 1
+        if kwargs.get('authentication') == NTLM:
+            self.ntlm_attempts += 1
+            raise LDAPBindError('NTLM bind refused')
+        return super()._connect(user, password, client_strategy=MOCK_SYNC, **kwargs)
+
+
+def test_search_bind_authentication():
+    """Search-bind authenticates a directory user and rejects bad passwords"""
+    auth = MockLDAPAuthenticator()
+    user_info = auth.authenticate('alice', 'secret')
+    assert user_info is not None
+    assert user_info['dn'] == USER_DN
+    assert user_info['display_name'] == 'Alice Martin'
+    assert user_info['groups'] == ['cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr']
+
+    assert auth.authenticate('alice', 'wrong') is None
+    assert auth.authenticate('nobody', 'secret') is None
+    print("✓ Search-bind authentication works")
+
+
+def test_service_connections_are_pooled():
+    """Repeated searches reuse one pre-bound service connection"""
+    auth = MockLDAPAuthenticator()
+    opened_before = auth.connections_opened
+    for _ in range(5):
+        assert auth.get_user_groups('alice') == ['cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr']
+    assert auth.connections_opened - opened_before == 1
+    assert auth.pool.stats()['idle'] == 1
+    print("✓ Service-account connection reused across searches")
+
+
+def test_pool_recycles_idle_connections():
+    """Connections idle longer than max_idle are closed and replaced"""
+    auth = MockLDAPAuthenticator()
+    pool = LDAPConnectionPool(auth._service_connection, size=2, max_idle=0)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is not second
+    assert not first.bound
+    print("✓ Idle connections are recycled")
+
+
+def test_pool_discards_connection_after_error():
+    """A connection that raised while borrowed is not returned to the pool"""
+    auth = MockLDAPAuthenticator()
+    pool = LDAPConnectionPool(auth._service_connection, size=1)
+    try:
+        with pool.connection():
+            raise RuntimeError('socket dropped')
+    except RuntimeError:
+        pass
+    assert pool.stats()['idle'] == 0
+    with pool.connection() as conn:
+        assert conn.bound
+    print("✓ Broken connections are discarded")
+
+
+def test_server_pool_prefers_fastest_healthy_server():
+    """The server pool routes to the lowest-latency server and skips failing ones"""
+    dc1, dc2, dc3 = Server('dc1'), Server('dc2'), Server('dc3')
+    pool = LatencyAwareServerPool([dc1, dc2, dc3], failure_threshold=2, quarantine_seconds=60)
+
+    # Unmeasured servers keep their configured order
+    assert pool.get_server(None) is dc1
+
+    pool.record_success(dc1, 0.080)
+    pool.record_success(dc2, 0.010)
+    pool.record_success(dc3, 0.030)
+    assert pool.ranked_servers() == [dc2, dc3, dc1]
+
+    # A single failure moves dc2 behind the healthy servers
+    pool.record_failure(dc2)
+    assert pool.get_server(None) is dc3
+
+    # A second consecutive failure quarantines it
+    pool.record_failure(dc2)
+    stats = {entry['server']: entry for entry in pool.server_stats()}
+    assert stats['ldap://dc2:389']['quarantined']
+    assert pool.ranked_servers()[-1] is dc2
+
+    # Success clears the failure history
+    pool.record_success(dc2, 0.010)
+    assert pool.get_server(None) is dc2
+    print("✓ Server pool prefers the fastest healthy controller")
+
+
+def test_multiple_servers_configured():
+    """LDAP_SERVER accepts a comma-separated list of controllers"""
+    auth = MockLDAPAuthenticator(ldap_config(server='mock-dc1, mock-dc2'))
+    assert [server.name for server in auth.server] == ['ldap://mock-dc1:389', 'ldap://mock-dc2:389']
+    print("✓ Several domain controllers configured")
+
+
+def test_connect_fails_over_between_servers():
+    """An unreachable controller is recorded as failed and the next one tried"""
+    auth = LDAPAuthenticator(ldap_config(server='ldap://127.0.0.1:1, ldap://127.0.0.1:2', timeout=1))
+    try:
+        auth._connect()
+    except LDAPCommunicationError:
+        pass
+    else:
+        raise AssertionError("Expected connection failure")
+    assert [entry['total_failures'] for entry in auth.server.server_stats()] == [1, 1]
+    print("✓ Connection attempts fail over across controllers")
+
+
+def test_circuit_breaker_states():
+    """Breaker opens after repeated failures and lets one probe through later"""
+    breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=0)
+    assert breaker.allow_request()
+    breaker.record_failure('timeout')
+    assert breaker.state == CLOSED
+    breaker.record_failure('timeout')
+    assert breaker.snapshot()['consecutive_failures'] == 2
+
+    # recovery_timeout=0: the next call is the half-open probe
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_failure('still down')
+    assert breaker._state == OPEN
+
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+    slow = CircuitBreaker('slow', failure_threshold=1, recovery_timeout=60)
+    slow.record_failure('timeout')
+    assert slow.state == OPEN
+    assert not slow.allow_request()
+    assert slow.snapshot()['rejected'] == 1
+    print("✓ Circuit breaker state machine works")
+
+
+def test_unreachable_directory_opens_breaker():
+    """Logins fail fast once the directory has been found unreachable"""
+    auth = LDAPAuthenticator(ldap_config(server='ldap://127.0.0.1:1', timeout=1,
+                                         breaker_failure_threshold=1, breaker_recovery_timeout=60))
+    assert auth.authenticate('alice', 'secret') is None
+    assert auth.breaker.state == OPEN
+    assert not auth.is_available()
+
+    failures = auth.server.server_stats()[0]['total_failures']
+    assert auth.authenticate('alice', 'secret') is None
+    assert auth.server.server_stats()[0]['total_failures'] == failures
+    print("✓ Open breaker short-circuits LDAP logins")
+
+
+def test_login_deadline_counts_as_failure():
+    """A login whose time budget is exhausted does not touch the directory"""
+    auth = MockLDAPAuthenticator(ldap_config(login_deadline=0, breaker_failure_threshold=1))
+    assert auth.authenticate('alice', 'secret') is None
+    assert auth.server.server_stats()[0]['latency_ms'] is None
+    assert auth.breaker.state == OPEN
+    print("✓ Exhausted deadline stops directory calls")
+
+
+def test_wrong_password_keeps_breaker_closed():
+    """Rejected credentials prove the directory is up"""
+    auth = MockLDAPAuthenticator(ldap_config(breaker_failure_threshold=1))
+    assert auth.authenticate('alice', 'wrong') is None
+    assert auth.breaker.state == CLOSED
+    print("✓ Bad passwords do not trip the breaker")
+
+
+def test_unexpected_errors_do_not_trip_breaker():
+    """Only unreachable/timeout errors count; a bug neither opens the breaker nor blocks the probe"""
+    auth = MockLDAPAuthenticator(ldap_config(breaker_failure_threshold=1, breaker_recovery_timeout=0))
+
+    def broken(*args, **kwargs):
+        raise ValueError('bug')
+
+    with mock.patch.object(auth, '_authenticate_search_bind', broken):
+        assert auth.authenticate('alice', 'secret') is None
+    assert auth.breaker.state == CLOSED
+
+    auth.breaker.record_failure('timeout')
+    assert auth.breaker.allow_request()  # half-open probe taken...
+    auth.breaker.record_ignored()
+    assert auth.breaker.allow_request()  # ...and handed back
+    print("✓ Unexpected errors leave the breaker alone")
+
+
+def test_connect_timeout_limited_by_login_deadline():
+    """The TCP connect timeout never exceeds what is left of the login deadline"""
+    auth = LDAPAuthenticator(ldap_config(server='ldap://127.0.0.1:1', timeout=10))
+    servers = []
+
+    class FailingConnection:
+        def __init__(self, server, **kwargs):
+            servers.append(server)
+            self.server = server
+
+        def open(self):
+            raise LDAPCommunicationError('unreachable')
+
+    with mock.patch('app.core.ldap_auth.Connection', FailingConnection):
+        try:
+            auth._connect(deadline=time.monotonic() + 2)
+        except LDAPCommunicationError:
+            pass
+    assert 0 < servers[0].connect_timeout <= 2
+    assert auth.server.servers[0].connect_timeout == 10
+    assert auth.server.server_stats()[0]['total_failures'] == 1
+    print("✓ Connect timeout clamped to the login deadline")
+
+
+def test_dashboard_shows_directory_health():
+    """Admins see the breaker state on the dashboard"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        admin = User(username='ldapadmin', is_admin=True)
+        admin.set_password('adminpass')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session['_user_id'] = str(admin_id)
+            session['_fresh'] = True
+        response = client.get('/admin/dashboard')
+        assert response.status_code == 200
+        assert 'Annuaire LDAP' in response.get_data(as_text=True)
+    print("✓ Directory health visible to admins")
+
+
+def test_working_bind_method_is_tried_first():
+    """Once search-bind has worked, logins skip the futile NTLM bind"""
+    auth = MockLDAPAuthenticator()
+    assert auth.authenticate('alice', 'secret') is not None
+    assert auth.ntlm_attempts == 1
+
+    assert auth.authenticate('Alice', 'secret') is not None
+    assert auth.ntlm_attempts == 1
+
+    # Users never seen before start with the deployment-wide preference
+    assert auth._method_order('bob') == ['search_bind', 'domain']
+    print("✓ Last working bind method is tried first")
+
+
+def test_unknown_usernames_are_negatively_cached():
+    """A username the directory does not know is not searched again"""
+    auth = MockLDAPAuthenticator()
+    assert auth.authenticate('nobody', 'secret') is None
+    assert auth.is_known_unknown(' NoBody ')
+
+    ntlm_before = auth.ntlm_attempts
+    original_search = auth._search_user
+    searches = []
+    auth._search_user = lambda *args, **kwargs: searches.append(args) or original_search(*args, **kwargs)
+    assert auth.authenticate('nobody', 'secret') is None
+    assert auth.get_user_groups('NOBODY') == []
+    assert searches == []
+    assert auth.ntlm_attempts == ntlm_before
+
+    auth.forget_unknown_user('nobody')
+    assert not auth.is_known_unknown('nobody')
+
+    # A TTL of 0 disables the cache
+    uncached = MockLDAPAuthenticator(ldap_config(negative_cache_ttl=0))
+    assert uncached.authenticate('nobody', 'secret') is None
+    assert not uncached.is_known_unknown('nobody')
+    print("✓ Unknown usernames are negatively cached")
+
+
+def test_profile_sync_skips_unchanged_attributes():
+    """update_from_ldap only reports a change when something must be written"""
+    ldap_info = {'username': 'alice', 'dn': USER_DN, 'email': 'alice@carpem.fr',
+                 'first_name': 'Alice', 'last_name': 'Martin', 'display_name': 'Alice Martin'}
+    user = User.create_from_ldap(ldap_info)
+    interval = timedelta(hours=1)
+
+    assert not user.update_from_ldap(dict(ldap_info), interval)
+
+    synced_at = user.last_ldap_sync
+    assert user.update_from_ldap(dict(ldap_info, email='a.martin@carpem.fr'), interval)
+    assert user.email == 'a.martin@carpem.fr'
+    assert user.last_ldap_sync >= synced_at
+
+    user.last_ldap_sync = datetime.utcnow() - timedelta(hours=2)
+    assert user.update_from_ldap(dict(ldap_info, email='a.martin@carpem.fr'), interval)
+    assert datetime.utcnow() - user.last_ldap_sync < interval
+    print("✓ Unchanged LDAP profiles are not written back")
+
+
+def test_directory_sync_provisions_group_members():
+    """The sync job creates, whitelists and deactivates accounts from group membership"""
+    pi_group = 'cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr'
+    auth = MockLDAPAuthenticator()
+    conn = Connection(auth.server, client_strategy=MOCK_SYNC)
+    for index in range(5):
+        conn.strategy.add_entry(f'cn=user{index},ou=users,dc=carpem,dc=fr', {
+            'objectClass': 'person', 'sAMAccountName': f'user{index}',
+            'displayName': f'User {index}', 'memberOf': [pi_group]
+        })
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        admin = User(username='syncadmin', is_admin=True)
+        admin.set_password('adminpass')
+        leaver = User(username='leaver', auth_source='ldap', is_active=True)
+        local = User(username='localuser', auth_source='local', is_active=True)
+        db.session.add_all([admin, leaver, local])
+        db.session.commit()
+        db.session.add_all([
+            WhitelistEntry(username='leaver', created_by=admin.id, description=SYNC_DESCRIPTION),
+            WhitelistEntry(username='localuser', created_by=admin.id, description='Added by hand')
+        ])
+        db.session.commit()
+
+        sync = DirectorySync(auth, [pi_group], page_size=2, batch_size=2, sync_interval=timedelta(hours=1))
+        stats = sync.run(admin.id, dry_run=True)
+        assert stats['created'] == 6
+        assert User.query.filter_by(auth_source='ldap').count() == 1
+
+        stats = sync.run(admin.id)
+        assert stats['members'] == 6  # alice and user0..user4
+        assert stats['created'] == 6
+        assert stats['deactivated'] == 1
+        assert User.query.filter_by(username='user3').one().display_name == 'User 3'
+        assert WhitelistEntry.is_username_authorized('alice')
+        assert not User.query.filter_by(username='leaver').one().is_active
+        assert not WhitelistEntry.is_username_authorized('leaver')
+        assert User.query.filter_by(username='localuser').one().is_active
+        assert WhitelistEntry.is_username_authorized('localuser')
+
+        # A second run has nothing to do
+        stats = sync.run(admin.id)
+        assert stats['created'] == stats['updated'] == stats['whitelisted'] == stats['deactivated'] == 0
+    print("✓ Directory sync provisions group members")
+
+
+def test_directory_sync_keeps_manually_whitelisted_users():
+    """Only accounts the sync provisioned are deactivated; usernames ignore case"""
+    pi_group = 'cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr'
+    auth = MockLDAPAuthenticator()
+    conn = Connection(auth.server, client_strategy=MOCK_SYNC)
+    conn.strategy.add_entry('cn=Bob,ou=users,dc=carpem,dc=fr', {
+        'objectClass': 'person', 'sAMAccountName': 'Bob', 'memberOf': [pi_group]
+    })
+
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        admin = User(username='syncadmin', is_admin=True)
+        admin.set_password('adminpass')
+        manual = User(username='consultant', auth_source='ldap', is_active=True)
+        unlisted = User(username='envuser', auth_source='ldap', is_active=True)
+        db.session.add_all([admin, manual, unlisted])
+        db.session.commit()
+        db.session.add_all([
+            WhitelistEntry(username='Consultant', created_by=admin.id, description='Added by hand'),
+            WhitelistEntry(username='bob', created_by=admin.id, description='Added by hand')
+        ])
+        db.session.commit()
+
+        stats = DirectorySync(auth, [pi_group]).run(admin.id)
+        assert stats['deactivated'] == 0
+        assert User.query.filter_by(username='consultant').one().is_active
+        assert User.query.filter_by(username='envuser').one().is_active
+        assert WhitelistEntry.is_username_authorized('CONSULTANT')
+        # Bob matched the existing entry instead of getting a second one
+        assert WhitelistEntry.query.count() == 3
+        assert User.find_by_username('BOB').username == 'Bob'
+
+        # Leaving the group only deactivates the account the sync provisioned
+        sync_entry = WhitelistEntry.query.filter_by(description=SYNC_DESCRIPTION).one()
+        assert sync_entry.username == 'alice'
+        conn.strategy.remove_entry('cn=Bob,ou=users,dc=carpem,dc=fr')
+        DirectorySync(auth, [pi_group]).run(admin.id)
+        assert User.find_by_username('bob').is_active
+        assert WhitelistEntry.is_username_authorized('bob')
+    print("✓ Directory sync keeps manually whitelisted users")
+
+
+def test_group_roles_are_mapped_and_cached():
+    """memberOf values map to role flags; memberships are cached after login"""
+    auth = MockLDAPAuthenticator(ldap_config(
+        admin_groups='CN=Oncocentre-Admins,OU=Groups,DC=carpem,DC=fr',
+        pi_groups='oncocentre-pi'
+    ))
+    pi_dn = 'cn=Oncocentre-PI,ou=groups,dc=carpem,dc=fr'
+    assert auth.resolve_roles([pi_dn]) == {'is_admin': False, 'is_principal_investigator': True}
+    assert auth.resolve_roles(['cn=oncocentre-admins,ou=groups,dc=carpem,dc=fr']) == {
+        'is_admin': True, 'is_principal_investigator': False
+    }
+    assert MockLDAPAuthenticator().resolve_roles([pi_dn]) == {}
+
+    user_info = auth.authenticate('alice', 'secret')
+    searches = []
+    auth._search_user = lambda *args, **kwargs: searches.append(args)
+    assert auth.get_user_groups('alice') == user_info['groups']
+    assert searches == []
+
+    user = User.create_from_ldap(user_info)
+    user.is_admin = True
+    assert user.apply_ldap_roles(auth.resolve_roles(user_info['groups']))
+    assert user.is_principal_investigator and not user.is_admin
+    assert not user.apply_ldap_roles(auth.resolve_roles(user_info['groups']))
+    print("✓ Directory groups map to cached role flags")
+
+
+def test_unknown_groups_keep_roles():
+    """A failed group search neither resets role flags nor gets cached"""
+    auth = MockLDAPAuthenticator(ldap_config(pi_groups='oncocentre-pi'))
+    broken = mock.Mock()
+    broken.search.side_effect = RuntimeError('search failed')
+    user_info = auth._get_user_info(broken, 'alice')
+    assert user_info['groups'] is None
+    auth._authenticated('alice', user_info)
+    assert auth._group_cache.get('alice') is None
+
+    from app.auth import views
+    app = create_app('testing')
+    with app.test_request_context():
+        db.create_all()
+        db.session.add(User(username='alice', auth_source='ldap', is_principal_investigator=True))
+        db.session.commit()
+        with mock.patch.object(views, 'ldap_auth', auth), \
+                mock.patch.object(auth, 'authenticate', return_value=user_info):
+            user, _ = views.authenticate_ldap_user('alice', 'secret')
+        assert user.is_principal_investigator
+    print("✓ Unknown group memberships keep role flags")
+
+
+def test_server_setup_is_lazy_and_cheap():
+    """No server is built when LDAP is disabled; server info comes from the disk cache"""
+    assert get_ldap_authenticator() is get_ldap_authenticator()
+
+    disabled = LDAPAuthenticator(ldap_config(enabled=False))
+    assert disabled.server is None and not disabled.is_enabled()
+
+    auth = MockLDAPAuthenticator()
+    assert all(server.get_info == NONE for server in auth.server)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        config = ldap_config(get_info='ALL', server_info_cache=cache_dir)
+        offline = Server('mock-dc', get_info=OFFLINE_AD_2012_R2)
+        dsa_path, schema_path = LDAPAuthenticator(config)._server_info_paths(offline)
+        offline.info.to_file(dsa_path)
+        offline.schema.to_file(schema_path)
+
+        cached = LDAPAuthenticator(config)
+        server = cached.server.servers[0]
+        assert server.info is not None and server.schema is not None
+        assert server.get_info == NONE
+    print("✓ LDAP server setup is lazy and uses cached server info")
+
+
+def test_async_authenticator_search_bind():
+    """The async strategy authenticates concurrent logins on one event loop"""
+    auth = AsyncLDAPAuthenticator(ldap_config(), client_strategy=MOCK_ASYNC)
+    MockLDAPAuthenticator.populate(auth)
+    try:
+        user_info = auth.authenticate('alice', 'secret')
+        assert user_info['dn'] == USER_DN
+        assert user_info['display_name'] == 'Alice Martin'
+        assert auth.authenticate('alice', 'wrong') is None
+        assert auth.authenticate('nobody', 'secret') is None
+        assert auth.is_known_unknown('nobody')
+
+        async def concurrent_logins():
+            return await asyncio.gather(*[
+                auth.authenticate_async('alice', 'secret' if index % 2 else 'wrong') for index in range(10)
+            ])
+        results = auth._event_loop().run(concurrent_logins(), timeout=10)
+        assert [result is not None for result in results] == [index % 2 == 1 for index in range(10)]
+        assert auth.breaker.state == CLOSED
+    finally:
+        auth.close()
+    print("✓ Async search-bind authentication works")
+
+
+def test_async_timeout_cancels_the_login():
+    """A login that outlives its timeout is cancelled and counts as one failure"""
+    auth = AsyncLDAPAuthenticator(ldap_config(login_deadline=0.05, timeout=0.05), client_strategy=MOCK_ASYNC)
+    outcome = []
+
+    async def slow_search_bind(username, password, deadline):
+        try:
+            await asyncio.sleep(0.3)
+        except asyncio.CancelledError:
+            outcome.append('cancelled')
+            raise
+        outcome.append('finished')
+        raise LDAPCommunicationError('too late')
+
+    try:
+        with mock.patch.object(auth, '_search_bind', slow_search_bind):
+            assert auth.authenticate('alice', 'secret') is None
+            time.sleep(0.5)
+        assert outcome == ['cancelled']
+        assert auth.breaker._consecutive_failures == 1
+    finally:
+        auth.close()
+    print("✓ Timed-out async logins are cancelled")
+
+
+def test_cold_start_defers_ldap_and_crypto():
+    """Building the app and serving a page loads neither ldap3 nor Fernet"""
+    probe = (
+        "import sys\n"
+        "from app import create_app\n"
+        "app = create_app('testing')\n"
+        "assert app.test_client().get('/auth/login').status_code == 200\n"
+        "import app.core.directory as directory\n"
+        "assert directory._authenticator is None\n"
+        "print(' '.join(m for m in ('ldap3', 'cryptography.fernet') if m in sys.modules))\n"
+    )
+    root = os.path.join(os.path.dirname(__file__), '..')
+    result = subprocess.run([sys.executable, '-c', probe], cwd=root, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+    print("✓ Cold start defers LDAP and encryption imports")
+
+
+if __name__ == '__main__':
+    test_search_bind_authentication()
+    test_service_connections_are_pooled()
+    test_pool_recycles_idle_connections()
+    test_pool_discards_connection_after_error()
+    test_server_pool_prefers_fastest_healthy_server()
+    test_multiple_servers_configured()
+    test_connect_fails_over_between_servers()
+    test_circuit_breaker_states()
+    test_unreachable_directory_opens_breaker()
+    test_login_deadline_counts_as_failure()
+    test_wrong_password_keeps_breaker_closed()
+    test_unexpected_errors_do_not_trip_breaker()
+    test_connect_timeout_limited_by_login_deadline()
+    test_dashboard_shows_directory_health()
+    test_working_bind_method_is_tried_first()
+    test_unknown_usernames_are_negatively_cached()
+    test_profile_sync_skips_unchanged_attributes()
+    test_directory_sync_provisions_group_members()
+    test_directory_sync_keeps_manually_whitelisted_users()
+    test_group_roles_are_mapped_and_cached()
+    test_unknown_groups_keep_roles()
+    test_server_setup_is_lazy_and_cheap()
+    test_async_authenticator_search_bind()
+    test_async_timeout_cancels_the_login()
+    test_cold_start_defers_ldap_and_crypto()
+    print("\n✓ LDAP authentication tests passed")
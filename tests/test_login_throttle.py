@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for token-bucket login throttling
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from unittest import mock
+
+from flask import Flask
+from app import create_app
+from app.core.models import db, LoginThrottleBucket
+from app.core.throttle import LoginThrottle, login_throttle
+
+
+def make_throttle(**settings):
+    """Build a standalone throttle from a throwaway Flask config"""
+    app = Flask(__name__)
+    app.config.update(settings)
+    return LoginThrottle(app)
+
+
+def test_username_bucket():
+    """A username gets its burst, then waits for tokens to refill"""
+    throttle = make_throttle(LOGIN_THROTTLE_USER_RATE=60, LOGIN_THROTTLE_USER_BURST=3)
+    assert [throttle.hit('alice', '10.0.0.1') for _ in range(3)] == [0, 0, 0]
+    retry_after = throttle.hit('ALICE ', '10.0.0.2')
+    assert 0 < retry_after <= 1
+
+    # Other usernames are unaffected
+    assert throttle.hit('bob', '10.0.0.1') == 0
+    print("✓ Username bucket limits attempts")
+
+
+def test_ip_bucket():
+    """One address spraying many usernames is limited by its own bucket"""
+    throttle = make_throttle(LOGIN_THROTTLE_IP_RATE=6, LOGIN_THROTTLE_IP_BURST=2)
+    assert throttle.hit('user1', '10.0.0.9') == 0
+    assert throttle.hit('user2', '10.0.0.9') == 0
+    assert throttle.hit('user3', '10.0.0.9') > 0
+    # The rejected attempt did not consume user3's token
+    assert throttle.hit('user3', '10.0.0.10') == 0
+    print("✓ IP bucket limits password sprays")
+
+
+def test_rates_must_be_positive():
+    """A zero rate is a configuration error, not a bucket that never refills"""
+    for setting in ('LOGIN_THROTTLE_USER_RATE', 'LOGIN_THROTTLE_IP_RATE'):
+        try:
+            make_throttle(**{setting: 0})
+            raise AssertionError(f"Expected ValueError for {setting}=0")
+        except ValueError:
+            pass
+    assert make_throttle(LOGIN_THROTTLE_ENABLED=False, LOGIN_THROTTLE_USER_RATE=1).hit('alice', '10.0.0.1') == 0
+    print("✓ Non-positive throttle rates are rejected")
+
+
+def test_database_backend_is_shared():
+    """Buckets stored in the database are shared between throttle instances"""
+    app = create_app('testing')
+    app.config.update(LOGIN_THROTTLE_BACKEND='database', LOGIN_THROTTLE_USER_BURST=2)
+    with app.app_context():
+        db.create_all()
+        first, second = LoginThrottle(app), LoginThrottle(app)
+        assert first.hit('alice', '10.0.0.1') == 0
+        assert second.hit('alice', '10.0.0.1') == 0
+        assert first.hit('alice', '10.0.0.1') > 0
+        assert db.session.get(LoginThrottleBucket, 'user:alice').tokens < 1
+    print("✓ Database buckets are shared between workers")
+
+
+def test_database_backend_counts_concurrent_attempts():
+    """An attempt landing between another worker's read and write is not lost"""
+    app = create_app('testing')
+    app.config.update(LOGIN_THROTTLE_BACKEND='database', LOGIN_THROTTLE_USER_BURST=3,
+                      LOGIN_THROTTLE_USER_RATE=0.001)
+    with app.app_context():
+        db.create_all()
+        first, second = LoginThrottle(app), LoginThrottle(app)
+        assert first.hit('alice', '10.0.0.1') == 0
+        load_buckets = first._load_buckets
+        interleaved = []
+
+        def racing_load(keys):
+            rows = load_buckets(keys)
+            if not interleaved:
+                interleaved.append(second.hit('alice', '10.0.0.2'))
+            return rows
+
+        with mock.patch.object(first, '_load_buckets', racing_load):
+            assert first.hit('alice', '10.0.0.1') == 0
+        assert interleaved == [0]
+        # Three attempts took all three tokens
+        assert db.session.get(LoginThrottleBucket, 'user:alice').tokens < 1
+        assert second.hit('alice', '10.0.0.3') > 0
+        # The attempt retried after the conflict was counted once
+        assert (next(first._hits), next(second._hits)) == (3, 3)
+    print("✓ Concurrent database attempts are all counted")
+
+
+def test_login_view_rejects_before_whitelist():
+    """Throttled logins get 429 without reaching the whitelist or password check"""
+    app = create_app('testing')
+    app.config.update(LOGIN_THROTTLE_USER_BURST=1, LOGIN_THROTTLE_USER_RATE=1)
+    login_throttle.init_app(app)
+    with app.app_context():
+        db.create_all()
+
+    with app.test_client() as client, \
+            mock.patch('app.auth.views.get_authorized_users', return_value=set()) as whitelist:
+        response = client.post('/auth/login', data={'username': 'mallory', 'password': 'x'})
+        assert response.status_code == 200
+        assert whitelist.call_count == 1
+
+        response = client.post('/auth/login', data={'username': 'mallory', 'password': 'y'})
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+        assert whitelist.call_count == 1
+    print("✓ Login view throttles before the whitelist lookup")
+
+
+if __name__ == '__main__':
+    test_username_bucket()
+    test_ip_bucket()
+    test_rates_must_be_positive()
+    test_database_backend_is_shared()
+    test_database_backend_counts_concurrent_attempts()
+    test_login_view_rejects_before_whitelist()
+    print("\n✓ Login throttling tests passed")
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded password hashing pool
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from app import create_app
+from app.core.models import db, User, WhitelistEntry
+from app.core.hashing import PasswordHasher, PasswordHashingBusy, password_hasher
+
+
+def make_hasher(**settings):
+    """Build a standalone hasher from a throwaway Flask config"""
+    app = Flask(__name__)
+    app.config.update(settings)
+    return PasswordHasher(app)
+
+
+def test_inline_hashing():
+    """Without workers, hashing runs on the calling thread"""
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=0)
+    password_hash = hasher.hash_password('secret123')
+    assert hasher.verify_password('secret123', password_hash)
+    assert not hasher.verify_password('wrong', password_hash)
+    assert not hasher.verify_password('secret123', None)
+    print("✓ Inline hashing works")
+
+
+def test_pool_hashing():
+    """Hashing and verification round-trip through the process pool"""
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_LIMIT=1, PASSWORD_HASH_TIMEOUT=30)
+    try:
+        password_hash = hasher.hash_password('secret123')
+        assert hasher.verify_password('secret123', password_hash)
+        assert not hasher.verify_password('wrong', password_hash)
+        print("✓ Pooled hashing works")
+    finally:
+        hasher.shutdown()
+
+
+def test_pool_saturation_rejects_fast():
+    """When every slot is taken, callers get PasswordHashingBusy immediately"""
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_LIMIT=0)
+    assert hasher._slots.acquire(blocking=False)
+    try:
+        try:
+            hasher.verify_password('secret123', '$2b$12$invalidinvalidinvalidinvalidinvalidinvalidinvalidinva')
+        except PasswordHashingBusy:
+            print("✓ Saturated pool rejects immediately")
+        else:
+            raise AssertionError("Expected PasswordHashingBusy")
+    finally:
+        hasher._slots.release()
+        hasher.shutdown()
+
+
+def test_pool_start_failures_release_slots():
+    """A pool that cannot start or take work does not use up the queue for good"""
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_LIMIT=0)
+
+    def failing_start():
+        raise OSError('cannot start worker processes')
+    hasher._get_executor = failing_start
+    try:
+        for _ in range(3):
+            try:
+                hasher.hash_password('secret123')
+                raise AssertionError("Expected PasswordHashingBusy")
+            except PasswordHashingBusy:
+                pass
+
+        class Rejecting:
+            def submit(self, func, *args):
+                raise ValueError('unexpected')
+        hasher._get_executor = Rejecting
+        for _ in range(3):
+            try:
+                hasher.hash_password('secret123')
+                raise AssertionError("Expected ValueError")
+            except ValueError:
+                pass
+
+        # Every slot is free again
+        assert hasher._slots.acquire(blocking=False)
+        hasher._slots.release()
+    finally:
+        hasher.shutdown()
+    print("✓ Pool start failures release their slots")
+
+
+def test_reset_after_fork_forgets_parent_pool():
+    """A forked worker starts its own pool with every slot free"""
+    hasher = make_hasher(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_LIMIT=0)
+    try:
+        parent_executor = hasher._get_executor()
+        assert hasher._slots.acquire(blocking=False)
+        hasher.reset_after_fork()
+        assert hasher._executor is None
+        assert hasher._slots.acquire(blocking=False)
+        hasher._slots.release()
+    finally:
+        parent_executor.shutdown()
+        hasher.shutdown()
+    print("✓ Fork reset drops the inherited pool")
+
+def test_login_busy_returns_503(monkeypatch):
+    """The login view answers 503 instead of waiting when hashing is saturated"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        user = User(username='busyuser')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+        db.session.add(WhitelistEntry(username='busyuser', created_by=user.id))
+        db.session.commit()
+
+    def saturated(*args, **kwargs):
+        raise PasswordHashingBusy("Too many concurrent password checks")
+
+    monkeypatch.setattr(password_hasher, 'verify_password', saturated)
+
+    with app.test_client() as client:
+        response = client.post('/auth/login', data={
+            'username': 'busyuser',
+            'password': 'testpass',
+            'auth_method': 'local'
+        })
+        assert response.status_code == 503
+        assert 'try again' in response.get_data(as_text=True).lower()
+        print("✓ Busy login answered with 503")
+
+
+def test_admin_user_forms_busy_return_503(monkeypatch):
+    """Creating a user or resetting a password answers 503 when hashing is saturated"""
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        admin = User(username='busyadmin', is_admin=True)
+        admin.set_password('testpass')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.add(WhitelistEntry(username='busyadmin', created_by=admin.id))
+        db.session.commit()
+        admin_id = admin.id
+
+    def saturated(*args, **kwargs):
+        raise PasswordHashingBusy("Too many concurrent password checks")
+
+    with app.test_client() as client:
+        client.post('/auth/login', data={'username': 'busyadmin', 'password': 'testpass', 'auth_method': 'local'})
+        monkeypatch.setattr(password_hasher, 'hash_password', saturated)
+        response = client.post('/admin/users/create', data={
+            'username': 'newuser', 'password': 'longpassword', 'confirm_password': 'longpassword'
+        })
+        assert response.status_code == 503
+        response = client.post(f'/admin/users/{admin_id}/edit', data={
+            'is_active': 'y', 'is_admin': 'y', 'reset_password': 'longpassword', 'confirm_password': 'longpassword'
+        })
+        assert response.status_code == 503
+    with app.app_context():
+        assert User.query.filter_by(username='newuser').first() is None
+    print("✓ Busy admin user forms answered with 503")
+
+
+if __name__ == '__main__':
+    test_inline_hashing()
+    test_pool_hashing()
+    test_pool_saturation_rejects_fast()
+    test_pool_start_failures_release_slots()
+    test_reset_after_fork_forgets_parent_pool()
+    print("\n✓ Password hashing tests passed")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for fingerprinted, precompressed static assets
+"""
+
+import os
+import sys
+import gzip
+import tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask, render_template_string
+from app.core.assets import AssetPipeline, build_manifest
+
+CSS = b'body { color: #333; }\n' * 200
+
+
+def make_app(static_folder):
+    """Throwaway app serving static_folder through the asset pipeline"""
+    app = Flask(__name__, static_folder=static_folder, static_url_path='/static')
+    AssetPipeline(app)
+    return app
+
+
+def make_static_folder():
+    static_folder = tempfile.mkdtemp()
+    os.makedirs(os.path.join(static_folder, 'css'))
+    with open(os.path.join(static_folder, 'css', 'style.css'), 'wb') as f:
+        f.write(CSS)
+    with open(os.path.join(static_folder, 'logo.png'), 'wb') as f:
+        f.write(b'\x89PNG fake')
+    return static_folder
+
+
+def test_manifest_fingerprints_and_compresses():
+    """Built assets get content-hashed names and gzip variants of text files"""
+    static_folder = make_static_folder()
+    assets = build_manifest(static_folder)
+    css = assets['css/style.css']
+    assert css['path'].startswith('dist/css/style.') and css['path'].endswith('.css')
+    assert 'gzip' in css['encodings']
+    assert assets['logo.png']['encodings'] == []
+    with open(os.path.join(static_folder, css['path'] + '.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()) == CSS
+
+    # Same content, same name
+    assert build_manifest(static_folder)['css/style.css']['path'] == css['path']
+    print("✓ Assets are fingerprinted and precompressed")
+
+
+def test_fingerprinted_assets_are_immutable_and_negotiated():
+    """asset_url() points at the hashed file, served by Accept-Encoding"""
+    static_folder = make_static_folder()
+    build_manifest(static_folder)
+    app = make_app(static_folder)
+
+    with app.test_request_context():
+        url = render_template_string("{{ asset_url('css/style.css') }}")
+    assert url.startswith('/static/dist/css/style.')
+
+    with app.test_client() as client:
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.mimetype == 'text/css'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'max-age=31536000' in response.headers['Cache-Control']
+        assert gzip.decompress(response.data) == CSS
+        response.close()
+
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        assert 'Content-Encoding' not in response.headers
+        assert response.data == CSS
+        response.close()
+
+        # Unversioned URLs keep Flask's normal caching
+        response = client.get('/static/css/style.css')
+        assert 'immutable' not in response.headers.get('Cache-Control', '')
+        response.close()
+    print("✓ Fingerprinted assets are immutable and content-negotiated")
+
+
+def test_missing_vendor_file_falls_back():
+    """Without a manifest or local copy, the fallback URL is used"""
+    app = make_app(make_static_folder())
+    with app.test_request_context():
+        assert render_template_string("{{ asset_url('css/style.css') }}") == '/static/css/style.css'
+        assert render_template_string(
+            "{{ asset_url('vendor/lib.js', fallback='https://cdn.example/lib.js') }}"
+        ) == 'https://cdn.example/lib.js'
+    print("✓ Missing vendored files fall back to the CDN")
+
+
+if __name__ == '__main__':
+    test_manifest_fingerprints_and_compresses()
+    test_fingerprinted_assets_are_immutable_and_negotiated()
+    test_missing_vendor_file_falls_back()
+    print("\n✓ Static asset tests passed")
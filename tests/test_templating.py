@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the template bytecode cache and {% cache %} fragments
+"""
+
+import os
+import sys
+import sqlite3
+import tempfile
+from unittest import mock
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import render_template_string
+from app import create_app
+from app.core.models import db, User, Patient
+from tests.test_conditional_get import make_app, add_patient, login
+
+
+def test_fragment_cache_reuses_output_until_key_changes():
+    """A cached block is rendered once per distinct key"""
+    app = create_app('testing')
+    calls = []
+
+    def expensive(value):
+        calls.append(value)
+        return value.upper()
+
+    source = "{% for row in rows %}{% cache 'row', row.id, row.version %}<{{ f(row.name) }}>{% endcache %}{% endfor %}"
+    rows = [{'id': 1, 'version': 1, 'name': 'a'}, {'id': 2, 'version': 1, 'name': 'b&c'}]
+    with app.test_request_context():
+        assert render_template_string(source, rows=rows, f=expensive) == '<A><B&amp;C>'
+        assert render_template_string(source, rows=rows, f=expensive) == '<A><B&amp;C>'
+        assert len(calls) == 2
+
+        rows[0].update(version=2, name='z')
+        assert render_template_string(source, rows=rows, f=expensive) == '<Z><B&amp;C>'
+        assert len(calls) == 3
+    print("✓ Fragment cache reuses output until the key changes")
+
+
+def test_bytecode_cache_is_written():
+    """Compiled templates are stored in the configured directory"""
+    directory = tempfile.mkdtemp()
+    app = create_app('testing')
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = directory
+    from app.core.templating import configure_templates
+    configure_templates(app)
+
+    assert app.test_client().get('/auth/login').status_code == 200
+    assert any(name.endswith('.cache') for name in os.listdir(directory))
+    print("✓ Template bytecode is cached on disk")
+
+
+def test_patient_rows_are_not_decrypted_twice():
+    """A second render of an unchanged patient list decrypts nothing"""
+    app = make_app()
+    with app.test_client() as client:
+        login(client, 'pi')
+        assert client.get('/patients').status_code == 200
+        with mock.patch.object(Patient, '_decrypt_data') as decrypt:
+            response = client.get('/patients')
+            assert response.status_code == 200
+            assert 'ONCOCENTRE_2025_00001' in response.get_data(as_text=True)
+            assert decrypt.call_count == 0
+    print("✓ Patient rows render from the fragment cache")
+
+
+def test_patient_list_is_streamed():
+    """/patients is streamed in chunks and still consumes flash messages"""
+    app = make_app()
+    with app.test_client() as client:
+        client.post('/auth/login', data={'username': 'pi', 'password': 'testpass', 'auth_method': 'local'})
+        response = client.get('/patients', buffered=False)
+        assert response.is_streamed
+        html = b''.join(response.response).decode()
+        response.close()
+        assert 'Welcome pi' in html
+        assert '<strong>1</strong> patient(s)' in html
+
+        # The flash message was removed from the session before streaming
+        assert 'Welcome pi' not in client.get('/patients').get_data(as_text=True)
+    print("✓ Patient list is streamed")
+
+
+def test_patient_list_stream_does_not_block_writers():
+    """Other connections can write while a long list is half sent"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'oncocentre.db')
+        app = make_app(path)
+        app.config['PATIENT_LIST_CHUNK_SIZE'] = 5
+        with app.app_context():
+            pi = User.query.filter_by(username='pi').one()
+            for sequence in range(2, 61):
+                add_patient(pi.id, f'ONCOCENTRE_2025_{sequence:05d}')
+
+        with app.test_client() as client:
+            login(client, 'pi')
+            response = client.get('/patients', buffered=False)
+            chunks = iter(response.response)
+            html = next(chunks).decode()
+            assert 'ONCOCENTRE_2025_00060' in html and 'ONCOCENTRE_2025_00001' not in html
+
+            # timeout=0: fails at once with "database is locked" if a reader holds the file
+            writer = sqlite3.connect(path, timeout=0)
+            with writer:
+                writer.execute("UPDATE user SET email = 'pi@carpem.fr' WHERE username = 'pi'")
+            writer.close()
+
+            html += b''.join(chunks).decode()
+            response.close()
+        assert html.index('ONCOCENTRE_2025_00060') < html.index('ONCOCENTRE_2025_00001')
+        assert '<strong>60</strong> patient(s)' in html
+        with app.app_context():
+            db.engine.dispose()
+    print("✓ Streaming the patient list does not block writers")
+
+if __name__ == '__main__':
+    test_fragment_cache_reuses_output_until_key_changes()
+    test_bytecode_cache_is_written()
+    test_patient_rows_are_not_decrypted_twice()
+    test_patient_list_is_streamed()
+    test_patient_list_stream_does_not_block_writers()
+    print("\n✓ Template cache tests passed")
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for production servers
+
+    gunicorn --config gunicorn.conf.py wsgi:app
+
+Unlike run.py this defaults to the production configuration.
+"""
+
+import os
+from app import create_app
+from scripts.load_ldap_config import load_ldap_config
+
+# Load LDAP configuration if available
+load_ldap_config()
+
+app = create_app(os.getenv('FLASK_CONFIG', 'production'))
+
+
+def reset_after_fork():
+    """Drop state inherited from the preloading master process
+
+    Database connections and LDAP sockets must not be shared between
+    processes; each worker opens its own on first use.
+    """
+    from app.core.models import db
+    from app.core.directory import reset_ldap_authenticator
+    from app.core.hashing import password_hasher
+    from app.core.sequence import id_allocator
+
+    with app.app_context():
+        # close=False: leave the parent's connections alone, just forget them
+        db.engine.dispose(close=False)
+    reset_ldap_authenticator()
+    password_hasher.reset_after_fork()
+    id_allocator.reset_after_fork()